@@ -0,0 +1,124 @@
+"""
+Micro-benchmark: slotted Prospect encode/decode vs. the previous dataclass implementation.
+
+Run from the repo root:
+    python -m benchmarks.bench_prospect [iterations]
+"""
+import json
+import sys
+import timeit
+import tracemalloc
+import uuid
+from dataclasses import dataclass, field, asdict
+from datetime import datetime, date
+from typing import Optional, List
+
+from models.prospect import Prospect
+from utils.data_utils.date_utils import format_datetime, format_date, parse_date, parse_datetime
+from utils.data_utils.time_utils import format_time_str, parse_time_str
+
+
+# -------------------------------Previous implementation, kept here for comparison-------------------------------
+@dataclass
+class LegacyProspect:
+    id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    phone: str = ""
+    whatsApp_phone: str = ""
+    timezone: Optional[str] = None
+    status: str = "new"
+    address: Optional[str] = None
+    objections: List[str] = field(default_factory=list)
+    responses: List[str] = field(default_factory=list)
+    appointment_date: Optional[date] = None
+    appointment_time: Optional[str] = None
+    email: Optional[str] = None
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    updated_at: datetime = field(default_factory=datetime.utcnow)
+
+    def to_dict(self):
+        d = asdict(self)
+        d["appointment_date"] = format_date(self.appointment_date)
+        d["appointment_time"] = format_time_str(self.appointment_time)
+        d["created_at"] = format_datetime(self.created_at)
+        d["updated_at"] = format_datetime(self.updated_at)
+        return d
+
+
+def legacy_to_hash(prospect):
+    return {k: ("" if v is None or v == "null" else str(v)) for k, v in prospect.to_dict().items()}
+
+
+def legacy_from_hash(prospect_id, data):
+    return LegacyProspect(
+        id=prospect_id,
+        first_name=data.get("first_name") or None,
+        last_name=data.get("last_name") or None,
+        phone=data.get("phone", ""),
+        timezone=data.get("timezone") or None,
+        status=data.get("status", "new"),
+        objections=json.loads(data.get("objections") or "[]"),
+        responses=json.loads(data.get("responses") or "[]"),
+        appointment_date=parse_date(data.get("appointment_date")),
+        appointment_time=parse_time_str(data.get("appointment_time")) or None,
+        email=data.get("email") or None,
+        created_at=parse_datetime(data.get("created_at")) or datetime.utcnow(),
+        updated_at=parse_datetime(data.get("updated_at")) or datetime.utcnow(),
+    )
+
+
+# -------------------------------Benchmark-------------------------------
+SAMPLE = dict(
+    first_name="Asha",
+    last_name="Verma",
+    phone="+919812345678",
+    timezone="Asia/Kolkata",
+    status="contacted",
+    address="Civil Lines, Nagpur",
+    appointment_date=date(2025, 9, 12),
+    appointment_time="14:00",
+    email="asha.verma@example.com",
+)
+
+
+def _allocated(fn, count=1000):
+    tracemalloc.start()
+    keep = [fn() for _ in range(count)]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del keep
+    return current / count
+
+
+def run(iterations: int = 20000) -> None:
+    legacy = LegacyProspect(**SAMPLE)
+    current = Prospect(**SAMPLE)
+    # The legacy path stored lists with str(), which json.loads cannot read back
+    legacy_hash = dict(legacy_to_hash(legacy), objections="[]", responses="[]")
+    current_hash = current.to_hash()
+    current_bytes = current.to_bytes()
+
+    cases = [
+        ("encode (legacy to_dict+str)", lambda: legacy_to_hash(legacy)),
+        ("encode (to_hash)", lambda: current.to_hash()),
+        ("encode (to_bytes)", lambda: current.to_bytes()),
+        ("decode (legacy field-by-field)", lambda: legacy_from_hash(legacy.id, legacy_hash)),
+        ("decode (from_hash)", lambda: Prospect.from_hash(current.id, current_hash)),
+        ("decode (from_bytes)", lambda: Prospect.from_bytes(current_bytes)),
+    ]
+
+    print(f"{'case':34} {'us/op':>8}")
+    for name, fn in cases:
+        seconds = min(timeit.repeat(fn, number=iterations, repeat=3))
+        print(f"{name:34} {seconds / iterations * 1e6:8.2f}")
+
+    print()
+    print(f"{'memory per instance':34} {'bytes':>8}")
+    print(f"{'LegacyProspect':34} {_allocated(lambda: LegacyProspect(**SAMPLE)):8.0f}")
+    print(f"{'Prospect':34} {_allocated(lambda: Prospect(**SAMPLE)):8.0f}")
+    print(f"{'stored size (hash json / bytes)':34} {len(json.dumps(current_hash)):>4} / {len(current_bytes)}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
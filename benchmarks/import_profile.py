@@ -0,0 +1,107 @@
+"""
+Cold-start profile for agent workers: import time per module (python -X importtime) and,
+optionally, the module's prewarm(), against the worker's initialize_process_timeout.
+
+Run from the repo root:
+    python -m benchmarks.import_profile [module ...] [--top N] [--prewarm] [--timeout SECONDS]
+e.g.
+    python -m benchmarks.import_profile outbound_agent --prewarm
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Matches WorkerOptions(initialize_process_timeout=...) in the agent modules
+DEFAULT_TIMEOUT = 30.0
+
+_PREWARM_SNIPPET = """
+import json, sys, time, types
+started = time.perf_counter()
+module = __import__(sys.argv[1])
+imported = time.perf_counter()
+module.prewarm(types.SimpleNamespace(userdata={}))
+print(json.dumps({"import": imported - started, "prewarm": time.perf_counter() - imported}))
+"""
+
+
+def _run(args: List[str]) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *args], cwd=ROOT, capture_output=True, text=True)
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int, int]]:
+    """(module, depth, self_us, cumulative_us) for each line of -X importtime output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return rows
+
+
+def by_package(rows) -> Dict[str, int]:
+    """Self time summed per distribution-level package, e.g. livekit.plugins.openai or googleapiclient."""
+    totals: Dict[str, int] = defaultdict(int)
+    for name, _, self_us, _ in rows:
+        parts = name.split(".")
+        key = ".".join(parts[:3]) if parts[:2] == ["livekit", "plugins"] else parts[0]
+        totals[key] += self_us
+    return totals
+
+
+def profile(module: str, top: int, prewarm: bool, timeout: float) -> None:
+    started = time.perf_counter()
+    result = _run(["-X", "importtime", "-c", f"import {module}"])
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        print(f"{module}: import failed\n{result.stderr.strip().splitlines()[-1]}")
+        return
+
+    rows = parse_importtime(result.stderr)
+    total_us = sum(cumulative for _, depth, _, cumulative in rows if depth == 0)
+    print(f"\n{module}: {total_us / 1e6:.2f}s in imports, {wall:.2f}s wall (interpreter start included)")
+
+    print("  slowest packages (self time):")
+    for name, self_us in sorted(by_package(rows).items(), key=lambda item: -item[1])[:top]:
+        print(f"    {self_us / 1e3:9.1f} ms  {name}")
+
+    print("  slowest top-level imports (cumulative):")
+    roots = sorted((row for row in rows if row[1] == 0), key=lambda row: -row[3])
+    for name, _, _, cumulative_us in roots[:top]:
+        print(f"    {cumulative_us / 1e3:9.1f} ms  {name}")
+
+    cold_start = total_us / 1e6
+    if prewarm:
+        result = _run(["-c", _PREWARM_SNIPPET, module])
+        if result.returncode != 0:
+            print(f"  prewarm failed: {(result.stderr.strip().splitlines() or ['?'])[-1]}")
+        else:
+            timings = json.loads(result.stdout.strip().splitlines()[-1])
+            cold_start = timings["import"] + timings["prewarm"]
+            print(f"  prewarm(): {timings['prewarm']:.2f}s")
+
+    headroom = timeout - cold_start
+    print(f"  initialize_process_timeout headroom: {headroom:.2f}s of {timeout:.0f}s"
+          f"{'  <-- TOO SLOW' if headroom <= 0 else ''}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", default=["outbound_agent"])
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--prewarm", action="store_true", help="also time the module's prewarm()")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT)
+    args = parser.parse_args()
+    for module in args.modules:
+        profile(module, args.top, args.prewarm, args.timeout)
+
+
+if __name__ == "__main__":
+    main()
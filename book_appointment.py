@@ -4,11 +4,16 @@ import os
 import pickle
 import base64
 import logging
+import threading
 from google.auth.transport.requests import Request
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 from email.mime.text import MIMEText
-from repository.prospect_repository import get_prospect_from_db
+from repository.booking_ledger import (
+    CREATED, booking_request_id, claim_booking, get_booking, mark_booked, mark_created, release_booking,
+)
+from utils.monitoring_utils.worker_metrics import GOOGLE_LATENCY
 # -----------------------------
 # CONFIG
 # -----------------------------
@@ -19,6 +24,9 @@ CREDENTIALS_FILE = 'credentials.json'  # OAuth JSON from Google Cloud Console
 TOKEN_CAL = 'token_cal.pickle'
 TOKEN_GMAIL = 'token_gmail.pickle'
 
+# Refresh access tokens this long before they expire, so a booking never waits on it
+TOKEN_REFRESH_MARGIN = datetime.timedelta(minutes=5)
+
 logging.basicConfig(level=logging.INFO)
 
 
@@ -44,11 +52,59 @@ def authenticate_google(scopes, token_file):
     return creds
 
 
+# -----------------------------
+# CREDENTIAL & SERVICE CACHE
+# -----------------------------
+_creds_cache = {}
+_creds_lock = threading.Lock()
+# googleapiclient services (and their httplib2 transport) are not thread-safe,
+# so each booking thread keeps its own, all sharing the cached credentials.
+_local = threading.local()
+
+
+def _expires_soon(creds):
+    expiry = getattr(creds, "expiry", None)
+    return expiry is not None and datetime.datetime.utcnow() >= expiry - TOKEN_REFRESH_MARGIN
+
+
+def get_credentials(scopes, token_file):
+    """Process-wide credentials per token file, refreshed ahead of expiry."""
+    with _creds_lock:
+        creds = _creds_cache.get(token_file)
+        if creds is None:
+            creds = authenticate_google(scopes, token_file)
+            _creds_cache[token_file] = creds
+        elif creds.refresh_token and (not creds.valid or _expires_soon(creds)):
+            creds.refresh(Request())
+            with open(token_file, 'wb') as token:
+                pickle.dump(creds, token)
+            logging.info(f"Refreshed Google token for {token_file}")
+        return creds
+
+
+def get_service(name, version, scopes, token_file):
+    """Cached Google API service for the current thread, built from the bundled discovery document."""
+    creds = get_credentials(scopes, token_file)
+    services = getattr(_local, "services", None)
+    if services is None:
+        services = _local.services = {}
+
+    service = services.get((name, version))
+    if service is None:
+        service = build(name, version, credentials=creds, static_discovery=True, cache_discovery=False)
+        services[(name, version)] = service
+    return service
+
+
 # -----------------------------
 # CREATE CALENDAR EVENT
 # -----------------------------
-def create_calendar_event(service, summary, description, start_time, duration_minutes, attendee_email, timezone):
-    """Create Google Calendar event with Google Meet link."""
+def build_event_body(summary, description, start_time, duration_minutes, attendee_email, timezone, request_id=None):
+    """
+    Calendar event resource with a Google Meet create request.
+    With a `request_id` it is also used as the event id, so a repeated insert is rejected
+    by Calendar instead of creating a duplicate event.
+    """
     try:
         start_dt = datetime.datetime.strptime(start_time, "%Y-%m-%d %H:%M")
     except ValueError:
@@ -70,20 +126,44 @@ def create_calendar_event(service, summary, description, start_time, duration_mi
         'attendees': [{'email': attendee_email}],
         'conferenceData': {
             'createRequest': {
-                'requestId': f'meet-{start_dt.strftime("%Y%m%d%H%M")}',
+                'requestId': request_id or f'meet-{start_dt.strftime("%Y%m%d%H%M")}',
                 'conferenceSolutionKey': {'type': 'hangoutsMeet'}
             }
         },
     }
+    if request_id:
+        event['id'] = request_id
+    return event
 
-    created_event = service.events().insert(
+
+def insert_event_request(service, event):
+    return service.events().insert(
         calendarId='primary',
         body=event,
         conferenceDataVersion=1,
         sendUpdates='all'
-    ).execute()
+    )
+
+
+def get_meet_link(created_event):
+    return created_event['conferenceData']['entryPoints'][0]['uri']
+
+
+def create_calendar_event(service, summary, description, start_time, duration_minutes, attendee_email, timezone, request_id=None):
+    """Create Google Calendar event with Google Meet link."""
+    event = build_event_body(summary, description, start_time, duration_minutes, attendee_email, timezone, request_id)
+    try:
+        with GOOGLE_LATENCY.time(call="calendar.insert"):
+            created_event = insert_event_request(service, event).execute()
+    except HttpError as e:
+        if not request_id or e.resp.status != 409:
+            raise
+        # An earlier attempt already created this event
+        logging.info(f"Calendar event {request_id} already exists, reusing it")
+        with GOOGLE_LATENCY.time(call="calendar.get"):
+            created_event = service.events().get(calendarId='primary', eventId=request_id).execute()
 
-    meet_link = created_event['conferenceData']['entryPoints'][0]['uri']
+    meet_link = get_meet_link(created_event)
     logging.info(f"Calendar event created: {created_event.get('htmlLink')}")
     logging.info(f"Google Meet link: {meet_link}")
 
@@ -93,15 +173,44 @@ def create_calendar_event(service, summary, description, start_time, duration_mi
 # -----------------------------
 # SEND EMAIL
 # -----------------------------
-def send_email(service, to, subject, message_text):
-    """Send email using Gmail API."""
+def build_email_message(to, subject, message_text):
+    """Gmail API message resource."""
     message = MIMEText(message_text)
     message['to'] = to
     message['subject'] = subject
     raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode()
-    message_obj = {'raw': raw_message}
+    return {'raw': raw_message}
+
+
+def build_confirmation_email(summary, description, start_time, duration, timezone, meet_link):
+    """Subject and body of the booking confirmation email."""
+    email_subject = f"Appointment Scheduled: {summary}"
+    email_body = f"""
+Hello,
+
+Your appointment has been scheduled.
+
+📌 Title: {summary}
+📝 Description: {description}
+📅 Date & Time: {start_time} ({timezone})
+⏳ Duration: {duration} minutes
+🔗 Google Meet link: {meet_link}
+
+See you then!
+"""
+    return email_subject, email_body
+
+
+def send_email_request(service, message_obj):
+    return service.users().messages().send(userId='me', body=message_obj)
+
 
-    sent_msg = service.users().messages().send(userId='me', body=message_obj).execute()
+def send_email(service, to, subject, message_text):
+    """Send email using Gmail API."""
+    message_obj = build_email_message(to, subject, message_text)
+
+    with GOOGLE_LATENCY.time(call="gmail.send"):
+        sent_msg = send_email_request(service, message_obj).execute()
     logging.info(f"Email sent to {to} with ID: {sent_msg['id']}")
     return sent_msg
 
@@ -109,52 +218,195 @@ def send_email(service, to, subject, message_text):
 # -----------------------------
 # MAIN BOOKING FUNCTION
 # -----------------------------
-def schedule_appointment(summary, description, start_time, attendee_email, duration=30, timezone="Asia/Kolkata"):
+def schedule_appointment(summary, description, start_time, attendee_email, duration=30, timezone="Asia/Kolkata", prospect_id=None):
     """
     1. Create Google Calendar event with Meet link.
     2. Send confirmation email with meeting details.
+    With a `prospect_id` the slot is first claimed in the prospect's booking ledger;
+    if it is already booked (or being booked) nothing is sent and `duplicate` is True.
+    The ledger records the event before the email, so a retry after a failed email
+    sends only the email.
     """
-    creds_cal = authenticate_google(SCOPES_CAL, TOKEN_CAL)
-    creds_gmail = authenticate_google(SCOPES_GMAIL, TOKEN_GMAIL)
+    request_id = None
+    event = None
+    if prospect_id:
+        if not claim_booking(prospect_id, start_time):
+            booked = get_booking(prospect_id, start_time) or {}
+            if booked.get("status") != CREATED:
+                logging.info(f"Appointment for prospect {prospect_id} at {start_time} already booked, skipping")
+                return {"event": {"id": booked.get("event_id")}, "meet_link": booked.get("meet_link"), "duplicate": True}
+            logging.info(f"Event for prospect {prospect_id} at {start_time} exists, sending its confirmation email")
+            event, meet_link = {"id": booked.get("event_id")}, booked.get("meet_link")
+        request_id = booking_request_id(prospect_id, start_time)
 
-    service_cal = build('calendar', 'v3', credentials=creds_cal)
-    service_gmail = build('gmail', 'v1', credentials=creds_gmail)
+    service_cal = get_service('calendar', 'v3', SCOPES_CAL, TOKEN_CAL)
+    service_gmail = get_service('gmail', 'v1', SCOPES_GMAIL, TOKEN_GMAIL)
 
     try:
         # Step 1: Create Calendar Event with Meet link
-        event, meet_link = create_calendar_event(
-            service_cal, summary, description, start_time, duration, attendee_email, timezone
-        )
+        if event is None:
+            event, meet_link = create_calendar_event(
+                service_cal, summary, description, start_time, duration, attendee_email, timezone, request_id
+            )
+            if prospect_id:
+                mark_created(prospect_id, start_time, event.get("id"), meet_link)
 
         # Step 2: Send Confirmation Email
-        email_subject = f"Appointment Scheduled: {summary}"
-        email_body = f"""
-Hello,
-
-Your appointment has been scheduled.
-
-📌 Title: {summary}
-📝 Description: {description}
-📅 Date & Time: {start_time} ({timezone})
-⏳ Duration: {duration} minutes
-🔗 Google Meet link: {meet_link}
-
-See you then!
-"""
+        email_subject, email_body = build_confirmation_email(
+            summary, description, start_time, duration, timezone, meet_link
+        )
 
         send_email(service_gmail, attendee_email, email_subject, email_body)
         logging.info(f"Meeting details sent to {attendee_email}")
+        if prospect_id:
+            mark_booked(prospect_id, start_time, event.get("id"), meet_link)
 
         return {
             "event": event,
-            "meet_link": meet_link
+            "meet_link": meet_link,
+            "duplicate": False
         }
 
     except Exception as e:
+        if prospect_id:
+            release_booking(prospect_id, start_time)
         logging.error(f"Error scheduling appointment: {e}", exc_info=True)
         raise
 
 
+# -----------------------------
+# BULK BOOKING
+# -----------------------------
+# Google allows up to 50 calls per Calendar batch request (Gmail up to 100)
+BATCH_SIZE = 50
+
+
+def _execute_batch(service, requests, batch_size=BATCH_SIZE):
+    """
+    Run {request_id: HttpRequest} through batch HTTP requests.
+    Returns {request_id: (response, error)}; one failing call does not fail the others, and
+    neither does a failing batch request (network, auth refresh, 5xx): every call in that
+    chunk without a response of its own gets the batch's error.
+    """
+    results = {}
+
+    def callback(request_id, response, exception):
+        results[request_id] = (response, exception)
+
+    items = list(requests.items())
+    for start in range(0, len(items), batch_size):
+        chunk = items[start:start + batch_size]
+        batch = service.new_batch_http_request(callback=callback)
+        for request_id, request in chunk:
+            batch.add(request, request_id=request_id)
+        try:
+            with GOOGLE_LATENCY.time(call="batch"):
+                batch.execute()
+        except Exception as e:
+            logging.error(f"Batch of {len(chunk)} requests failed: {e}")
+            for request_id, _ in chunk:
+                results.setdefault(request_id, (None, e))
+    return results
+
+
+def schedule_appointments_bulk(bookings, batch_size=BATCH_SIZE):
+    """
+    Book many appointments with batched Calendar inserts, then batched confirmation emails.
+
+    `bookings` is a list of dicts with the `schedule_appointment` arguments (including
+    optional `prospect_id`, checked against the booking ledger like a single booking).
+    Returns one result per booking, in order:
+        {"event": ..., "meet_link": ..., "email_id": ..., "duplicate": bool, "error": None | str}
+    An item whose event insert fails gets no email; an item whose email fails keeps its event,
+    and booking it again sends just the email.
+    """
+    service_cal = get_service('calendar', 'v3', SCOPES_CAL, TOKEN_CAL)
+    service_gmail = get_service('gmail', 'v1', SCOPES_GMAIL, TOKEN_GMAIL)
+
+    results = [{"event": None, "meet_link": None, "email_id": None, "duplicate": False, "error": None} for _ in bookings]
+    bookings = [dict({"duration": 30, "timezone": "Asia/Kolkata"}, **b) for b in bookings]
+
+    # Step 1: Calendar events
+    event_requests = {}
+    event_ids = {}
+    for i, b in enumerate(bookings):
+        prospect_id = b.get("prospect_id")
+        request_id = None
+        try:
+            if prospect_id:
+                if not claim_booking(prospect_id, b["start_time"]):
+                    booked = get_booking(prospect_id, b["start_time"]) or {}
+                    if booked.get("status") == CREATED:
+                        # Event made by an earlier attempt: only its confirmation email is owed
+                        results[i].update(event={"id": booked.get("event_id")}, meet_link=booked.get("meet_link"))
+                    else:
+                        results[i].update(meet_link=booked.get("meet_link"), duplicate=True)
+                    continue
+                request_id = booking_request_id(prospect_id, b["start_time"])
+                event_ids[str(i)] = request_id
+            event = build_event_body(
+                b["summary"], b["description"], b["start_time"], b["duration"], b["attendee_email"], b["timezone"], request_id
+            )
+            event_requests[str(i)] = insert_event_request(service_cal, event)
+        except Exception as e:
+            results[i]["error"] = f"event: {e}"
+            if request_id:
+                release_booking(prospect_id, b["start_time"])
+
+    created = _execute_batch(service_cal, event_requests, batch_size)
+    # As for a single booking, a 409 on the deterministic event id means an earlier attempt
+    # already created the event: fetch it and carry on with the email
+    existing = {
+        request_id: service_cal.events().get(calendarId='primary', eventId=event_ids[request_id])
+        for request_id, (_, error) in created.items()
+        if request_id in event_ids and isinstance(error, HttpError) and error.resp.status == 409
+    }
+    if existing:
+        logging.info(f"{len(existing)} calendar events already exist, reusing them")
+        created.update(_execute_batch(service_cal, existing, batch_size))
+
+    for request_id, (created_event, error) in created.items():
+        i = int(request_id)
+        prospect_id = bookings[i].get("prospect_id")
+        if error is not None:
+            results[i]["error"] = f"event: {error}"
+            if prospect_id:
+                release_booking(prospect_id, bookings[i]["start_time"])
+            continue
+        results[i]["event"] = created_event
+        try:
+            results[i]["meet_link"] = get_meet_link(created_event)
+        except (KeyError, IndexError):
+            results[i]["meet_link"] = None
+        if prospect_id:
+            mark_created(prospect_id, bookings[i]["start_time"], created_event.get("id"), results[i]["meet_link"])
+
+    # Step 2: Confirmation emails for the events that were created
+    email_requests = {}
+    for i, b in enumerate(bookings):
+        if results[i]["event"] is None:
+            continue
+        email_subject, email_body = build_confirmation_email(
+            b["summary"], b["description"], b["start_time"], b["duration"], b["timezone"], results[i]["meet_link"]
+        )
+        message_obj = build_email_message(b["attendee_email"], email_subject, email_body)
+        email_requests[str(i)] = send_email_request(service_gmail, message_obj)
+
+    for request_id, (sent_msg, error) in _execute_batch(service_gmail, email_requests, batch_size).items():
+        i = int(request_id)
+        if error is not None:
+            results[i]["error"] = f"email: {error}"
+            continue
+        results[i]["email_id"] = sent_msg["id"]
+        prospect_id = bookings[i].get("prospect_id")
+        if prospect_id:
+            mark_booked(prospect_id, bookings[i]["start_time"], results[i]["event"].get("id"), results[i]["meet_link"])
+
+    failed = sum(1 for r in results if r["error"])
+    logging.info(f"Bulk booking finished: {len(results) - failed} ok, {failed} failed")
+    return results
+
+
 # -----------------------------
 # EXAMPLE RUN
 # -----------------------------
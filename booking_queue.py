@@ -0,0 +1,407 @@
+"""
+Background booking queue.
+
+`schedule_appointment` blocks for seconds (OAuth refresh, Calendar insert, Gmail send),
+so agent tools enqueue a booking job here and return straight away. Jobs are stored in a
+local SQLite file so they survive a worker restart, and are run by a small thread pool
+with retries. Each job is keyed by an idempotency key: enqueueing the same booking twice
+returns the existing job instead of creating a second calendar event.
+
+Every job process of the worker shares the file. A running job records which queue owns it
+and that queue heartbeats it; a job is only handed back to the pending pool once its owner
+process has died or its heartbeat has gone stale, so a live process's job never runs twice.
+Each queue starts draining (and adopting such orphans) as soon as it is built, and agents
+await `drain_bookings()` on shutdown so their jobs finish before the process exits.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from utils.config_utils.env_loader import get_env_var
+from utils.monitoring_utils.logging import get_logger
+
+logger = get_logger("booking-queue")
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+QUEUE_DB = get_env_var("BOOKING_QUEUE_DB", required=False, default="bookings.db")
+WORKERS = int(get_env_var("BOOKING_QUEUE_WORKERS", required=False, default="2"))
+MAX_ATTEMPTS = 3
+RETRY_BASE_SECONDS = 2.0
+POLL_SECONDS = 0.5
+HEARTBEAT_SECONDS = 5.0
+# A running job whose owner has not heartbeated for this long is handed back
+STALE_SECONDS = 60.0
+# How long an agent's shutdown waits for its queued bookings
+DRAIN_SECONDS = float(get_env_var("BOOKING_DRAIN_SECONDS", required=False, default="30"))
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+FINAL_STATES = (DONE, FAILED)
+
+BookingListener = Callable[[Dict], None]
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def booking_key(attendee_email: str, start_time: str, summary: str = "") -> str:
+    """Default idempotency key: one booking per attendee, slot and title."""
+    raw = f"{(attendee_email or '').strip().lower()}|{start_time}|{summary}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+class BookingQueue:
+    def __init__(self, db_path: str = QUEUE_DB, workers: int = WORKERS, max_attempts: int = MAX_ATTEMPTS):
+        self.max_attempts = max_attempts
+        # pid plus a nonce: a recycled pid is never mistaken for the queue that claimed a job
+        self.owner = f"{os.getpid()}:{secrets.token_hex(4)}"
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db_lock = threading.Lock()
+        self._listeners: Dict[str, List[BookingListener]] = {}
+        self._listeners_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="booking")
+        self._slots = threading.Semaphore(workers)
+        self._dispatcher: Optional[threading.Thread] = None
+        # Keys enqueued through this queue that `drain()` waits for
+        self._enqueued: set = set()
+        self._last_heartbeat = 0.0
+        self._init_db()
+        self.recover_orphans()
+        self.start()
+
+    # -----------------------------
+    # STORAGE
+    # -----------------------------
+    def _init_db(self) -> None:
+        with self._db_lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS booking_jobs (
+                    key TEXT PRIMARY KEY,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    result TEXT,
+                    error TEXT,
+                    next_attempt_at REAL NOT NULL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    owner TEXT,
+                    heartbeat_at REAL
+                )
+                """
+            )
+            columns = {row["name"] for row in self._db.execute("PRAGMA table_info(booking_jobs)")}
+            for column, kind in (("owner", "TEXT"), ("heartbeat_at", "REAL")):
+                if column not in columns:
+                    try:
+                        self._db.execute(f"ALTER TABLE booking_jobs ADD COLUMN {column} {kind}")
+                    except sqlite3.OperationalError:
+                        pass  # Added by another process in the meantime
+
+    def recover_orphans(self) -> int:
+        """
+        Hand running jobs back to the pending pool when their owner process is gone or has
+        stopped heartbeating. Jobs of live owners are left alone.
+        """
+        now = time.time()
+        recovered = 0
+        with self._db_lock:
+            rows = self._db.execute(
+                "SELECT key, owner, heartbeat_at FROM booking_jobs WHERE status = ?", (RUNNING,)
+            ).fetchall()
+            for row in rows:
+                owner, heartbeat_at = row["owner"], row["heartbeat_at"] or 0.0
+                if owner == self.owner:
+                    continue
+                alive = owner is not None and _pid_alive(int(owner.split(":")[0]))
+                if alive and now - heartbeat_at < STALE_SECONDS:
+                    continue
+                recovered += self._db.execute(
+                    "UPDATE booking_jobs SET status = ?, owner = NULL, next_attempt_at = ?, updated_at = ? "
+                    "WHERE key = ? AND status = ? AND owner IS ?",
+                    (PENDING, now, now, row["key"], RUNNING, owner),
+                ).rowcount
+        if recovered:
+            logger.warning(f"Recovered {recovered} orphaned booking jobs")
+            self._wake.set()
+        return recovered
+
+    def _heartbeat(self) -> None:
+        now = time.time()
+        with self._db_lock:
+            self._db.execute(
+                "UPDATE booking_jobs SET heartbeat_at = ? WHERE status = ? AND owner = ?",
+                (now, RUNNING, self.owner),
+            )
+
+    def _row(self, key: str) -> Optional[Dict]:
+        with self._db_lock:
+            row = self._db.execute("SELECT * FROM booking_jobs WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def _claim_next(self) -> Optional[Dict]:
+        now = time.time()
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT key FROM booking_jobs WHERE status = ? AND next_attempt_at <= ? "
+                "ORDER BY next_attempt_at LIMIT 1",
+                (PENDING, now),
+            ).fetchone()
+            if row is None:
+                return None
+            claimed = self._db.execute(
+                "UPDATE booking_jobs SET status = ?, attempts = attempts + 1, owner = ?, heartbeat_at = ?, "
+                "updated_at = ? WHERE key = ? AND status = ?",
+                (RUNNING, self.owner, now, now, row["key"], PENDING),
+            ).rowcount
+        return self._row(row["key"]) if claimed else None
+
+    def _finish(self, key: str, status: str, result=None, error: Optional[str] = None, retry_at: float = 0.0) -> bool:
+        # Only the owner settles a job; False if it was handed to another queue meanwhile
+        with self._db_lock:
+            return self._db.execute(
+                "UPDATE booking_jobs SET status = ?, result = ?, error = ?, next_attempt_at = ?, updated_at = ?, "
+                "owner = NULL WHERE key = ? AND status = ? AND owner = ?",
+                (status, json.dumps(result) if result is not None else None, error, retry_at, time.time(),
+                 key, RUNNING, self.owner),
+            ).rowcount > 0
+
+    # -----------------------------
+    # PUBLIC API
+    # -----------------------------
+    def enqueue(self, idempotency_key: str, payload: Dict, on_done: Optional[BookingListener] = None) -> Dict:
+        """
+        Add a booking job. If the key already exists the existing job is returned unchanged,
+        except a job that failed for good, which is re-armed for another round of attempts.
+        """
+        now = time.time()
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR IGNORE INTO booking_jobs (key, payload, status, next_attempt_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (idempotency_key, json.dumps(payload), PENDING, now, now, now),
+            )
+            self._db.execute(
+                "UPDATE booking_jobs SET status = ?, attempts = 0, next_attempt_at = ?, updated_at = ? "
+                "WHERE key = ? AND status = ?",
+                (PENDING, now, now, idempotency_key, FAILED),
+            )
+        self._enqueued.add(idempotency_key)
+        if on_done is not None:
+            self.add_listener(idempotency_key, on_done)
+        self.start()
+        self._wake.set()
+        return self._row(idempotency_key)
+
+    def status(self, idempotency_key: str) -> Optional[Dict]:
+        return self._row(idempotency_key)
+
+    def add_listener(self, idempotency_key: str, listener: BookingListener) -> None:
+        """Call `listener(job)` from a worker thread once the job is done or has failed for good."""
+        with self._listeners_lock:
+            self._listeners.setdefault(idempotency_key, []).append(listener)
+        job = self._row(idempotency_key)
+        if job and job["status"] in FINAL_STATES:
+            self._notify(job)
+
+    async def wait_for(self, idempotency_key: str, timeout: Optional[float] = None) -> Optional[Dict]:
+        """Await the final state of a job; returns the latest status on timeout."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def resolve(job: Dict) -> None:
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(job))
+
+        self.add_listener(idempotency_key, resolve)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return self.status(idempotency_key)
+
+    async def drain(self, timeout: Optional[float] = None) -> List[Dict]:
+        """Await every job enqueued through this queue; returns their latest status."""
+        keys = list(self._enqueued)
+        try:
+            await asyncio.wait_for(asyncio.gather(*(self.wait_for(key) for key in keys)), timeout)
+        except asyncio.TimeoutError:
+            pass
+        jobs = [job for job in map(self.status, keys) if job is not None]
+        self._enqueued.difference_update(job["key"] for job in jobs if job["status"] in FINAL_STATES)
+        return jobs
+
+    def _notify(self, job: Dict) -> None:
+        with self._listeners_lock:
+            listeners = self._listeners.pop(job["key"], [])
+        for listener in listeners:
+            try:
+                listener(job)
+            except Exception as e:
+                logger.error(f"Booking listener failed for {job['key']}: {e}")
+
+    # -----------------------------
+    # WORKER
+    # -----------------------------
+    def start(self) -> None:
+        if self._dispatcher is not None and self._dispatcher.is_alive():
+            return
+        self._stop.clear()
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name="booking-dispatcher", daemon=True)
+        self._dispatcher.start()
+
+    def stop(self, wait: bool = True) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._dispatcher is not None and wait:
+            self._dispatcher.join()
+        self._pool.shutdown(wait=wait)
+
+    def _tick(self) -> None:
+        now = time.time()
+        if now - self._last_heartbeat < HEARTBEAT_SECONDS:
+            return
+        self._last_heartbeat = now
+        try:
+            self._heartbeat()
+            self.recover_orphans()
+        except sqlite3.Error as e:
+            logger.warning(f"Booking queue heartbeat failed: {e}")
+
+    def _dispatch_loop(self) -> None:
+        while not self._stop.is_set():
+            self._tick()
+            # Time out while every worker is busy so running jobs keep heartbeating
+            if not self._slots.acquire(timeout=POLL_SECONDS):
+                continue
+            job = self._claim_next()
+            if job is None:
+                self._slots.release()
+                self._wake.wait(POLL_SECONDS)
+                self._wake.clear()
+                continue
+            self._pool.submit(self._run, job)
+
+    def _run(self, job: Dict) -> None:
+        # Imported here so Google client libraries load on the worker thread, not at agent import
+        from book_appointment import schedule_appointment
+
+        key = job["key"]
+        try:
+            result = schedule_appointment(**job["payload"])
+            if self._finish(key, DONE, result={
+                "meet_link": result.get("meet_link"),
+                "event_id": result["event"].get("id"),
+                "duplicate": result.get("duplicate", False),
+            }):
+                logger.info(f"Booking {key} done on attempt {job['attempts']}")
+        except Exception as e:
+            if job["attempts"] < self.max_attempts:
+                retry_at = time.time() + RETRY_BASE_SECONDS * (2 ** (job["attempts"] - 1))
+                if self._finish(key, PENDING, error=str(e), retry_at=retry_at):
+                    logger.warning(f"Booking {key} attempt {job['attempts']} failed, retrying: {e}")
+            elif self._finish(key, FAILED, error=str(e)):
+                logger.error(f"Booking {key} failed after {job['attempts']} attempts: {e}")
+        finally:
+            self._slots.release()
+            self._wake.set()
+
+        final = self._row(key)
+        if final and final["status"] in FINAL_STATES:
+            self._notify(final)
+
+
+_queue: Optional[BookingQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_booking_queue() -> BookingQueue:
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = BookingQueue()
+        return _queue
+
+
+def enqueue_booking(
+    summary,
+    description,
+    start_time,
+    attendee_email,
+    duration=30,
+    timezone="Asia/Kolkata",
+    prospect_id: Optional[str] = None,
+    idempotency_key: Optional[str] = None,
+    on_done: Optional[BookingListener] = None,
+) -> str:
+    """
+    Queue a `schedule_appointment` call and return its idempotency key immediately.
+    With a `prospect_id` the key is the prospect's booking-ledger id for the slot.
+    """
+    if idempotency_key is None:
+        if prospect_id:
+            # Imported here: keeps the queue, and its tests, clear of the Redis client
+            from repository.booking_ledger import booking_request_id
+            idempotency_key = booking_request_id(prospect_id, start_time)
+        else:
+            idempotency_key = booking_key(attendee_email, start_time, summary)
+    key = idempotency_key
+    payload = {
+        "summary": summary,
+        "description": description,
+        "start_time": start_time,
+        "attendee_email": attendee_email,
+        "duration": duration,
+        "timezone": timezone,
+        "prospect_id": prospect_id,
+    }
+    job = get_booking_queue().enqueue(key, payload, on_done)
+    logger.info(f"Booking {key} queued (status: {job['status']})")
+    return key
+
+
+def get_booking_status(idempotency_key: str) -> Optional[Dict]:
+    return get_booking_queue().status(idempotency_key)
+
+
+async def wait_for_booking(idempotency_key: str, timeout: Optional[float] = None) -> Optional[Dict]:
+    return await get_booking_queue().wait_for(idempotency_key, timeout)
+
+
+async def drain_bookings(timeout: Optional[float] = DRAIN_SECONDS) -> None:
+    """
+    Job shutdown callback: wait for the bookings this process queued. Jobs still unfinished
+    at the timeout stay in the queue and are adopted by the next process once this one exits.
+    """
+    if _queue is None:
+        return  # Nothing was queued in this process
+    jobs = await _queue.drain(timeout)
+    unfinished = [job["key"] for job in jobs if job["status"] not in FINAL_STATES]
+    if unfinished:
+        logger.warning(f"Bookings still queued at shutdown: {unfinished}")
@@ -0,0 +1,355 @@
+"""
+Campaign dialer.
+
+Places outbound calls for a list of leads concurrently instead of one by one:
+- a pool of asyncio workers places the calls;
+- each SIP trunk has a token-bucket calls-per-second limit and a cap on concurrent calls;
+- the total in flight is capped per agent worker, and new calls are held back while the
+  agent workers report themselves full (see load_monitor.WORKER_LOAD_KEY);
+- every lead's progress is stored in Redis, so re-running a campaign resumes where it stopped.
+
+A call holds its trunk and worker slot from dialing until its room is gone.
+"""
+import asyncio
+import json
+import time
+from typing import AsyncIterable, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from livekit import api
+from repository.prospect_repository import async_get_prospect_ids_by_status, async_iter_prospects_bulk
+from utils.agent_utils.livekit_client import close_livekit_api, get_livekit_api
+from utils.config_utils.db_config import get_async_redis
+from utils.config_utils.env_loader import get_env_var
+from utils.monitoring_utils.load_monitor import HEARTBEAT_SECONDS, LOAD_THRESHOLD, WORKER_LOAD_KEY
+from utils.monitoring_utils.logging import get_logger
+
+logger = get_logger("campaign-dialer")
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+DIALER_WORKERS = int(get_env_var("DIALER_WORKERS", required=False, default="20"))
+CALLS_PER_SECOND = float(get_env_var("DIALER_CALLS_PER_SECOND", required=False, default="1"))
+CALL_BURST = int(get_env_var("DIALER_CALL_BURST", required=False, default="1"))
+MAX_CALLS_PER_TRUNK = int(get_env_var("DIALER_MAX_CALLS_PER_TRUNK", required=False, default="10"))
+MAX_CALLS_PER_WORKER = int(get_env_var("DIALER_MAX_CALLS_PER_WORKER", required=False, default="4"))
+# Used when no agent worker publishes its load
+AGENT_WORKERS = int(get_env_var("AGENT_WORKERS", required=False, default="1"))
+# Room polling, and how long a call may hold its slots at most
+ROOM_POLL_SECONDS = 5.0
+MAX_CALL_SECONDS = 30 * 60
+CAPACITY_POLL_SECONDS = 1.0
+
+PENDING = "pending"
+DIALING = "dialing"
+IN_CALL = "in_call"
+DONE = "done"
+FAILED = "failed"
+INTERRUPTED = "interrupted"
+# Leads in these states are not dialed again when a campaign resumes
+SETTLED_STATES = (DONE, FAILED, INTERRUPTED)
+
+Lead = Tuple[str, str]
+DialFunc = Callable[[str, str, str], Awaitable[Optional[str]]]
+
+
+def progress_key(campaign_id: str) -> str:
+    return f"campaign:{campaign_id}:calls"
+
+
+# -------------------------------Rate limiting and concurrency caps-------------------------------
+class TokenBucket:
+    """`rate` calls per second on average, with bursts of up to `burst`."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class Trunk:
+    def __init__(self, trunk_id: str, rate: float = CALLS_PER_SECOND, burst: int = CALL_BURST,
+                 max_calls: int = MAX_CALLS_PER_TRUNK):
+        self.trunk_id = trunk_id
+        self.max_calls = max_calls
+        self.active = 0
+        self.bucket = TokenBucket(rate, burst)
+
+
+class TrunkPool:
+    """Hands out the least busy trunk with a free call slot, then waits for its rate limit."""
+
+    def __init__(self, trunks: List[Trunk]):
+        if not trunks:
+            raise ValueError("At least one SIP trunk is required")
+        self.trunks = trunks
+        self._cond = asyncio.Condition()
+
+    async def acquire(self) -> Trunk:
+        async with self._cond:
+            await self._cond.wait_for(lambda: any(t.active < t.max_calls for t in self.trunks))
+            trunk = min((t for t in self.trunks if t.active < t.max_calls), key=lambda t: t.active)
+            trunk.active += 1
+        await trunk.bucket.acquire()
+        return trunk
+
+    async def release(self, trunk: Trunk) -> None:
+        async with self._cond:
+            trunk.active -= 1
+            self._cond.notify_all()
+
+
+class AgentCapacity:
+    """
+    Caps calls in flight at MAX_CALLS_PER_WORKER per live agent worker and holds new calls
+    while every worker reports a load at the threshold or no free job slot.
+    """
+
+    def __init__(self, per_worker: int = MAX_CALLS_PER_WORKER, fallback_workers: int = AGENT_WORKERS):
+        self.per_worker = per_worker
+        self.fallback_workers = fallback_workers
+        self.in_flight = 0
+        self._workers: List[Dict] = []
+        self._refreshed_at = 0.0
+        self._started_since_refresh = 0
+        self._lock = asyncio.Lock()
+
+    async def _refresh(self) -> None:
+        if time.monotonic() - self._refreshed_at < HEARTBEAT_SECONDS:
+            return
+        self._refreshed_at = time.monotonic()
+        self._started_since_refresh = 0
+        client = get_async_redis()
+        try:
+            entries = await client.hgetall(WORKER_LOAD_KEY) or {}
+        except Exception as e:
+            logger.warning(f"Could not read agent worker load: {e}")
+            return
+        fresh, stale = [], []
+        for worker_id, raw in entries.items():
+            status = json.loads(raw)
+            if time.time() - status["at"] < 3 * HEARTBEAT_SECONDS:
+                fresh.append(status)
+            else:
+                stale.append(worker_id)
+        if stale:
+            await client.hdel(WORKER_LOAD_KEY, *stale)
+        self._workers = fresh
+
+    def _has_room(self) -> bool:
+        workers = len(self._workers) or self.fallback_workers
+        if self.in_flight >= workers * self.per_worker:
+            return False
+        if not self._workers:
+            return True
+        free = sum(
+            max(0, w["ceiling"] - w["active"]) for w in self._workers if w["load"] < LOAD_THRESHOLD
+        )
+        # Calls started since the last heartbeat are not counted in it yet
+        return free - self._started_since_refresh > 0
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                await self._refresh()
+                if self._has_room():
+                    self.in_flight += 1
+                    self._started_since_refresh += 1
+                    return
+                await asyncio.sleep(CAPACITY_POLL_SECONDS)
+
+    def release(self) -> None:
+        self.in_flight -= 1
+
+
+# -------------------------------Call tracking-------------------------------
+class RoomWatcher:
+    """One list_rooms request per poll for every active call; resolves a call's future when its room is gone."""
+
+    def __init__(self, lkapi: api.LiveKitAPI):
+        self._lkapi = lkapi
+        self._calls: Dict[str, Tuple[asyncio.Future, float]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def watch(self, room_name: str) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self._calls[room_name] = (future, time.monotonic())
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._poll())
+        return future
+
+    async def _poll(self) -> None:
+        while self._calls:
+            await asyncio.sleep(ROOM_POLL_SECONDS)
+            try:
+                response = await self._lkapi.room.list_rooms(api.ListRoomsRequest(names=list(self._calls)))
+                alive = {room.name for room in response.rooms}
+            except Exception as e:
+                logger.warning(f"Could not list rooms: {e}")
+                continue
+            now = time.monotonic()
+            for room_name, (future, started) in list(self._calls.items()):
+                if room_name not in alive or now - started > MAX_CALL_SECONDS:
+                    del self._calls[room_name]
+                    if not future.done():
+                        future.set_result(room_name in alive)
+
+    async def aclose(self) -> None:
+        if self._task:
+            self._task.cancel()
+
+
+# -------------------------------Progress in Redis-------------------------------
+class CampaignProgress:
+    def __init__(self, campaign_id: str):
+        self.campaign_id = campaign_id
+        self.key = progress_key(campaign_id)
+
+    async def load(self) -> Dict[str, str]:
+        """Lead states from an earlier run. Calls cut off by a restart are settled as interrupted, not redialed."""
+        client = get_async_redis()
+        states = await client.hgetall(self.key) or {}
+        cut_off = {lead: INTERRUPTED for lead, state in states.items() if state in (DIALING, IN_CALL)}
+        if cut_off:
+            await client.hset(self.key, values=cut_off)
+            states.update(cut_off)
+            logger.warning(f"Campaign {self.campaign_id}: {len(cut_off)} calls were cut off by a restart")
+        return states
+
+    async def mark(self, prospect_id: str, state: str) -> None:
+        await get_async_redis().hset(self.key, prospect_id, state)
+
+    async def summary(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for state in (await get_async_redis().hgetall(self.key) or {}).values():
+            counts[state] = counts.get(state, 0) + 1
+        return counts
+
+
+# -------------------------------Dialer-------------------------------
+class CampaignDialer:
+    def __init__(self, campaign_id: str, dial: DialFunc, trunk_ids: List[str], workers: int = DIALER_WORKERS):
+        self.campaign_id = campaign_id
+        self.dial = dial
+        self.workers = workers
+        self.trunks = TrunkPool([Trunk(trunk_id) for trunk_id in trunk_ids])
+        self.capacity = AgentCapacity()
+        self.progress = CampaignProgress(campaign_id)
+        self._calls: Set[asyncio.Task] = set()
+
+    async def run(self, leads: AsyncIterable[Lead]) -> Dict[str, int]:
+        settled = {lead for lead, state in (await self.progress.load()).items() if state in SETTLED_STATES}
+        if settled:
+            logger.info(f"Campaign {self.campaign_id}: resuming, {len(settled)} leads already settled")
+
+        # Bounded, so reading leads pauses while the workers are all waiting on a slot
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.workers * 2)
+        # The same pooled client the dial function uses, so polling shares its connections
+        watcher = RoomWatcher(get_livekit_api())
+        workers = [asyncio.create_task(self._worker(queue, watcher)) for _ in range(self.workers)]
+        try:
+            async for prospect_id, phone in leads:
+                if prospect_id in settled:
+                    continue
+                await self.progress.mark(prospect_id, PENDING)
+                await queue.put((prospect_id, phone))
+            await queue.join()
+            if self._calls:
+                await asyncio.gather(*self._calls, return_exceptions=True)
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await watcher.aclose()
+
+        summary = await self.progress.summary()
+        logger.info(f"Campaign {self.campaign_id} finished: {summary}")
+        return summary
+
+    async def _worker(self, queue: asyncio.Queue, watcher: RoomWatcher) -> None:
+        while True:
+            prospect_id, phone = await queue.get()
+            try:
+                await self._place_call(prospect_id, phone, watcher)
+            except Exception as e:
+                logger.error(f"Unexpected error dialing {phone}: {e}")
+            finally:
+                queue.task_done()
+
+    def _releaser(self, trunk: Trunk) -> Callable[[], Awaitable[None]]:
+        released = False
+
+        async def release() -> None:
+            nonlocal released
+            if not released:
+                released = True
+                self.capacity.release()
+                await self.trunks.release(trunk)
+
+        return release
+
+    async def _place_call(self, prospect_id: str, phone: str, watcher: RoomWatcher) -> None:
+        await self.capacity.acquire()
+        trunk = await self.trunks.acquire()
+        release = self._releaser(trunk)
+        room_name = None
+        try:
+            await self.progress.mark(prospect_id, DIALING)
+            logger.info(f"Dialing {phone} on {trunk.trunk_id} ({trunk.active}/{trunk.max_calls} on trunk)")
+            room_name = await self.dial(phone, prospect_id, trunk.trunk_id)
+        except Exception as e:
+            logger.error(f"Call to {phone} failed: {e}")
+        finally:
+            if not room_name:
+                await release()
+        if not room_name:
+            await self.progress.mark(prospect_id, FAILED)
+            return
+
+        # The worker moves on to the next lead; the slots are held until the call ends
+        call = asyncio.create_task(self._finish_call(prospect_id, room_name, watcher.watch(room_name), release))
+        self._calls.add(call)
+        call.add_done_callback(self._calls.discard)
+
+    async def _finish_call(self, prospect_id: str, room_name: str, ended: asyncio.Future, release) -> None:
+        try:
+            await self.progress.mark(prospect_id, IN_CALL)
+            timed_out = await ended
+            if timed_out:
+                logger.warning(f"Room {room_name} still open after {MAX_CALL_SECONDS}s, releasing its slots")
+            await self.progress.mark(prospect_id, DONE)
+        finally:
+            await release()
+
+
+async def leads_by_status(status: str = "new") -> AsyncIterator[Lead]:
+    """(prospect_id, phone) for every prospect in the status index that has a phone number."""
+    ids = await async_get_prospect_ids_by_status(status)
+    async for prospect in async_iter_prospects_bulk(ids):
+        if prospect.phone:
+            yield prospect.id, prospect.phone
+
+
+def trunk_ids_from_env() -> List[str]:
+    """SIP_OUTBOUND_TRUNK_IDS=ST_a,ST_b, falling back to the single SIP_OUTBOUND_TRUNK_ID."""
+    raw = get_env_var("SIP_OUTBOUND_TRUNK_IDS", required=False, default="") or get_env_var("SIP_OUTBOUND_TRUNK_ID")
+    return [t.strip() for t in (raw or "").split(",") if t.strip()]
+
+
+async def run_campaign(campaign_id: str, dial: DialFunc, leads: AsyncIterable[Lead]) -> Dict[str, int]:
+    try:
+        return await CampaignDialer(campaign_id, dial, trunk_ids_from_env()).run(leads)
+    finally:
+        await close_livekit_api()
@@ -10,13 +10,18 @@ from models.prospect import Prospect
 from utils.agent_utils.llm_strategy import get_llm
 from utils.agent_utils.stt_strategy import get_stt
 from utils.agent_utils.tts_strategy import get_tts
+from utils.agent_utils.opener import PreparedOpener
+from utils.agent_utils.provider_pool import prewarm_providers
+from utils.agent_utils.shared_inference import load_shared_vad
 from utils.monitoring_utils.logging import get_logger
-from utils.config_utils.env_loader import get_env_var
+from utils.monitoring_utils.load_monitor import start_loop_watchdog, worker_load, LOAD_THRESHOLD
+from utils.monitoring_utils.tracing import trace_turns
 from utils.config_utils.config_loader import get_config
 from utils.data_utils.date_utils import parse_date,get_next_two_dates
 from utils.data_utils.time_utils import parse_time_str,human_time
-from repository.prospect_repository import get_prospect_from_db, save_prospect_to_db
-from book_appointment import schedule_appointment
+from repository.prospect_repository import async_get_prospect, async_save_prospect
+from repository.prospect_write_buffer import ProspectWriteBuffer
+from booking_queue import drain_bookings, enqueue_booking
 from livekit import rtc, api
 from livekit.agents import (
     AgentSession,
@@ -30,12 +35,8 @@ from livekit.agents import (
     RoomInputOptions,
 )
 from livekit.plugins import (
-    deepgram,
     openai,
-    cartesia,
-    silero,
-    aws,
-    noise_cancellation,  # noqa: F401
+    noise_cancellation,
 )
 
 
@@ -47,6 +48,9 @@ logger.setLevel(logging.INFO)
 
 outbound_trunk_id = os.getenv("SIP_OUTBOUND_TRUNK_ID")
 
+# First line of every call, rendered to audio while the number is dialed
+OPENER = "Hey is this {first_name}?"
+
 
 class DemoAgent(Agent):
 
@@ -56,7 +60,10 @@ class DemoAgent(Agent):
         
         self.prospect = prospect 
         self.collected_fields = set()
+        self.write_buffer = ProspectWriteBuffer(prospect)
         first_name = getattr(prospect, "first_name", None) or "Unknown"
+        self.opener_text = OPENER.format(first_name=first_name)
+        self.opener: Optional[PreparedOpener] = None
         appointment_date=getattr(prospect,"appointment_date",None) or None
         appointment_time=getattr(prospect,"appointment_time", None) or None
         
@@ -70,7 +77,7 @@ class DemoAgent(Agent):
 
             "# Conversation Flow Rules\n"
             f"- Start every call:\n"
-            f"  → 'Hey is this {first_name}?' and WAIT for their answer.\n"
+            f"  → '{self.opener_text}' and WAIT for their answer.\n"
             "  → If they say 'Who?' → 'Just Caleb from Vertex, we’ve never actually spoken before.'\n"
             "  → Always ask: 'Can I take 20 seconds to explain why I called?'\n\n"
 
@@ -185,7 +192,9 @@ class DemoAgent(Agent):
         self.participant = participant
 
     async def on_enter(self) -> None:
-        self.session.generate_reply()
+        # With a prepared opener the greeting is played once the callee joins, see entrypoint
+        if self.opener is None:
+            self.session.generate_reply()
         
     
     def _set_profile_field_func_for(self, field: str):
@@ -201,8 +210,8 @@ class DemoAgent(Agent):
             else:
                 setattr(self.prospect, field, value)
 
-            # Save to DB
-            save_prospect_to_db(self.prospect)
+            # Buffer the change; flushed shortly after and at shutdown
+            self.write_buffer.mark(self.prospect)
 
             # Track completion
             self.collected_fields.add(field)
@@ -218,13 +227,14 @@ class DemoAgent(Agent):
                     f"- Email: {self.prospect.email}\n\n"
                     f"Can you confirm these details are correct?"
                 )
-                schedule_appointment(
+                enqueue_booking(
                     summary=f"Vertex Media Discovery Call-{self.prospect.first_name}",
                     description="Intro call to show how Vertex helps realtors with consistent seller leads.",
                     start_time= f"{self.prospect.appointment_date} {self.prospect.appointment_time}",
                     attendee_email=self.prospect.email,
                     duration=30,
-                    timezone=self.prospect.timezone
+                    timezone=self.prospect.timezone,
+                    prospect_id=self.prospect.id,
                 )
                 await context.session.generate_reply(instructions=confirmation_msg)
             
@@ -235,8 +245,8 @@ class DemoAgent(Agent):
     
     
     def _save_to_db(self):
-        def save(context: RunContext):
-            return save_prospect_to_db(self.prospect)
+        async def save(context: RunContext):
+            return await async_save_prospect(self.prospect)
         return save
     
     
@@ -342,7 +352,7 @@ class DemoAgent(Agent):
 
 
 def prewarm(proc: JobProcess):
-        proc.userdata["vad"] = silero.VAD.load(
+        proc.userdata["vad"] = load_shared_vad(
             min_speech_duration=0.05,
             min_silence_duration=1.3,
             prefix_padding_duration=0.2,
@@ -352,10 +362,14 @@ def prewarm(proc: JobProcess):
             force_cpu=True,
         )
         logger.info("Silero VAD prewarmed")
+        # Build LLM/STT/TTS providers and their shared HTTP clients once per process
+        prewarm_providers()
 
 
 
 async def entrypoint(ctx: JobContext):
+    # Report this job process's event-loop lag to the worker's load score
+    start_loop_watchdog()
     logger.info(f"connecting to room {ctx.room.name}")
     await ctx.connect()
 
@@ -364,17 +378,25 @@ async def entrypoint(ctx: JobContext):
     participant_identity = phone_number = dial_info["phone_number"]
 
     pid = "f2a45c3c-22f9-4d2f-9a87-b9f7a07b9e8c"
-    prospect = get_prospect_from_db(pid)
+    prospect = await async_get_prospect(pid)
     print(prospect)
 
     agent=DemoAgent(prospect)
+    tts = await get_tts()
+    # Render the greeting while the number is being dialed
+    agent.opener = PreparedOpener(agent.opener_text, tts)
+    ctx.add_shutdown_callback(agent.write_buffer.flush)
     
     session = AgentSession(
         vad=ctx.proc.userdata["vad"],
         llm=openai.LLM(model="gpt-4o"),
         stt=await get_stt(),
-        tts=await get_tts()
+        tts=tts
     )
+    # Per-turn latency spans (VAD, STT, LLM, tools, TTS, playout) for this call
+    trace_turns(ctx, session, pid)
+    # Let the bookings queued on this call finish before the job process exits
+    ctx.add_shutdown_callback(drain_bookings)
 
     # start the session first before dialing, to ensure that when the user picks up
     # the agent does not miss anything the user says
@@ -406,6 +428,8 @@ async def entrypoint(ctx: JobContext):
         logger.info(f"participant joined: {participant.identity}")
 
         agent.set_participant(participant)
+        # Greet from the opener rendered while the phone was ringing
+        await agent.opener.play(session)
 
     except api.TwirpError as e:
         logger.error(
@@ -413,25 +437,18 @@ async def entrypoint(ctx: JobContext):
             f"SIP status: {e.metadata.get('sip_status_code')} "
             f"{e.metadata.get('sip_status')}"
         )
+        agent.opener.cancel()
         ctx.shutdown()
 
 
-def custom_load_func(worker):
-    try:
-        m = int(get_env_var("MAX_JOBS") or 1)
-    except Exception:
-        m = 1
-    a = len(worker.active_jobs)
-    return min(a / m, 1.0) if m > 0 else 1.0
-
 if __name__ == "__main__":
     cli.run_app(
         WorkerOptions(
             agent_name="outbound-caller",
             entrypoint_fnc=entrypoint,
             prewarm_fnc=prewarm,
-            load_fnc=custom_load_func,
-            load_threshold=1.0,
+            load_fnc=worker_load,
+            load_threshold=LOAD_THRESHOLD,
             max_retry=18,
             initialize_process_timeout=30.0,
         )
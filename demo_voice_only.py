@@ -4,13 +4,18 @@ from models.prospect import Prospect
 from utils.agent_utils.llm_strategy import get_llm
 from utils.agent_utils.stt_strategy import get_stt
 from utils.agent_utils.tts_strategy import get_tts
-from utils.monitoring_utils.logging import get_logger
+from utils.agent_utils.shared_inference import load_shared_vad
+from utils.monitoring_utils.logging import get_logger, lazy
+from utils.monitoring_utils.load_monitor import start_loop_watchdog, worker_load, LOAD_THRESHOLD
+from utils.monitoring_utils.tracing import trace_turns
+from utils.monitoring_utils.call_usage import CallUsage
 from utils.config_utils.env_loader import get_env_var
-from utils.config_utils.config_loader import get_config
+from utils.config_utils.config_loader import get_livekit_credentials
 from utils.data_utils.date_utils import parse_date,get_next_two_dates
 from utils.data_utils.time_utils import parse_time_str,human_time
-from repository.prospect_repository import get_prospect_from_db, save_prospect_to_db
-from book_appointment import schedule_appointment
+from repository.prospect_repository import async_get_prospect, async_save_prospect
+from repository.prospect_write_buffer import ProspectWriteBuffer
+from booking_queue import drain_bookings, enqueue_booking
 from livekit.agents import (
     NOT_GIVEN,
     Agent,
@@ -26,16 +31,12 @@ from livekit.agents import (
     cli,
     metrics,
 )
-from livekit.plugins import silero,openai
-from livekit.plugins import noise_cancellation
+from livekit.plugins import openai, noise_cancellation
 import datetime
 
 logger = get_logger("interview-agent")
 
-# Load configuration
-LIVEKIT_API_KEY       = get_config("LIVEKIT_API_KEY")
-LIVEKIT_API_SECRET    = get_config("LIVEKIT_API_SECRET")
-LIVEKIT_URL           = get_config("LIVEKIT_URL", default="wss://livekit.example.com", required=False)
+# Load configuration (LiveKit credentials are read where used, so job processes skip the fetch at import)
 ENV                   = get_env_var("ENV", default="dev")
 
 class DemoAgent(Agent):
@@ -46,6 +47,7 @@ class DemoAgent(Agent):
 
         self.prospect = prospect 
         self.collected_fields = set()
+        self.write_buffer = ProspectWriteBuffer(prospect)
         first_name = getattr(prospect, "first_name", None) or "Unknown"
         appointment_date=getattr(prospect,"appointment_date",None) or None
         appointment_time=getattr(prospect,"appointment_time", None) or None
@@ -173,8 +175,8 @@ class DemoAgent(Agent):
             else:
                 setattr(self.prospect, field, value)
 
-            # Save to DB
-            save_prospect_to_db(self.prospect)
+            # Buffer the change; flushed shortly after and at shutdown
+            self.write_buffer.mark(self.prospect)
 
             # Track completion
             self.collected_fields.add(field)
@@ -198,12 +200,12 @@ class DemoAgent(Agent):
 
         
     def _save_to_db(self):
-        def save(context: RunContext):
-            return save_prospect_to_db(self.prospect)
+        async def save(context: RunContext):
+            return await async_save_prospect(self.prospect)
         return save
 
 def prewarm(proc: JobProcess):
-    proc.userdata["vad"] = silero.VAD.load(
+    proc.userdata["vad"] = load_shared_vad(
         min_speech_duration=0.05,
         min_silence_duration=1.3,
         prefix_padding_duration=0.2,
@@ -215,15 +217,17 @@ def prewarm(proc: JobProcess):
     logger.info("Silero VAD prewarmed")
 
 async def entrypoint(ctx: JobContext):
+    # Report this job process's event-loop lag to the worker's load score
+    start_loop_watchdog()
     ctx.log_context_fields = {"room": ctx.room.name}
     usage_collector = metrics.UsageCollector()
     
     pid = "f2a45c3c-22f9-4d2f-9a87-b9f7a07b9e8c"
-    prospect = get_prospect_from_db(pid)
+    prospect = await async_get_prospect(pid)
     print(prospect)
 
     if prospect:
-        logger.info(f"Fetched Prospect: {prospect.to_dict()}")
+        logger.info("Fetched Prospect: %s", lazy(prospect.to_dict))
     else:
         logger.warning("Prospect not found.")
         
@@ -236,25 +240,39 @@ async def entrypoint(ctx: JobContext):
             turn_detection=None
         ),
     )
+    # Per-turn latency spans (VAD, STT, LLM, tools, TTS, playout) for this call
+    trace_turns(ctx, session, pid)
 
     @session.on("agent_false_interruption")
     def _on_false_interruption(ev):
         logger.info("False positive interruption detected, resuming.")
         session.generate_reply(instructions=ev.extra_instructions or NOT_GIVEN)
 
+    # Per-provider usage and cost of this call, kept in the usage ledger
+    call_usage = CallUsage(__file__, ctx.room.name, pid)
+
     @session.on("metrics_collected")
     def _on_metrics_collected(ev: MetricsCollectedEvent):
-        metrics.log_metrics(ev.metrics)
+        metrics.log_metrics(ev.metrics, logger=logger)
         usage_collector.collect(ev.metrics)
+        call_usage.collect(ev.metrics)
 
     async def log_usage():
         summary = usage_collector.get_summary()
         logger.info(f"Usage summary: {summary}")
+        try:
+            await call_usage.record(summary)
+        except Exception as e:
+            logger.error(f"Could not record call usage: {e}")
 
     ctx.add_shutdown_callback(log_usage)
 
+    agent = DemoAgent(prospect)
+    # Flush buffered prospect fields before any other shutdown work reads them
+    ctx.add_shutdown_callback(agent.write_buffer.flush)
+
     await session.start(
-        agent=DemoAgent(prospect),
+        agent=agent,
         room=ctx.room,
         room_input_options=RoomInputOptions(
             noise_cancellation=noise_cancellation.BVC(),
@@ -266,38 +284,34 @@ async def entrypoint(ctx: JobContext):
 
     async def cleanup():
         pid = "f2a45c3c-22f9-4d2f-9a87-b9f7a07b9e8c"
-        prospect = get_prospect_from_db(pid)
+        prospect = await async_get_prospect(pid)
 
-        schedule_appointment(
+        enqueue_booking(
             summary="Vertex Media Discovery Call",
             description="Intro call to show how Vertex helps realtors with consistent seller leads.",
             start_time= f"{prospect.appointment_date} {prospect.appointment_time}",
             attendee_email=prospect.email,
             duration=30,
-            timezone=prospect.timezone
+            timezone=prospect.timezone,
+            prospect_id=prospect.id,
         )
+        # Let the queued bookings finish before the job process exits
+        await drain_bookings()
 
     ctx.add_shutdown_callback(cleanup)
 
-def custom_load_func(worker):
-    try:
-        m = int(get_env_var("MAX_JOBS") or 1)
-    except Exception:
-        m = 1
-    a = len(worker.active_jobs)
-    return min(a / m, 1.0) if m > 0 else 1.0
-
 if __name__ == "__main__":
     logger.info("Starting LiveKit Interview Agent Worker...")
+    credentials = get_livekit_credentials()
     cli.run_app(
         WorkerOptions(
             entrypoint_fnc=entrypoint,
             prewarm_fnc=prewarm,
-            load_fnc=custom_load_func,
-            load_threshold=1.0,
-            ws_url=LIVEKIT_URL,
-            api_key=LIVEKIT_API_KEY,
-            api_secret=LIVEKIT_API_SECRET,
+            load_fnc=worker_load,
+            load_threshold=LOAD_THRESHOLD,
+            ws_url=credentials["url"],
+            api_key=credentials["api_key"],
+            api_secret=credentials["api_secret"],
             max_retry=18,
             initialize_process_timeout=30.0,
         )
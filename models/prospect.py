@@ -1,40 +1,237 @@
+import json
+import struct
 import uuid
-from dataclasses import dataclass, field, asdict
-from typing import Optional, List
+from typing import Optional, List, Iterable, Set, Dict, Any
 from datetime import datetime, date 
-from utils.data_utils.date_utils import format_datetime,format_date
-from utils.data_utils.time_utils import format_time_str
+from utils.data_utils.date_utils import format_datetime,format_date,parse_date,parse_datetime
+from utils.data_utils.time_utils import format_time_str,parse_time_str
 
 
+# Hash/wire encoding version for the compact binary form
+_BINARY_VERSION = 2
+_NONE_MASK = struct.Struct(">I")
+_LEN = struct.Struct(">I")
 
 
+def _encode_date(value: Optional[date]) -> Optional[str]:
+    # DD/MM/YYYY, same as format_date but without the generic parsing fallback
+    if isinstance(value, date):
+        return f"{value.day:02d}/{value.month:02d}/{value.year:04d}"
+    return format_date(value)
+
+
+def _decode_date(value: Optional[str]) -> Optional[date]:
+    if not value:
+        return None
+    if len(value) == 10 and value[2] == "/" and value[5] == "/":
+        try:
+            return date(int(value[6:]), int(value[3:5]), int(value[:2]))
+        except ValueError:
+            pass
+    return parse_date(value)
+
+
+def _decode_time(value: Optional[str]) -> Optional[str]:
+    if not value:
+        return None
+    if len(value) == 5 and value[2] == ":" and value[:2].isdigit() and value[3:].isdigit():
+        return value
+    return parse_time_str(value)
+
+
+def _decode_datetime(value: Optional[str]) -> datetime:
+    if value:
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            pass
+    return parse_datetime(value) or datetime.utcnow()
+
 
-@dataclass
 class Prospect:
-    id: str = field(default_factory=lambda: str(uuid.uuid4()))
-    first_name: Optional[str] = None
-    last_name: Optional[str] = None
-    phone: str = ""  
-    whatsApp_phone:str=""
-    timezone: Optional[str] = None
-    status: str = "new"
-    address:Optional[str]=None
-
-    objections: List[str] = field(default_factory=list)
-    responses: List[str] = field(default_factory=list)
-
-    appointment_date: Optional[date] = None
-    appointment_time: Optional[str] = None
-    email: Optional[str] = None
-
-    created_at: datetime = field(default_factory=datetime.utcnow)
-    updated_at: datetime = field(default_factory=datetime.utcnow)
-
-    def to_dict(self):
-        d = asdict(self)
-        d["appointment_date"] = format_date(self.appointment_date)
-        d["appointment_time"] = format_time_str(self.appointment_time)
-        d["created_at"] = format_datetime(self.created_at)
-        d["updated_at"] = format_datetime(self.updated_at)
+    """
+    Prospect record, slotted to keep per-instance memory small.
+    - Tracks fields changed since the last save (`dirty_fields`). Only assignment is seen: after
+      editing a list in place (`prospect.objections.append(...)`), reassign it or call `mark_dirty`.
+    - `to_hash`/`from_hash` map to the flat string hash stored in Redis.
+    - `to_bytes`/`from_bytes` give a compact length-prefixed binary form.
+    """
+
+    FIELDS = (
+        "id", "first_name", "last_name", "phone", "whatsApp_phone", "timezone", "status", "address",
+        "objections", "responses",
+        "appointment_date", "appointment_time", "email",
+        "created_at", "updated_at",
+    )
+    LIST_FIELDS = frozenset(("objections", "responses"))
+    _FIELD_SET = frozenset(FIELDS)
+    # Dirty fields are kept as a bitmask rather than a set to keep instances small
+    _FIELD_BITS = {name: 1 << i for i, name in enumerate(FIELDS)}
+    _ALL_BITS = (1 << len(FIELDS)) - 1
+
+    __slots__ = FIELDS + ("_dirty",)
+
+    def __init__(
+        self,
+        id: Optional[str] = None,
+        first_name: Optional[str] = None,
+        last_name: Optional[str] = None,
+        phone: str = "",
+        whatsApp_phone: str = "",
+        timezone: Optional[str] = None,
+        status: str = "new",
+        address: Optional[str] = None,
+        objections: Optional[List[str]] = None,
+        responses: Optional[List[str]] = None,
+        appointment_date: Optional[date] = None,
+        appointment_time: Optional[str] = None,
+        email: Optional[str] = None,
+        created_at: Optional[datetime] = None,
+        updated_at: Optional[datetime] = None,
+    ):
+        set_ = object.__setattr__
+        set_(self, "id", id or str(uuid.uuid4()))
+        set_(self, "first_name", first_name)
+        set_(self, "last_name", last_name)
+        set_(self, "phone", phone)
+        set_(self, "whatsApp_phone", whatsApp_phone)
+        set_(self, "timezone", timezone)
+        set_(self, "status", status)
+        set_(self, "address", address)
+        set_(self, "objections", objections if objections is not None else [])
+        set_(self, "responses", responses if responses is not None else [])
+        set_(self, "appointment_date", appointment_date)
+        set_(self, "appointment_time", appointment_time)
+        set_(self, "email", email)
+        set_(self, "created_at", created_at or datetime.utcnow())
+        set_(self, "updated_at", updated_at or datetime.utcnow())
+        # A new instance has never been saved, so everything starts dirty
+        set_(self, "_dirty", self._ALL_BITS)
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        object.__setattr__(self, "_dirty", self._dirty | self._FIELD_BITS.get(name, 0))
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return all(getattr(self, f) == getattr(other, f) for f in self.FIELDS)
+
+    __hash__ = None
+
+    def __repr__(self):
+        values = ", ".join(f"{f}={getattr(self, f)!r}" for f in self.FIELDS)
+        return f"Prospect({values})"
+
+    # -------------------------------Dirty tracking-------------------------------
+    def _bits(self, fields: Iterable[str]) -> int:
+        bits = 0
+        for name in fields:
+            bits |= self._FIELD_BITS.get(name, 0)
+        return bits
+
+    @property
+    def dirty_fields(self) -> Set[str]:
+        dirty = self._dirty
+        return {name for name, bit in self._FIELD_BITS.items() if dirty & bit}
+
+    def mark_clean(self, fields: Optional[Iterable[str]] = None) -> None:
+        dirty = 0 if fields is None else self._dirty & ~self._bits(fields)
+        object.__setattr__(self, "_dirty", dirty)
+
+    def mark_dirty(self, fields: Iterable[str]) -> None:
+        object.__setattr__(self, "_dirty", self._dirty | self._bits(fields))
+
+    # -------------------------------Encoding-------------------------------
+    def _encode(self, name: str) -> Optional[str]:
+        """Encode one field to its stored string form (None when unset)."""
+        value = getattr(self, name)
+        if value is None:
+            return None
+        if name in self.LIST_FIELDS:
+            return json.dumps(value)
+        if name == "appointment_date":
+            return _encode_date(value)
+        if name == "appointment_time":
+            return format_time_str(value)
+        if name == "created_at" or name == "updated_at":
+            return value.isoformat() if isinstance(value, datetime) else format_datetime(value)
+        return value if isinstance(value, str) else str(value)
+
+    def to_dict(self, fields: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        d = {}
+        for name in (self.FIELDS if fields is None else self._FIELD_SET.intersection(fields)):
+            if name in self.LIST_FIELDS:
+                d[name] = list(getattr(self, name))
+            else:
+                d[name] = self._encode(name)
         return d
 
+    def to_hash(self, fields: Optional[Iterable[str]] = None) -> Dict[str, str]:
+        """Flat string mapping for a Redis hash; None is stored as ''."""
+        h = {}
+        for name in (self.FIELDS if fields is None else self._FIELD_SET.intersection(fields)):
+            value = self._encode(name)
+            h[name] = "" if value is None or value == "null" else value
+        return h
+
+    @classmethod
+    def from_hash(cls, prospect_id: str, data: Dict[str, str]) -> "Prospect":
+        """Build a clean Prospect from a stored hash without going through __init__."""
+        get = data.get
+        self = cls.__new__(cls)
+        set_ = object.__setattr__
+        set_(self, "id", prospect_id)
+        set_(self, "first_name", get("first_name") or None)
+        set_(self, "last_name", get("last_name") or None)
+        set_(self, "phone", get("phone", ""))
+        set_(self, "whatsApp_phone", get("whatsApp_phone", ""))
+        set_(self, "timezone", get("timezone") or None)
+        set_(self, "status", get("status") or "new")
+        set_(self, "address", get("address") or None)
+        set_(self, "objections", json.loads(get("objections") or "[]"))
+        set_(self, "responses", json.loads(get("responses") or "[]"))
+        set_(self, "appointment_date", _decode_date(get("appointment_date")))
+        set_(self, "appointment_time", _decode_time(get("appointment_time")))
+        set_(self, "email", get("email") or None)
+        set_(self, "created_at", _decode_datetime(get("created_at")))
+        set_(self, "updated_at", _decode_datetime(get("updated_at")))
+        set_(self, "_dirty", 0)
+        return self
+
+    def to_bytes(self) -> bytes:
+        """
+        Compact form: version byte, a u32 bitmask of the fields that are None, then each other
+        field as a u32 length + UTF-8.
+        """
+        parts = [bytes((_BINARY_VERSION,)), b""]
+        pack = _LEN.pack
+        none_mask = 0
+        for i, name in enumerate(self.FIELDS):
+            value = self._encode(name)
+            if value is None:
+                none_mask |= 1 << i
+            else:
+                raw = value.encode("utf-8")
+                parts.append(pack(len(raw)))
+                parts.append(raw)
+        parts[1] = _NONE_MASK.pack(none_mask)
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, payload: bytes) -> "Prospect":
+        if not payload or payload[0] != _BINARY_VERSION:
+            raise ValueError("Unsupported prospect binary payload")
+        data = {}
+        view = memoryview(payload)
+        (none_mask,) = _NONE_MASK.unpack_from(view, 1)
+        offset = 1 + _NONE_MASK.size
+        unpack = _LEN.unpack_from
+        for i, name in enumerate(cls.FIELDS):
+            if none_mask & (1 << i):
+                continue
+            (length,) = unpack(view, offset)
+            offset += _LEN.size
+            data[name] = str(view[offset:offset + length], "utf-8")
+            offset += length
+        return cls.from_hash(data.get("id", ""), data)
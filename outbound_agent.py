@@ -1,4 +1,6 @@
 import asyncio
+import functools
+import json
 import os
 import logging
 from pathlib import Path
@@ -8,13 +10,21 @@ from models.prospect import Prospect
 from utils.agent_utils.llm_strategy import get_llm
 from utils.agent_utils.stt_strategy import get_stt
 from utils.agent_utils.tts_strategy import get_tts
-from utils.monitoring_utils.logging import get_logger
+from utils.agent_utils.livekit_client import get_livekit_api
+from utils.agent_utils.opener import PreparedOpener
+from utils.agent_utils.provider_pool import prewarm_providers
+from utils.agent_utils.shared_inference import load_shared_vad, get_turn_detector
+from utils.monitoring_utils.logging import get_logger, lazy
+from utils.monitoring_utils.load_monitor import start_loop_watchdog, worker_load, LOAD_THRESHOLD
+from utils.monitoring_utils.tracing import trace_turns
+from utils.monitoring_utils.call_usage import CallUsage
 from utils.config_utils.env_loader import get_env_var
-from utils.config_utils.config_loader import get_config
+from utils.config_utils.config_loader import get_livekit_credentials
 from utils.data_utils.date_utils import parse_date, get_next_two_dates
 from utils.data_utils.time_utils import parse_time_str, human_time
-from repository.prospect_repository import get_prospect_from_db, save_prospect_to_db
-from book_appointment import schedule_appointment
+from repository.prospect_repository import async_get_prospect, async_save_prospect
+from repository.prospect_write_buffer import ProspectWriteBuffer
+from booking_queue import DONE as BOOKING_DONE, drain_bookings, enqueue_booking, get_booking_status, wait_for_booking
 from livekit import rtc, api
 from livekit.agents import (
     NOT_GIVEN,
@@ -33,29 +43,22 @@ from livekit.agents import (
     metrics,
 )
 from livekit.plugins import (
-    deepgram,
-    openai,
-    cartesia,
-    azure,
-    silero,
-    aws,
-    noise_cancellation, 
+    noise_cancellation,
 )
 import datetime
-from livekit.plugins.turn_detector.multilingual import MultilingualModel
 
 # Load environment variables
 load_dotenv(dotenv_path=Path(__file__).parent / '.env')
 
 logger = get_logger("interview-agent")
 
-# Load configuration
-LIVEKIT_API_KEY       = get_config("LIVEKIT_API_KEY")
-LIVEKIT_API_SECRET    = get_config("LIVEKIT_API_SECRET")
-LIVEKIT_URL           = get_config("LIVEKIT_URL", default="wss://livekit.example.com", required=False)
+# Load configuration (LiveKit credentials are read where used, so job processes skip the fetch at import)
 ENV                   = get_env_var("ENV", default="dev")
 outbound_trunk_id     = get_env_var("SIP_OUTBOUND_TRUNK_ID")
 
+# First line of every call, rendered to audio while the number is dialed
+OPENER = "Hey, this is Adarsh from Hedoo Developers, am I speaking with {first_name}?"
+
 class DemoAgent(Agent):
     
     REQUIRED_FIELDS = {"appointment_date", "appointment_time", "email", "timezone"}
@@ -64,8 +67,13 @@ class DemoAgent(Agent):
 
         self.prospect = prospect 
         self.collected_fields = set()
+        self.write_buffer = ProspectWriteBuffer(prospect)
         self.pending_confirmation = False
+        self.booking_key = None
+        self.participant: Optional[rtc.RemoteParticipant] = None
         first_name = getattr(prospect, "first_name", None) or "Unknown"
+        self.opener_text = OPENER.format(first_name=first_name)
+        self.opener: Optional[PreparedOpener] = None
         appointment_date=getattr(prospect,"appointment_date",None) or None
         appointment_time=getattr(prospect,"appointment_time", None) or None
         
@@ -81,7 +89,7 @@ class DemoAgent(Agent):
             "# Conversation Flow\n"
             "- Always detect the language the user is speaking and respond in the SAME language.\n"
             "- Start every call naturally:\n"
-            f"  → 'Hey, this is Adarsh from Hedoo Developers, am I speaking with {first_name}?' and WAIT for their answer.\n"
+            f"  → '{self.opener_text}' and WAIT for their answer.\n"
             "- If they switch languages mid-conversation, immediately switch to that new language.\n"
             "- If they say 'Who?' → 'Just Adarsh from Hedoo Developers, we've never actually spoken before.'\n"
             "- After introduction, first try to understand them:\n"
@@ -192,8 +200,13 @@ class DemoAgent(Agent):
         )
         
         
+    def set_participant(self, participant: rtc.RemoteParticipant):
+        self.participant = participant
+
     async def on_enter(self) -> None:
-        self.session.generate_reply()
+        # With a prepared opener the greeting is played once the callee joins, see entrypoint
+        if self.opener is None:
+            self.session.generate_reply()
 
     
     def _set_profile_field_func_for(self, field: str):
@@ -209,8 +222,8 @@ class DemoAgent(Agent):
             else:
                 setattr(self.prospect, field, value)
 
-            # Save to DB
-            save_prospect_to_db(self.prospect)
+            # Buffer the change; flushed shortly after and at shutdown
+            self.write_buffer.mark(self.prospect)
 
             # Track completion
             self.collected_fields.add(field)
@@ -242,16 +255,18 @@ class DemoAgent(Agent):
 
             try:
                 # Save once when user confirms
-                save_prospect_to_db(self.prospect)
+                await self.write_buffer.flush()
 
-                # Schedule appointment once
-                schedule_appointment(
+                # Queue the booking; the Google calls run on a background worker
+                self.booking_key = enqueue_booking(
                     summary=f"Hedoo Developers Discovery Call - {self.prospect.first_name}",
                     description="Discovery call to discuss affordable flat options at Magnolia Building, Civil Lines, Nagpur.",
                     start_time=f"{self.prospect.appointment_date} {self.prospect.appointment_time}",
                     attendee_email=self.prospect.email,
                     duration=30,
-                    timezone=self.prospect.timezone
+                    timezone=self.prospect.timezone,
+                    prospect_id=self.prospect.id,
+                    on_done=self._on_booking_done_func(context.session),
                 )
 
                 self.pending_confirmation = False
@@ -273,15 +288,31 @@ class DemoAgent(Agent):
                 return "Error scheduling appointment. Please try again."
         return confirm_appointment_details
 
+    def _on_booking_done_func(self, session: AgentSession):
+        loop = asyncio.get_running_loop()
+
+        def on_booking_done(job: dict):
+            # Runs on a booking worker thread
+            if job["status"] == "done":
+                logger.info(f"Appointment booked: {job['result']}")
+                return
+            logger.error(f"Booking {job['key']} failed: {job['error']}")
+            loop.call_soon_threadsafe(
+                lambda: session.generate_reply(
+                    instructions="Apologize that the calendar invite could not be sent, and tell them our team will email the meeting details shortly."
+                )
+            )
+        return on_booking_done
+
         
     def _save_to_db(self):
-        def save(context: RunContext):
-            return save_prospect_to_db(self.prospect)
+        async def save(context: RunContext):
+            return await async_save_prospect(self.prospect)
         return save
 
 
 def prewarm(proc: JobProcess):
-    proc.userdata["vad"] = silero.VAD.load(
+    proc.userdata["vad"] = load_shared_vad(
             min_speech_duration=0.05,
             min_silence_duration=1.3,
             prefix_padding_duration=0.2,
@@ -291,84 +322,88 @@ def prewarm(proc: JobProcess):
             force_cpu=True,
     )
     logger.info("Silero VAD prewarmed")
+    # Build LLM/STT/TTS providers and their shared HTTP clients once per process
+    prewarm_providers()
 
 
-async def make_call(phone_number: str, prospect_id: str = None):
+async def make_call(phone_number: str, prospect_id: str = None, trunk_id: str = None, campaign_id: str = None):
     """Create a dispatch and add a SIP participant to call the phone number"""
-    lkapi = api.LiveKitAPI(
-        api_key=LIVEKIT_API_KEY,
-        api_secret=LIVEKIT_API_SECRET,
-        url=LIVEKIT_URL
-    )
-    
+    trunk_id = trunk_id or outbound_trunk_id
+    # Validate SIP trunk ID
+    if not trunk_id or not trunk_id.startswith("ST_"):
+        logger.error(f"SIP trunk ID {trunk_id!r} is not set or invalid")
+        return
+
+    lkapi = get_livekit_api()
+
     # Generate unique room name for this call
     room_name = f"outbound-call-{phone_number.replace('+', '').replace(' ', '')}-{int(asyncio.get_event_loop().time())}"
     agent_name = "outbound-caller"
     
-    # Create metadata with phone number and prospect ID
+    # Create metadata with phone number, prospect ID and the campaign the call belongs to
     metadata = {
         "phone_number": phone_number,
-        "prospect_id": prospect_id or "default"
+        "prospect_id": prospect_id or "default",
+        "campaign_id": campaign_id,
     }
     
     try:
-        # Create agent dispatch
-        logger.info(f"Creating dispatch for agent {agent_name} in room {room_name}")
-        dispatch = await lkapi.agent_dispatch.create_dispatch(
-            api.CreateAgentDispatchRequest(
-                agent_name=agent_name, 
-                room=room_name, 
-                metadata=str(metadata)
-            )
+        # Dispatch the agent and dial at the same time: both create the room if it doesn't exist yet,
+        # and the agent is ready well before the callee answers
+        logger.info(f"Dispatching {agent_name} and dialing {phone_number} to room {room_name}")
+        dispatch, sip_participant = await asyncio.gather(
+            lkapi.agent_dispatch.create_dispatch(
+                api.CreateAgentDispatchRequest(
+                    agent_name=agent_name, 
+                    room=room_name, 
+                    metadata=json.dumps(metadata)
+                )
+            ),
+            lkapi.sip.create_sip_participant(
+                api.CreateSIPParticipantRequest(
+                    room_name=room_name,
+                    sip_trunk_id=trunk_id,
+                    sip_call_to=phone_number,
+                    participant_identity="phone_user",
+                    wait_until_answered=True,
+                )
+            ),
         )
         logger.info(f"Created dispatch: {dispatch}")
-        
-        # Validate SIP trunk ID
-        if not outbound_trunk_id or not outbound_trunk_id.startswith("ST_"):
-            logger.error("SIP_OUTBOUND_TRUNK_ID is not set or invalid")
-            return
-        
-        logger.info(f"Dialing {phone_number} to room {room_name}")
-        
-        # Create SIP participant to initiate the call
-        sip_participant = await lkapi.sip.create_sip_participant(
-            api.CreateSIPParticipantRequest(
-                room_name=room_name,
-                sip_trunk_id=outbound_trunk_id,
-                sip_call_to=phone_number,
-                participant_identity="phone_user",
-                wait_until_answered=True,
-            )
-        )
         logger.info(f"Created SIP participant: {sip_participant}")
         return room_name
         
     except Exception as e:
         logger.error(f"Error making call to {phone_number}: {e}")
+        # Don't leave the dispatched agent waiting in a room nobody will join
+        try:
+            await lkapi.room.delete_room(api.DeleteRoomRequest(room=room_name))
+        except Exception as cleanup_error:
+            logger.warning(f"Could not delete room {room_name}: {cleanup_error}")
         raise
-    finally:
-        # Close API connection
-        await lkapi.aclose()
 
 
 async def entrypoint(ctx: JobContext):
+    # Report this job process's event-loop lag to the worker's load score
+    start_loop_watchdog()
     ctx.log_context_fields = {"room": ctx.room.name}
     usage_collector = metrics.UsageCollector()
     
-    # Extract prospect ID from metadata if available
+    # Extract prospect and campaign IDs from the dispatch metadata if available
     prospect_id = "f2a45c3c-22f9-4d2f-9a87-b9f7a07b9e8c"  # Default or from metadata
-    if hasattr(ctx, 'metadata') and ctx.metadata:
+    campaign_id = None
+    if ctx.job.metadata:
         try:
-            import json
-            metadata = json.loads(ctx.metadata) if isinstance(ctx.metadata, str) else ctx.metadata
+            metadata = json.loads(ctx.job.metadata)
             prospect_id = metadata.get("prospect_id", prospect_id)
-        except:
-            pass
+            campaign_id = metadata.get("campaign_id")
+        except ValueError:
+            logger.warning(f"Could not parse job metadata: {ctx.job.metadata}")
     
-    prospect = get_prospect_from_db(prospect_id)
+    prospect = await async_get_prospect(prospect_id)
     
     if prospect:
-        logger.info(f"Fetched Prospect: {prospect.to_dict()}")
+        logger.info("Fetched Prospect: %s", lazy(prospect.to_dict))
     else:
         logger.warning("Prospect not found.")
         # Create default prospect if none found
@@ -376,32 +411,47 @@ async def entrypoint(ctx: JobContext):
         
     # Create agent instance
     agent = DemoAgent(prospect)
+    tts = await get_tts()
+    # Render the greeting while the number is being dialed
+    agent.opener = PreparedOpener(agent.opener_text, tts)
     
     # Setup session with affordable models (3-5 inr/min)
     session = AgentSession(
         allow_interruptions=True,
-        turn_detection=MultilingualModel(),
+        turn_detection=get_turn_detector(),
         vad=ctx.proc.userdata["vad"],
-        stt=get_stt(),
-        tts=get_tts(),
-        llm=get_llm()    
+        stt=await get_stt(),
+        tts=tts,
+        llm=await get_llm()
     )
+    # Per-turn latency spans (VAD, STT, LLM, tools, TTS, playout) for this call
+    trace_turns(ctx, session, prospect_id)
 
     @session.on("agent_false_interruption")
     def _on_false_interruption(ev):
         logger.info("False positive interruption detected, resuming.")
         session.generate_reply(instructions=ev.extra_instructions or NOT_GIVEN)
 
+    # Per-provider usage and cost of this call, kept in the usage ledger
+    call_usage = CallUsage(__file__, ctx.room.name, prospect_id, campaign_id)
+
     @session.on("metrics_collected")
     def _on_metrics_collected(ev: MetricsCollectedEvent):
-        metrics.log_metrics(ev.metrics)
+        metrics.log_metrics(ev.metrics, logger=logger)
         usage_collector.collect(ev.metrics)
+        call_usage.collect(ev.metrics)
 
     async def log_usage():
         summary = usage_collector.get_summary()
         logger.info(f"Usage summary: {summary}")
+        try:
+            await call_usage.record(summary)
+        except Exception as e:
+            logger.error(f"Could not record call usage: {e}")
 
     ctx.add_shutdown_callback(log_usage)
+    # Flush buffered prospect fields before the final scheduling step
+    ctx.add_shutdown_callback(agent.write_buffer.flush)
 
     # Start the agent session
     session_task = asyncio.create_task(
@@ -422,57 +472,59 @@ async def entrypoint(ctx: JobContext):
         
         # Set the participant for the agent
         agent.set_participant(participant)
+        # Greet from the opener rendered while the phone was ringing
+        await agent.opener.play(session)
         
     except Exception as e:
         logger.error(f"Error in session: {e}")
+        # Nobody will hear the greeting; stop rendering it
+        agent.opener.cancel()
         ctx.shutdown()
 
     async def cleanup():
         # Final appointment scheduling if needed
         if prospect and hasattr(prospect, 'appointment_date') and prospect.appointment_date:
             try:
-                schedule_appointment(
+                # The booking ledger makes this a no-op if the call already booked this slot
+                key = enqueue_booking(
                     summary=f"Hedoo Developers Discovery Call - {prospect.first_name}",
                     description="Discovery call to discuss affordable flat options at Magnolia Building, Civil Lines, Nagpur.",
                     start_time=f"{prospect.appointment_date} {prospect.appointment_time}",
                     attendee_email=prospect.email,
                     duration=30,
-                    timezone=prospect.timezone
+                    timezone=prospect.timezone,
+                    prospect_id=prospect.id,
                 )
-                logger.info("Final appointment scheduled successfully")
+                # Give the worker a chance to finish before the job process exits
+                job = await wait_for_booking(key, timeout=20)
+                logger.info(f"Final appointment scheduling status: {job and job['status']}")
             except Exception as e:
                 logger.error(f"Error in final appointment scheduling: {e}")
+        # Bookings queued by the confirm tool too
+        await drain_bookings()
+
+        # Only a booking this call confirmed and created counts: a date stored by an earlier
+        # call resolves to that call's job, or to a duplicate of its calendar event
+        if agent.booking_key:
+            job = get_booking_status(agent.booking_key)
+            if (job and job["status"] == BOOKING_DONE and not job["result"]["duplicate"]
+                    and job["updated_at"] >= call_usage.started):
+                try:
+                    await call_usage.record_booking()
+                except Exception as e:
+                    logger.error(f"Could not record booking usage: {e}")
 
     ctx.add_shutdown_callback(cleanup)
 
 
-def custom_load_func(worker):
-    try:
-        m = int(get_env_var("MAX_JOBS") or 1)
-    except Exception:
-        m = 1
-    a = len(worker.active_jobs)
-    return min(a / m, 1.0) if m > 0 else 1.0
-
-
-async def main():
-    """Main function to make calls - use this to initiate outbound calls"""
-    # Replace with the actual phone numbers you want to call
-    phone_numbers = [
-        "+1234567890",  # Replace with actual numbers
-    ]
-    
-    for phone_number in phone_numbers:
-        try:
-            logger.info(f"Initiating call to {phone_number}")
-            room_name = await make_call(phone_number, prospect_id="f2a45c3c-22f9-4d2f-9a87-b9f7a07b9e8c")
-            logger.info(f"Call initiated successfully. Room: {room_name}")
-            
-            # Add delay between calls if making multiple calls
-            await asyncio.sleep(5)
-            
-        except Exception as e:
-            logger.error(f"Failed to call {phone_number}: {e}")
+async def main(campaign_id: str, status: str = "new"):
+    """Call every prospect with the given status, resuming the campaign if it was run before"""
+    from campaign_dialer import leads_by_status, run_campaign
+
+    logger.info(f"Starting campaign {campaign_id} for prospects with status '{status}'")
+    dial = functools.partial(make_call, campaign_id=campaign_id)
+    summary = await run_campaign(campaign_id, dial, leads_by_status(status))
+    logger.info(f"Campaign {campaign_id} done: {summary}")
 
 
 if __name__ == "__main__":
@@ -480,21 +532,25 @@ if __name__ == "__main__":
     
     if len(sys.argv) > 1 and sys.argv[1] == "--make-call":
         # Run the calling functionality
+        # python outbound_agent.py --make-call [CAMPAIGN_ID] [STATUS]
         logger.info("Starting outbound call process...")
-        asyncio.run(main())
+        campaign_id = sys.argv[2] if len(sys.argv) > 2 else datetime.datetime.now().strftime("%Y%m%d")
+        status = sys.argv[3] if len(sys.argv) > 3 else "new"
+        asyncio.run(main(campaign_id, status))
     else:
         # Run the agent worker
         logger.info("Starting LiveKit Interview Agent Worker...")
+        credentials = get_livekit_credentials()
         cli.run_app(
             WorkerOptions(
                 entrypoint_fnc=entrypoint,
                 prewarm_fnc=prewarm,
-                load_fnc=custom_load_func,
-                load_threshold=1.0,
+                load_fnc=worker_load,
+                load_threshold=LOAD_THRESHOLD,
                 agent_name="outbound-caller",
-                ws_url=LIVEKIT_URL,
-                api_key=LIVEKIT_API_KEY,
-                api_secret=LIVEKIT_API_SECRET,
+                ws_url=credentials["url"],
+                api_key=credentials["api_key"],
+                api_secret=credentials["api_secret"],
                 max_retry=18,
                 initialize_process_timeout=30.0,
             )
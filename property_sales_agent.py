@@ -10,13 +10,16 @@ from models.prospect import Prospect
 from utils.agent_utils.llm_strategy import get_llm
 from utils.agent_utils.stt_strategy import get_stt
 from utils.agent_utils.tts_strategy import get_tts
+from utils.agent_utils.opener import PreparedOpener
+from utils.agent_utils.shared_inference import load_shared_vad, get_turn_detector
 from utils.monitoring_utils.logging import get_logger
-from utils.config_utils.env_loader import get_env_var
+from utils.monitoring_utils.load_monitor import start_loop_watchdog, worker_load, LOAD_THRESHOLD
+from utils.monitoring_utils.tracing import trace_turns
 from utils.config_utils.config_loader import get_config
 from utils.data_utils.date_utils import parse_date,get_next_two_dates
 from utils.data_utils.time_utils import parse_time_str,human_time
-from repository.prospect_repository import get_prospect_from_db, save_prospect_to_db
-from book_appointment import schedule_appointment
+from repository.prospect_repository import async_get_prospect, async_save_prospect
+from booking_queue import drain_bookings, enqueue_booking
 from livekit import rtc, api
 from livekit.agents import (
     AgentSession,
@@ -30,15 +33,9 @@ from livekit.agents import (
     RoomInputOptions,
 )
 from livekit.plugins import (
-    deepgram,
     openai,
-    cartesia,
-    silero,
-    aws,
-    azure,
-    noise_cancellation
+    noise_cancellation,
 )
-from livekit.plugins.turn_detector.multilingual import MultilingualModel
 
 
 # load environment variables, this is optional, only used for local development
@@ -48,6 +45,9 @@ logger.setLevel(logging.INFO)
 
 outbound_trunk_id = os.getenv("SIP_OUTBOUND_TRUNK_ID")
 
+# First line of every call, rendered to audio while the number is dialed
+OPENER = "Hey, this is Adarsh from Hedoo Developers, am I speaking with {first_name}?"
+
 
 class DemoAgent(Agent):
 
@@ -59,6 +59,8 @@ class DemoAgent(Agent):
         self.collected_fields = set()
         self.pending_confirmation = False # New flag to track confirmation state
         first_name = getattr(prospect, "first_name", None) or "Unknown"
+        self.opener_text = OPENER.format(first_name=first_name)
+        self.opener: Optional[PreparedOpener] = None
         appointment_date=getattr(prospect,"appointment_date",None) or None
         appointment_time=getattr(prospect,"appointment_time", None) or None
         
@@ -74,7 +76,7 @@ class DemoAgent(Agent):
             "# Conversation Flow\n"
             "- Always detect the language the user is speaking and respond in the SAME language.\n"
             "- Start every call directly:\n"
-            f"  → 'Hey, this is Adarsh from Hedoo Developers, am I speaking with {first_name}?' and WAIT for their answer.\n"
+            f"  → '{self.opener_text}' and WAIT for their answer.\n"
             "- If they switch languages mid-conversation, immediately switch to that new language.\n"
             "- If they say 'Who?' → 'Just Adarsh from Hedoo Developers, we’ve not spoken before.'\n"
             "- After introduction, move directly to purpose: 'Are you currently exploring options for a new flat in Nagpur?'\n"
@@ -195,7 +197,9 @@ class DemoAgent(Agent):
         self.participant = participant
 
     async def on_enter(self) -> None:
-        self.session.generate_reply()
+        # With a prepared opener the greeting is played once the callee joins, see entrypoint
+        if self.opener is None:
+            self.session.generate_reply()
     
     def _set_profile_field_func_for(self, field: str):
         async def set_value(context: RunContext, value: str):
@@ -239,16 +243,17 @@ class DemoAgent(Agent):
 
             try:
                 # Save once when user confirms
-                save_prospect_to_db(self.prospect)
+                await async_save_prospect(self.prospect)
 
-                # Schedule appointment once
-                schedule_appointment(
+                # Queue the booking; the Google calls run on a background worker
+                enqueue_booking(
                     summary=f"Hedoo Developers Appointment Call for - {self.prospect.first_name}",
                     description="Appointment call to discuss affordable flats options at Magnolia Building, Civil Lines, Nagpur.",
                     start_time=f"{self.prospect.appointment_date} {self.prospect.appointment_time}",
                     attendee_email=self.prospect.email,
                     duration=30,
-                    timezone=self.prospect.timezone
+                    timezone=self.prospect.timezone,
+                    prospect_id=self.prospect.id,
                 )
 
                 self.pending_confirmation = False
@@ -272,8 +277,8 @@ class DemoAgent(Agent):
 
     
     def _save_to_db(self):
-        def save(context: RunContext):
-            return save_prospect_to_db(self.prospect)
+        async def save(context: RunContext):
+            return await async_save_prospect(self.prospect)
         return save
     
     
@@ -342,7 +347,7 @@ class DemoAgent(Agent):
 
 
 def prewarm(proc: JobProcess):
-        proc.userdata["vad"] = silero.VAD.load(
+        proc.userdata["vad"] = load_shared_vad(
             min_speech_duration=0.05,
             min_silence_duration=1.3,
             prefix_padding_duration=0.2,
@@ -356,6 +361,8 @@ def prewarm(proc: JobProcess):
     
 
 async def entrypoint(ctx: JobContext):
+    # Report this job process's event-loop lag to the worker's load score
+    start_loop_watchdog()
     logger.info(f"connecting to room {ctx.room.name}")
     await ctx.connect()
 
@@ -364,20 +371,27 @@ async def entrypoint(ctx: JobContext):
     participant_identity = phone_number = dial_info["phone_number"]
 
     pid = "f2a45c3c-22f9-4d2f-9a87-b9f7a07b9e8c"
-    prospect = get_prospect_from_db(pid)
+    prospect = await async_get_prospect(pid)
     print(prospect)
 
     agent=DemoAgent(prospect)
+    tts = openai.TTS(voice="fable")
+    # Render the greeting while the number is being dialed
+    agent.opener = PreparedOpener(agent.opener_text, tts)
     
     session = AgentSession(
         allow_interruptions=True,
-        turn_detection=MultilingualModel(),
+        turn_detection=get_turn_detector(),
         vad=ctx.proc.userdata["vad"],
         llm=openai.realtime.RealtimeModel(
             modalities=["text"]
         ),
-        tts=openai.TTS(voice="fable") 
+        tts=tts
     )
+    # Per-turn latency spans (VAD, STT, LLM, tools, TTS, playout) for this call
+    trace_turns(ctx, session, pid)
+    # Let the bookings queued on this call finish before the job process exits
+    ctx.add_shutdown_callback(drain_bookings)
 
     # start the session first before dialing, to ensure that when the user picks up
     # the agent does not miss anything the user says
@@ -409,6 +423,8 @@ async def entrypoint(ctx: JobContext):
         logger.info(f"participant joined: {participant.identity}")
 
         agent.set_participant(participant)
+        # Greet from the opener rendered while the phone was ringing
+        await agent.opener.play(session)
 
     except api.TwirpError as e:
         logger.error(
@@ -416,25 +432,18 @@ async def entrypoint(ctx: JobContext):
             f"SIP status: {e.metadata.get('sip_status_code')} "
             f"{e.metadata.get('sip_status')}"
         )
+        agent.opener.cancel()
         ctx.shutdown()
 
 
-def custom_load_func(worker):
-    try:
-        m = int(get_env_var("MAX_JOBS") or 1)
-    except Exception:
-        m = 1
-    a = len(worker.active_jobs)
-    return min(a / m, 1.0) if m > 0 else 1.0
-
 if __name__ == "__main__":
     cli.run_app(
         WorkerOptions(
             agent_name="outbound-caller",
             entrypoint_fnc=entrypoint,
             prewarm_fnc=prewarm,
-            load_fnc=custom_load_func,
-            load_threshold=1.0,
+            load_fnc=worker_load,
+            load_threshold=LOAD_THRESHOLD,
             max_retry=18,
             initialize_process_timeout=30.0,
         )
@@ -0,0 +1,76 @@
+# booking_ledger.py
+import hashlib
+import json
+import time
+from typing import Optional, Dict
+
+from utils.monitoring_utils.logging import get_logger
+from utils.config_utils.db_config import redis
+
+logger = get_logger("booking-ledger")
+
+# prospect:{id}:bookings  hash of slot ("YYYY-MM-DD HH:MM") -> JSON entry
+#   {"status": "pending" | "created" | "booked", "at": epoch, "event_id": ..., "meet_link": ...}
+# pending: claimed, no event yet; created: event exists, confirmation email not sent yet;
+# booked: event created and email sent
+PENDING = "pending"
+CREATED = "created"
+BOOKED = "booked"
+# A pending claim older than this is assumed to belong to a crashed booking and may be retaken
+STALE_CLAIM_SECONDS = 600
+
+
+def ledger_key(prospect_id: str) -> str:
+    return f"prospect:{prospect_id}:bookings"
+
+
+def booking_request_id(prospect_id: str, slot: str) -> str:
+    """
+    Deterministic id for one prospect + slot. Hex digits are valid Calendar event ids,
+    so it is used both as the event id and the Meet createRequest requestId.
+    """
+    return hashlib.sha256(f"{prospect_id}|{slot.strip()}".encode("utf-8")).hexdigest()[:40]
+
+
+def get_booking(prospect_id: str, slot: str) -> Optional[Dict]:
+    raw = redis.hget(ledger_key(prospect_id), slot.strip())
+    return json.loads(raw) if raw else None
+
+
+def claim_booking(prospect_id: str, slot: str) -> bool:
+    """
+    Atomically claim a slot before any Calendar insert (HSETNX).
+    Returns False when the slot is already booked or another booking is in flight.
+    """
+    key, slot = ledger_key(prospect_id), slot.strip()
+    entry = json.dumps({"status": PENDING, "at": time.time()})
+    if redis.hsetnx(key, slot, entry):
+        return True
+
+    current = get_booking(prospect_id, slot)
+    if current is None or current.get("status") != PENDING:
+        return False
+    if time.time() - current.get("at", 0) < STALE_CLAIM_SECONDS:
+        return False
+
+    logger.warning(f"Retaking stale booking claim for prospect {prospect_id} at {slot}")
+    redis.hset(key, slot, entry)
+    return True
+
+
+def mark_created(prospect_id: str, slot: str, event_id: Optional[str], meet_link: Optional[str]) -> None:
+    """The calendar event exists; a retry only has to send the confirmation email."""
+    entry = {"status": CREATED, "at": time.time(), "event_id": event_id, "meet_link": meet_link}
+    redis.hset(ledger_key(prospect_id), slot.strip(), json.dumps(entry))
+
+
+def mark_booked(prospect_id: str, slot: str, event_id: Optional[str], meet_link: Optional[str]) -> None:
+    entry = {"status": BOOKED, "at": time.time(), "event_id": event_id, "meet_link": meet_link}
+    redis.hset(ledger_key(prospect_id), slot.strip(), json.dumps(entry))
+
+
+def release_booking(prospect_id: str, slot: str) -> None:
+    """Drop a pending claim after a failed attempt so a retry can claim it again."""
+    current = get_booking(prospect_id, slot)
+    if current and current.get("status") == PENDING:
+        redis.hdel(ledger_key(prospect_id), slot.strip())
@@ -1,53 +1,320 @@
 # prospect_repository.py
-from datetime import datetime
-from typing import Optional
 import json
+from datetime import date
+from itertools import islice
+from typing import Optional, Dict, Iterable, Iterator, AsyncIterator, List, Tuple
 
 from models.prospect import Prospect
 from utils.monitoring_utils.logging import get_logger
-from utils.config_utils.db_config import redis 
-from utils.data_utils.date_utils import parse_date, parse_datetime
-from utils.data_utils.time_utils import parse_time_str
+from utils.config_utils.db_config import redis, get_async_redis
+from utils.data_utils.phone_utils import normalize_phone
 
 logger = get_logger("prospect-repo")
 
 
-def save_prospect_to_db(prospect: Prospect) -> None:
-    key = f"prospect:{prospect.id}"
-    data = prospect.to_dict()
+def prospect_key(prospect_id: str) -> str:
+    return f"prospect:{prospect_id}"
 
-    safe_data = {
-        k: ("" if v is None or v == "null" else str(v)) for k, v in data.items()
-    }
-    redis.hset(key, values=safe_data)
 
+# -------------------------------Secondary indexes-------------------------------
+# prospect:idx:status:{status}  set of prospect ids
+# prospect:idx:phone            hash of normalized phone -> prospect id. Phones are not unique:
+#                               when two prospects share one, the last write wins the entry
+# prospect:idx:appointment      sorted set of prospect ids scored by YYYYMMDD
+PHONE_INDEX_KEY = "prospect:idx:phone"
+APPOINTMENT_INDEX_KEY = "prospect:idx:appointment"
+INDEXED_FIELDS = {"status", "phone", "appointment_date"}
+# Indexed values that must be read back before a write to drop stale entries
+PRIOR_INDEX_FIELDS = ("status", "phone")
+# Saves retried when another writer changed the prospect between the read and the write
+WRITE_ATTEMPTS = 5
+# Applies a prospect write and its index updates atomically, and only if the prospect's status
+# and phone still hold the values the caller read them as (ARGV[2], ARGV[3]; checked when
+# ARGV[1] is '1'); returns 0 without writing otherwise, and the caller reads and retries.
+# ARGV[4] is the JSON list of commands. HDEL_IF_OWNER drops a phone index entry only if it
+# still points at this prospect: another prospect with the same phone may have taken it.
+_WRITE_IF_UNCHANGED = """
+if ARGV[1] == '1' then
+    local current = redis.call('HMGET', KEYS[1], 'status', 'phone')
+    if (current[1] or '') ~= ARGV[2] or (current[2] or '') ~= ARGV[3] then
+        return 0
+    end
+end
+for _, command in ipairs(cjson.decode(ARGV[4])) do
+    if command[1] == 'HDEL_IF_OWNER' then
+        if redis.call('HGET', command[2], command[3]) == command[4] then
+            redis.call('HDEL', command[2], command[3])
+        end
+    else
+        redis.call(unpack(command))
+    end
+end
+return 1
+"""
 
+Prior = Tuple[Optional[str], Optional[str]]
 
 
-# Get prospect
-def get_prospect_from_db(prospect_id: str) -> Optional[Prospect]:
-    key = f"prospect:{prospect_id}"
-    data = redis.hgetall(key)
+def status_index_key(status: str) -> str:
+    return f"prospect:idx:status:{status}"
+
+
+def _date_score(value: date) -> int:
+    return value.year * 10000 + value.month * 100 + value.day
+
+
+def _needs_prior(fields: Optional[Iterable[str]]) -> bool:
+    return fields is None or bool(set(PRIOR_INDEX_FIELDS) & set(fields))
+
+
+def _write_commands(prospect: Prospect, prior: Prior, fields: Optional[Iterable[str]] = None) -> List[list]:
+    """The hash write and its index updates, as Redis commands for _WRITE_IF_UNCHANGED."""
+    fields = None if fields is None else set(fields)
+    key = prospect_key(prospect.id)
+    commands = [["HSET", key, *(item for pair in prospect.to_hash(fields).items() for item in pair)]]
+    old_status, old_phone = prior
+
+    if fields is None or "status" in fields:
+        if old_status and old_status != prospect.status:
+            commands.append(["SREM", status_index_key(old_status), prospect.id])
+        if prospect.status:
+            commands.append(["SADD", status_index_key(prospect.status), prospect.id])
 
+    if fields is None or "phone" in fields:
+        old_phone, new_phone = normalize_phone(old_phone), normalize_phone(prospect.phone)
+        if old_phone and old_phone != new_phone:
+            commands.append(["HDEL_IF_OWNER", PHONE_INDEX_KEY, old_phone, prospect.id])
+        if new_phone:
+            commands.append(["HSET", PHONE_INDEX_KEY, new_phone, prospect.id])
+
+    if fields is None or "appointment_date" in fields:
+        if isinstance(prospect.appointment_date, date):
+            commands.append(["ZADD", APPOINTMENT_INDEX_KEY, _date_score(prospect.appointment_date), prospect.id])
+        else:
+            commands.append(["ZREM", APPOINTMENT_INDEX_KEY, prospect.id])
+    return commands
+
+
+def _write_script(prospect: Prospect, prior: Optional[Prior], fields: Optional[Iterable[str]] = None) -> Dict:
+    """eval() arguments for one prospect write; `prior` None skips the compare (no indexed value to drop)."""
+    commands = _write_commands(prospect, prior or (None, None), fields)
+    old_status, old_phone = prior or (None, None)
+    keys = list(dict.fromkeys(command[1] for command in commands))
+    args = ["1" if prior is not None else "0", old_status or "", old_phone or "", json.dumps(commands)]
+    return {"keys": keys, "args": args}
+
+
+def _from_hash(prospect_id: str, data: Dict[str, str]) -> Optional[Prospect]:
     if not data:
         return None
 
     try:
-        return Prospect(
-            id=prospect_id,
-            first_name=data.get("first_name") or None,
-            last_name=data.get("last_name") or None,
-            phone=data.get("phone", ""),
-            timezone=data.get("timezone") or None,
-            status=data.get("status", "new"),
-            objections=json.loads(data.get("objections") or "[]"),
-            responses=json.loads(data.get("responses") or "[]"),
-            appointment_date=parse_date(data.get("appointment_date")),
-            appointment_time=parse_time_str(data.get("appointment_time")) or None,
-            email=data.get("email") or None,
-            created_at=parse_datetime(data.get("created_at")) or datetime.utcnow(),
-            updated_at=parse_datetime(data.get("updated_at")) or datetime.utcnow(),
-        )
+        return Prospect.from_hash(prospect_id, data)
     except Exception as e:
         logger.error(f"Error mapping prospect {prospect_id}: {e}")
         return None
+
+
+def _conflict(prospect: Prospect) -> RuntimeError:
+    return RuntimeError(f"Prospect {prospect.id} kept changing during save ({WRITE_ATTEMPTS} attempts)")
+
+
+def save_prospect_to_db(prospect: Prospect) -> None:
+    for _ in range(WRITE_ATTEMPTS):
+        prior = redis.hmget(prospect_key(prospect.id), *PRIOR_INDEX_FIELDS)
+        if redis.eval(_WRITE_IF_UNCHANGED, **_write_script(prospect, prior)):
+            prospect.mark_clean()
+            return
+    raise _conflict(prospect)
+
+
+# Get prospect
+def get_prospect_from_db(prospect_id: str) -> Optional[Prospect]:
+    data = redis.hgetall(prospect_key(prospect_id))
+    return _from_hash(prospect_id, data)
+
+
+# -------------------------------Async API, safe to await from agent tool handlers-------------------------------
+async def _async_write(client, prospect: Prospect, fields: Optional[Iterable[str]] = None) -> None:
+    if not _needs_prior(fields):
+        await client.eval(_WRITE_IF_UNCHANGED, **_write_script(prospect, None, fields))
+        return
+    for _ in range(WRITE_ATTEMPTS):
+        prior = await client.hmget(prospect_key(prospect.id), *PRIOR_INDEX_FIELDS)
+        if await client.eval(_WRITE_IF_UNCHANGED, **_write_script(prospect, prior, fields)):
+            return
+    raise _conflict(prospect)
+
+
+async def async_save_prospect(prospect: Prospect) -> None:
+    await _async_write(get_async_redis(), prospect)
+    prospect.mark_clean()
+
+
+async def async_save_prospect_fields(prospect: Prospect, fields: Iterable[str]) -> None:
+    """Write only the given fields of the prospect hash (partial update)."""
+    fields = list(fields)
+    if not fields:
+        return
+    client = get_async_redis()
+    # Clear before awaiting so edits made during the write stay dirty
+    prospect.mark_clean(fields)
+    try:
+        if not INDEXED_FIELDS & set(fields):
+            await client.hset(prospect_key(prospect.id), values=prospect.to_hash(fields))
+            return
+        await _async_write(client, prospect, fields)
+    except Exception:
+        prospect.mark_dirty(fields)
+        raise
+
+
+async def async_get_prospect(prospect_id: str) -> Optional[Prospect]:
+    client = get_async_redis()
+    data = await client.hgetall(prospect_key(prospect_id))
+    return _from_hash(prospect_id, data)
+
+
+# -------------------------------Bulk API, pipelined for campaign prefetch-------------------------------
+BULK_CHUNK_SIZE = 500
+
+
+def _chunks(items: Iterable, size: int) -> Iterator[List]:
+    it = iter(items)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _map_chunk(ids: List[str], rows: List[Dict[str, str]]) -> Dict[str, Prospect]:
+    prospects = {}
+    for prospect_id, data in zip(ids, rows):
+        prospect = _from_hash(prospect_id, data)
+        if prospect is not None:
+            prospects[prospect_id] = prospect
+    return prospects
+
+
+def iter_prospects_bulk(prospect_ids: Iterable[str], chunk_size: int = BULK_CHUNK_SIZE) -> Iterator[Prospect]:
+    """Stream prospects, reading `chunk_size` hashes per pipelined round trip. Missing ids are skipped."""
+    for ids in _chunks(prospect_ids, chunk_size):
+        pipeline = redis.pipeline()
+        for prospect_id in ids:
+            pipeline.hgetall(prospect_key(prospect_id))
+        yield from _map_chunk(ids, pipeline.exec()).values()
+
+
+def get_prospects_bulk(prospect_ids: Iterable[str], chunk_size: int = BULK_CHUNK_SIZE) -> Dict[str, Prospect]:
+    return {p.id: p for p in iter_prospects_bulk(prospect_ids, chunk_size)}
+
+
+def save_prospects_bulk(prospects: Iterable[Prospect], chunk_size: int = BULK_CHUNK_SIZE) -> int:
+    """
+    Save prospects and their index entries, `chunk_size` per pipelined round trip; each prospect's
+    write is atomic. Prospects changed by another writer in between are saved one by one.
+    Returns the number saved.
+    """
+    saved = 0
+    for chunk in _chunks(prospects, chunk_size):
+        pipeline = redis.pipeline()
+        for prospect in chunk:
+            pipeline.hmget(prospect_key(prospect.id), *PRIOR_INDEX_FIELDS)
+        priors = pipeline.exec()
+
+        pipeline = redis.pipeline()
+        for prospect, prior in zip(chunk, priors):
+            pipeline.eval(_WRITE_IF_UNCHANGED, **_write_script(prospect, prior))
+        for prospect, written in zip(chunk, pipeline.exec()):
+            if written:
+                prospect.mark_clean()
+            else:
+                save_prospect_to_db(prospect)
+        saved += len(chunk)
+    return saved
+
+
+async def async_iter_prospects_bulk(prospect_ids: Iterable[str], chunk_size: int = BULK_CHUNK_SIZE) -> AsyncIterator[Prospect]:
+    client = get_async_redis()
+    for ids in _chunks(prospect_ids, chunk_size):
+        pipeline = client.pipeline()
+        for prospect_id in ids:
+            pipeline.hgetall(prospect_key(prospect_id))
+        for prospect in _map_chunk(ids, await pipeline.exec()).values():
+            yield prospect
+
+
+async def async_get_prospects_bulk(prospect_ids: Iterable[str], chunk_size: int = BULK_CHUNK_SIZE) -> Dict[str, Prospect]:
+    return {p.id: p async for p in async_iter_prospects_bulk(prospect_ids, chunk_size)}
+
+
+async def async_save_prospects_bulk(prospects: Iterable[Prospect], chunk_size: int = BULK_CHUNK_SIZE) -> int:
+    client = get_async_redis()
+    saved = 0
+    for chunk in _chunks(prospects, chunk_size):
+        pipeline = client.pipeline()
+        for prospect in chunk:
+            pipeline.hmget(prospect_key(prospect.id), *PRIOR_INDEX_FIELDS)
+        priors = await pipeline.exec()
+
+        pipeline = client.pipeline()
+        for prospect, prior in zip(chunk, priors):
+            pipeline.eval(_WRITE_IF_UNCHANGED, **_write_script(prospect, prior))
+        for prospect, written in zip(chunk, await pipeline.exec()):
+            if not written:
+                await _async_write(client, prospect)
+            prospect.mark_clean()
+        saved += len(chunk)
+    return saved
+
+
+# -------------------------------Index queries, O(matches) instead of a keyspace SCAN-------------------------------
+def _appointment_range(start: date, end: Optional[date]) -> Tuple[int, int]:
+    return _date_score(start), _date_score(end or start)
+
+
+def get_prospect_ids_by_status(status: str) -> List[str]:
+    return list(redis.smembers(status_index_key(status)))
+
+
+def get_prospect_id_by_phone(phone: str) -> Optional[str]:
+    normalized = normalize_phone(phone)
+    return redis.hget(PHONE_INDEX_KEY, normalized) if normalized else None
+
+
+def get_prospect_ids_by_appointment_date(start: date, end: Optional[date] = None) -> List[str]:
+    """Ids of prospects with an appointment between `start` and `end` (inclusive; defaults to `start`)."""
+    low, high = _appointment_range(start, end)
+    return list(redis.zrange(APPOINTMENT_INDEX_KEY, low, high, sortby="BYSCORE"))
+
+
+def iter_prospects_by_status(status: str, chunk_size: int = BULK_CHUNK_SIZE) -> Iterator[Prospect]:
+    return iter_prospects_bulk(get_prospect_ids_by_status(status), chunk_size)
+
+
+def get_prospect_by_phone(phone: str) -> Optional[Prospect]:
+    prospect_id = get_prospect_id_by_phone(phone)
+    return get_prospect_from_db(prospect_id) if prospect_id else None
+
+
+def get_prospects_by_appointment_date(start: date, end: Optional[date] = None) -> Dict[str, Prospect]:
+    return get_prospects_bulk(get_prospect_ids_by_appointment_date(start, end))
+
+
+async def async_get_prospect_ids_by_status(status: str) -> List[str]:
+    return list(await get_async_redis().smembers(status_index_key(status)))
+
+
+async def async_get_prospect_by_phone(phone: str) -> Optional[Prospect]:
+    normalized = normalize_phone(phone)
+    if not normalized:
+        return None
+    prospect_id = await get_async_redis().hget(PHONE_INDEX_KEY, normalized)
+    return await async_get_prospect(prospect_id) if prospect_id else None
+
+
+async def async_get_prospects_by_appointment_date(start: date, end: Optional[date] = None) -> Dict[str, Prospect]:
+    low, high = _appointment_range(start, end)
+    ids = await get_async_redis().zrange(APPOINTMENT_INDEX_KEY, low, high, sortby="BYSCORE")
+    return await async_get_prospects_bulk(ids)
@@ -0,0 +1,59 @@
+# prospect_write_buffer.py
+import asyncio
+from datetime import datetime
+from typing import Optional
+
+from models.prospect import Prospect
+from repository.prospect_repository import async_save_prospect_fields
+from utils.monitoring_utils.logging import get_logger
+
+logger = get_logger("prospect-write-buffer")
+
+
+class ProspectWriteBuffer:
+    """
+    Per-session write-behind buffer for a Prospect.
+    - `mark()` schedules a flush `delay` seconds later; further marks inside
+      that window are coalesced into the same write.
+    - `flush()` writes only the fields changed since the last save.
+    Register `flush` as a job shutdown callback so nothing is lost at hangup.
+    """
+
+    def __init__(self, prospect: Optional[Prospect] = None, delay: float = 2.0):
+        self.prospect = prospect
+        self.delay = delay
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._lock = asyncio.Lock()
+
+    def mark(self, prospect: Optional[Prospect] = None) -> None:
+        if prospect is not None:
+            self.prospect = prospect
+        if self._timer is None:
+            loop = asyncio.get_running_loop()
+            self._timer = loop.call_later(self.delay, self._flush_later)
+
+    def _flush_later(self) -> None:
+        self._timer = None
+        task = asyncio.create_task(self.flush())
+        task.add_done_callback(self._log_failure)
+
+    @staticmethod
+    def _log_failure(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception():
+            logger.error(f"Deferred prospect flush failed: {task.exception()}")
+
+    async def flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self.prospect is None:
+            return
+
+        async with self._lock:
+            fields = self.prospect.dirty_fields
+            if not fields:
+                return
+            self.prospect.updated_at = datetime.utcnow()
+            fields.add("updated_at")
+            await async_save_prospect_fields(self.prospect, fields)
+            logger.debug(f"Flushed prospect {self.prospect.id} fields: {sorted(fields)}")
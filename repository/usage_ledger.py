@@ -0,0 +1,69 @@
+# usage_ledger.py
+import json
+from datetime import datetime, timezone
+from typing import Dict, List
+
+from utils.config_utils.db_config import get_async_redis
+
+# usage:calls:{YYYY-MM-DD}  list, append-only: one compact JSON entry per call or booking
+#   {"ev": "call", "at": epoch, "dur": seconds, "agent": ..., "campaign": ..., "prospect": ...,
+#    "room": ..., "usage": {...}, "providers": {"llm:openai": {...}}, "cost": {"llm:openai": usd}, "usd": total}
+#   {"ev": "booked", "at": epoch, "agent": ..., "campaign": ..., "prospect": ..., "room": ...}
+# usage:rollup:{campaign|agent|hour}:{value}  hash of running totals, updated with each entry:
+#   calls, seconds, booked, usd, usd:{kind}:{provider}, and the usage counters
+CAMPAIGN = "campaign"
+AGENT = "agent"
+HOUR = "hour"
+
+
+def calls_key(day: str) -> str:
+    return f"usage:calls:{day}"
+
+
+def rollup_key(dimension: str, value: str) -> str:
+    return f"usage:rollup:{dimension}:{value}"
+
+
+def hour_of(epoch: float) -> str:
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime("%Y-%m-%dT%H")
+
+
+def _rollup_keys(entry: Dict) -> List[str]:
+    # A call is rolled up under the hour it started, so its booking lands in the same bucket
+    keys = [rollup_key(AGENT, entry["agent"]), rollup_key(HOUR, hour_of(entry["at"]))]
+    if entry.get("campaign"):
+        keys.append(rollup_key(CAMPAIGN, entry["campaign"]))
+    return keys
+
+
+async def append_call(entry: Dict, totals: Dict[str, float]) -> None:
+    """Append the call entry and add `totals` to its rollups, in one transaction."""
+    client = get_async_redis()
+    transaction = client.multi()
+    transaction.rpush(calls_key(hour_of(entry["at"])[:10]), json.dumps(entry, separators=(",", ":")))
+    for key in _rollup_keys(entry):
+        for field, amount in totals.items():
+            if isinstance(amount, int):
+                transaction.hincrby(key, field, amount)
+            else:
+                transaction.hincrbyfloat(key, field, amount)
+    await transaction.exec()
+
+
+async def append_booking(entry: Dict) -> None:
+    client = get_async_redis()
+    transaction = client.multi()
+    transaction.rpush(calls_key(hour_of(entry["at"])[:10]), json.dumps({"ev": "booked", **entry}, separators=(",", ":")))
+    for key in _rollup_keys(entry):
+        transaction.hincrby(key, "booked", 1)
+    await transaction.exec()
+
+
+async def get_rollup(dimension: str, value: str) -> Dict[str, float]:
+    """Running totals for one campaign, agent module or hour, with cost per call and per booking."""
+    raw = await get_async_redis().hgetall(rollup_key(dimension, value)) or {}
+    totals = {field: float(amount) for field, amount in raw.items()}
+    calls, booked = totals.get("calls", 0), totals.get("booked", 0)
+    totals["usd_per_call"] = totals.get("usd", 0.0) / calls if calls else 0.0
+    totals["usd_per_booking"] = totals.get("usd", 0.0) / booked if booked else 0.0
+    return totals
@@ -0,0 +1,189 @@
+import asyncio
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+import unittest
+from unittest import mock
+
+import booking_queue
+from booking_queue import DONE, FAILED, PENDING, RUNNING, BookingQueue
+
+PAYLOAD = {"summary": "Call", "description": "", "start_time": "2025-01-02 10:00", "attendee_email": "a@b.c"}
+
+
+class FakeBooking:
+    """Stands in for book_appointment.schedule_appointment; fails the first `failures` calls."""
+
+    def __init__(self, failures: int = 0, block: threading.Event = None):
+        self.failures = failures
+        self.block = block
+        self.calls = 0
+        self.started = threading.Event()
+
+    def __call__(self, **payload):
+        self.calls += 1
+        self.started.set()
+        if self.block is not None:
+            self.block.wait(5)
+        if self.calls <= self.failures:
+            raise RuntimeError(f"attempt {self.calls} failed")
+        return {"event": {"id": "evt"}, "meet_link": "https://meet", "duplicate": False}
+
+
+def dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+class BookingQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "bookings.db")
+        self.booking = FakeBooking()
+        module = types.ModuleType("book_appointment")
+        module.schedule_appointment = lambda **payload: self.booking(**payload)
+        patches = [
+            mock.patch.dict(sys.modules, {"book_appointment": module}),
+            mock.patch.object(booking_queue, "RETRY_BASE_SECONDS", 0.01),
+            mock.patch.object(booking_queue, "POLL_SECONDS", 0.01),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.queues = []
+
+    def tearDown(self):
+        for queue in self.queues:
+            queue.stop()
+        self.dir.cleanup()
+
+    def queue(self) -> BookingQueue:
+        queue = BookingQueue(self.path, workers=2, max_attempts=3)
+        self.queues.append(queue)
+        return queue
+
+    def insert_running(self, key: str, owner, heartbeat_at: float) -> None:
+        # The schema comes from a queue that is stopped straight away
+        self.queue().stop()
+        db = sqlite3.connect(self.path, isolation_level=None)
+        now = time.time()
+        db.execute(
+            "INSERT INTO booking_jobs (key, payload, status, attempts, next_attempt_at, created_at, updated_at, "
+            "owner, heartbeat_at) VALUES (?, '{}', ?, 1, ?, ?, ?, ?, ?)",
+            (key, RUNNING, now, now, now, owner, heartbeat_at),
+        )
+        db.close()
+
+    def wait(self, queue: BookingQueue, key: str) -> dict:
+        return asyncio.run(queue.wait_for(key, timeout=5))
+
+    # -----------------------------
+    # CLAIM AND RETRY
+    # -----------------------------
+    def test_job_runs_once_per_key(self):
+        queue = self.queue()
+        queue.enqueue("k1", PAYLOAD)
+        job = self.wait(queue, "k1")
+        self.assertEqual(job["status"], DONE)
+        self.assertEqual(job["result"]["event_id"], "evt")
+        self.assertIsNone(job["owner"])
+
+        again = queue.enqueue("k1", PAYLOAD)
+        self.assertEqual(again["status"], DONE)
+        self.assertEqual(self.booking.calls, 1)
+
+    def test_claim_is_exclusive_across_queues(self):
+        self.booking.block = threading.Event()
+        first, second = self.queue(), self.queue()
+        first.enqueue("k1", PAYLOAD)
+        self.assertTrue(self.booking.started.wait(5))
+        self.assertIsNone(second._claim_next())
+        self.assertEqual(second.recover_orphans(), 0)
+        self.booking.block.set()
+        self.assertEqual(self.wait(first, "k1")["status"], DONE)
+        self.assertEqual(self.booking.calls, 1)
+
+    def test_retries_until_success(self):
+        self.booking.failures = 2
+        queue = self.queue()
+        queue.enqueue("k1", PAYLOAD)
+        job = self.wait(queue, "k1")
+        self.assertEqual(job["status"], DONE)
+        self.assertEqual(job["attempts"], 3)
+
+    def test_fails_after_max_attempts_and_enqueue_rearms(self):
+        self.booking.failures = 3
+        queue = self.queue()
+        queue.enqueue("k1", PAYLOAD)
+        job = self.wait(queue, "k1")
+        self.assertEqual(job["status"], FAILED)
+        self.assertEqual(job["attempts"], 3)
+        self.assertIn("attempt 3 failed", job["error"])
+
+        queue.enqueue("k1", PAYLOAD)
+        self.assertEqual(self.wait(queue, "k1")["status"], DONE)
+
+    # -----------------------------
+    # RECOVERY
+    # -----------------------------
+    def test_live_owner_keeps_its_job(self):
+        self.insert_running("k1", f"{os.getpid()}:other", time.time())
+        queue = self.queue()
+        self.assertEqual(queue.recover_orphans(), 0)
+        self.assertEqual(queue.status("k1")["status"], RUNNING)
+        self.assertEqual(self.booking.calls, 0)
+
+    def test_dead_owner_job_is_recovered_and_run(self):
+        self.insert_running("k1", f"{dead_pid()}:gone", time.time())
+        queue = self.queue()
+        job = self.wait(queue, "k1")
+        self.assertEqual(job["status"], DONE)
+        self.assertEqual(job["attempts"], 2)
+        self.assertEqual(self.booking.calls, 1)
+
+    def test_stale_heartbeat_job_is_recovered(self):
+        self.insert_running("k1", f"{os.getpid()}:hung", time.time() - booking_queue.STALE_SECONDS - 1)
+        queue = self.queue()
+        self.assertEqual(self.wait(queue, "k1")["status"], DONE)
+
+    def test_unowned_running_job_is_recovered(self):
+        # Rows claimed before jobs recorded an owner
+        self.insert_running("k1", None, None)
+        queue = self.queue()
+        self.assertEqual(self.wait(queue, "k1")["status"], DONE)
+
+    def test_owner_that_lost_its_job_does_not_settle_it(self):
+        self.booking.block = threading.Event()
+        queue = self.queue()
+        queue.enqueue("k1", PAYLOAD)
+        self.assertTrue(self.booking.started.wait(5))
+        db = sqlite3.connect(self.path, isolation_level=None)
+        # Handed back (and not yet due) while the attempt is still running
+        db.execute(
+            "UPDATE booking_jobs SET status = ?, owner = NULL, next_attempt_at = ? WHERE key = 'k1'",
+            (PENDING, time.time() + 3600),
+        )
+        db.close()
+        self.booking.block.set()
+        queue.stop()
+        job = queue.status("k1")
+        self.assertEqual(job["status"], PENDING)
+        self.assertIsNone(job["result"])
+
+    def test_drain_waits_for_enqueued_jobs(self):
+        queue = self.queue()
+        queue.enqueue("k1", PAYLOAD)
+        queue.enqueue("k2", {**PAYLOAD, "start_time": "2025-01-02 11:00"})
+        jobs = asyncio.run(queue.drain(timeout=5))
+        self.assertEqual(sorted(job["status"] for job in jobs), [DONE, DONE])
+        self.assertEqual(queue._enqueued, set())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+from datetime import date, datetime
+
+from models.prospect import Prospect
+
+
+def make_prospect(**overrides) -> Prospect:
+    fields = dict(
+        id="p1",
+        first_name="Asha",
+        last_name="Rao",
+        phone="+919800000000",
+        whatsApp_phone="+919800000000",
+        timezone="Asia/Kolkata",
+        status="contacted",
+        address="12 MG Road, Bengaluru",
+        objections=["price", "timing"],
+        responses=["follow up next week"],
+        appointment_date=date(2025, 1, 2),
+        appointment_time="10:30",
+        email="asha@example.com",
+        created_at=datetime(2025, 1, 1, 9, 0, 0),
+        updated_at=datetime(2025, 1, 1, 9, 5, 0),
+    )
+    fields.update(overrides)
+    return Prospect(**fields)
+
+
+class ProspectBinaryTest(unittest.TestCase):
+    def round_trip(self, prospect: Prospect) -> Prospect:
+        decoded = Prospect.from_bytes(prospect.to_bytes())
+        self.assertEqual(decoded, prospect)
+        self.assertEqual(decoded.dirty_fields, set())
+        return decoded
+
+    def test_round_trip(self):
+        self.round_trip(make_prospect())
+
+    def test_round_trip_none_fields(self):
+        decoded = self.round_trip(make_prospect(
+            first_name=None, last_name=None, timezone=None, address=None,
+            appointment_date=None, appointment_time=None, email=None,
+        ))
+        self.assertIsNone(decoded.email)
+        self.assertIsNone(decoded.appointment_date)
+
+    def test_round_trip_empty_fields(self):
+        decoded = self.round_trip(make_prospect(phone="", whatsApp_phone="", objections=[], responses=[]))
+        self.assertEqual(decoded.phone, "")
+        self.assertEqual(decoded.objections, [])
+
+    def test_round_trip_large_fields(self):
+        # Exactly the old u16 None marker, and past the u16 range
+        for size in (0xFFFF, 0xFFFF + 1, 200_000):
+            with self.subTest(size=size):
+                decoded = self.round_trip(make_prospect(address="a" * size, responses=["r" * size]))
+                self.assertEqual(len(decoded.address), size)
+
+    def test_round_trip_multibyte_text(self):
+        self.round_trip(make_prospect(first_name="अशा", address="Straße ✓" * 10_000))
+
+    def test_rejects_unknown_version(self):
+        payload = bytearray(make_prospect().to_bytes())
+        payload[0] = 1
+        with self.assertRaises(ValueError):
+            Prospect.from_bytes(bytes(payload))
+        with self.assertRaises(ValueError):
+            Prospect.from_bytes(b"")
+
+
+class ProspectDirtyTrackingTest(unittest.TestCase):
+    def test_new_prospect_is_all_dirty(self):
+        self.assertEqual(make_prospect().dirty_fields, set(Prospect.FIELDS))
+
+    def test_assignment_marks_dirty(self):
+        prospect = make_prospect()
+        prospect.mark_clean()
+        prospect.status = "booked"
+        prospect.objections = prospect.objections + ["budget"]
+        self.assertEqual(prospect.dirty_fields, {"status", "objections"})
+
+    def test_in_place_list_edit_needs_mark_dirty(self):
+        prospect = make_prospect()
+        prospect.mark_clean()
+        prospect.responses.append("call back")
+        self.assertEqual(prospect.dirty_fields, set())
+        prospect.mark_dirty(["responses"])
+        self.assertEqual(prospect.dirty_fields, {"responses"})
+
+    def test_mark_clean_fields(self):
+        prospect = make_prospect()
+        prospect.mark_clean(["id", "phone"])
+        self.assertEqual(prospect.dirty_fields, set(Prospect.FIELDS) - {"id", "phone"})
+
+
+if __name__ == "__main__":
+    unittest.main()
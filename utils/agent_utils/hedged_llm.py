@@ -0,0 +1,167 @@
+import asyncio
+import dataclasses
+import time
+from typing import Any, Optional
+from livekit.agents import llm
+from livekit.agents.types import DEFAULT_API_CONNECT_OPTIONS, APIConnectOptions
+from utils.agent_utils.provider_router import provider_router
+from utils.config_utils.env_loader import get_env_var
+from utils.monitoring_utils.logging import get_logger
+
+logger = get_logger("HEDGED-LLM")
+
+# Hedge once the primary is slower than this percentile of its own recent TTFT
+HEDGE_PERCENTILE = float(get_env_var("LLM_HEDGE_PERCENTILE", required=False, default="0.95"))
+# Budget used until the primary has TTFT samples
+DEFAULT_BUDGET_SECONDS = float(get_env_var("LLM_HEDGE_DEFAULT_BUDGET", required=False, default="1.5"))
+# Floor for the computed budget
+MIN_BUDGET_SECONDS = 0.3
+
+_END = object()
+
+
+class HedgedLLM(llm.LLM):
+    """
+    LLM wrapper for AgentSession(llm=...). Each turn is sent to the primary; if it has not
+    produced a first token within the hedge budget, the same request goes to the secondary and
+    whichever streams first wins. The losing stream is cancelled.
+
+    Metrics are the primary's and secondary's own, re-emitted here, so each request is priced
+    as the provider that served it and a cancelled loser's usage is counted too (as far as
+    its provider reported any before it was cancelled).
+    """
+
+    def __init__(
+        self,
+        primary: llm.LLM,
+        secondary: llm.LLM,
+        *,
+        primary_name: str,
+        percentile: float = HEDGE_PERCENTILE,
+        default_budget: float = DEFAULT_BUDGET_SECONDS,
+    ):
+        super().__init__()
+        self._label = primary.label
+        self.primary = primary
+        self.secondary = secondary
+        self.primary_name = primary_name
+        self.percentile = percentile
+        self.default_budget = default_budget
+        for child in (primary, secondary):
+            child.on("metrics_collected", self._forward_metrics)
+
+    def _forward_metrics(self, metrics) -> None:
+        self.emit("metrics_collected", metrics)
+
+    @property
+    def model(self) -> str:
+        return self.primary.model
+
+    def hedge_budget(self) -> float:
+        ttft = provider_router.view("llm", self.primary_name).percentile(self.percentile)
+        return max(MIN_BUDGET_SECONDS, ttft if ttft is not None else self.default_budget)
+
+    def chat(
+        self,
+        *,
+        chat_ctx: llm.ChatContext,
+        tools: Optional[list] = None,
+        conn_options: APIConnectOptions = DEFAULT_API_CONNECT_OPTIONS,
+        **kwargs: Any,
+    ) -> "HedgedLLMStream":
+        return HedgedLLMStream(
+            self,
+            chat_ctx=chat_ctx,
+            tools=tools or [],
+            # Retries happen inside the primary/secondary streams, not around the hedge
+            conn_options=dataclasses.replace(conn_options, max_retry=0),
+            child_conn_options=conn_options,
+            chat_kwargs=kwargs,
+        )
+
+    async def aclose(self) -> None:
+        # Primary and secondary are pooled and owned by the provider pool
+        for child in (self.primary, self.secondary):
+            child.off("metrics_collected", self._forward_metrics)
+
+
+class HedgedLLMStream(llm.LLMStream):
+    def __init__(self, hedged: HedgedLLM, *, chat_ctx, tools, conn_options, child_conn_options, chat_kwargs):
+        super().__init__(hedged, chat_ctx=chat_ctx, tools=tools, conn_options=conn_options)
+        self._hedged = hedged
+        self._child_tools = tools
+        self._child_conn_options = child_conn_options
+        self._chat_kwargs = chat_kwargs
+
+    async def _metrics_monitor_task(self, event_aiter) -> None:
+        # The racers report their own metrics, which HedgedLLM re-emits; this stream's would
+        # count the winner's turn twice
+        async for _ in event_aiter:
+            pass
+
+    def _start(self, target: llm.LLM):
+        stream = target.chat(
+            chat_ctx=self._chat_ctx,
+            tools=self._child_tools,
+            conn_options=self._child_conn_options,
+            **self._chat_kwargs,
+        )
+        return stream, asyncio.create_task(self._first_chunk(stream))
+
+    @staticmethod
+    async def _first_chunk(stream):
+        try:
+            return await stream.__anext__()
+        except StopAsyncIteration:
+            return _END
+
+    async def _run(self) -> None:
+        hedged = self._hedged
+        primary_stats = provider_router.stats("llm", hedged.primary_name)
+        budget = hedged.hedge_budget()
+
+        started = time.perf_counter()
+        primary, primary_task = self._start(hedged.primary)
+        racers = {primary_task: primary}
+        winner = None
+        try:
+            done, _ = await asyncio.wait({primary_task}, timeout=budget)
+            if not done or primary_task.exception() is not None:
+                reason = f"no first token after {budget:.2f}s" if not done else "failed"
+                logger.info(f"Primary LLM {reason}, hedging to secondary")
+                secondary, secondary_task = self._start(hedged.secondary)
+                racers[secondary_task] = secondary
+
+            pending = set(racers)
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner = task
+                        break
+                    logger.warning(f"Hedged LLM request failed: {task.exception()}")
+            if winner is None:
+                # Every racer failed; surface the primary's error
+                raise primary_task.exception()
+        finally:
+            if len(racers) > 1 and winner is not primary_task and not primary_task.done():
+                # The primary's own metrics drop a request cancelled before its first token, which
+                # would leave only its fast samples and shrink the budget; record it as censored
+                primary_stats.record_censored(max(time.perf_counter() - started, budget))
+            # Also runs when the turn is interrupted while racing
+            for task, stream in racers.items():
+                if task is not winner:
+                    task.cancel()
+                    await stream.aclose()
+
+        stream = racers[winner]
+        if len(racers) > 1:
+            logger.info(f"Hedged LLM won by {'primary' if stream is primary else 'secondary'}")
+        try:
+            first = winner.result()
+            if first is not _END:
+                self._event_ch.send_nowait(first)
+                async for chunk in stream:
+                    self._event_ch.send_nowait(chunk)
+        finally:
+            await stream.aclose()
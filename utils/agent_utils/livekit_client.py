@@ -0,0 +1,83 @@
+import asyncio
+import time
+from typing import Dict, Optional, Tuple
+import aiohttp
+from livekit import api
+from utils.config_utils.config_loader import get_livekit_credentials
+from utils.monitoring_utils.logging import get_logger
+
+logger = get_logger("LIVEKIT-CLIENT")
+
+# Keep-alive pool for the LiveKit server API: dispatch, SIP and room calls reuse its connections
+POOL_CONNECTIONS = 100
+POOL_KEEPALIVE_SECONDS = 120.0
+# Same total timeout as LiveKitAPI's default; create_sip_participant(wait_until_answered) rings within it
+REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=60)
+# Access tokens are issued with LiveKit's default TTL (hours); reissue well before they expire
+TOKEN_REFRESH_SECONDS = 10 * 60
+
+_SERVICES = ("room", "agent_dispatch", "sip", "egress", "ingress")
+
+
+class _TokenCache:
+    """
+    Wraps a service's `_auth_header` so each set of grants is signed once per TOKEN_REFRESH_SECONDS
+    instead of on every request.
+    """
+
+    def __init__(self, auth_header):
+        self._auth_header = auth_header
+        self._headers: Dict[str, Tuple[Dict[str, str], float]] = {}
+
+    def __call__(self, *args, **kwargs) -> Dict[str, str]:
+        # Grants are unhashable dataclasses; their repr identifies them
+        key = repr((args, sorted(kwargs.items())))
+        cached = self._headers.get(key)
+        now = time.monotonic()
+        if cached is None or cached[1] <= now:
+            cached = (self._auth_header(*args, **kwargs), now + TOKEN_REFRESH_SECONDS)
+            self._headers[key] = cached
+        return cached[0]
+
+
+class LiveKitClient:
+    """
+    One LiveKitAPI per process on a pooled keep-alive HTTP session, with cached access tokens.
+    Bound to the event loop it was created on.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.session = aiohttp.ClientSession(
+            timeout=REQUEST_TIMEOUT,
+            connector=aiohttp.TCPConnector(limit=POOL_CONNECTIONS, keepalive_timeout=POOL_KEEPALIVE_SECONDS),
+        )
+        self.api = api.LiveKitAPI(**get_livekit_credentials(), session=self.session)
+        for name in _SERVICES:
+            service = getattr(self.api, name, None)
+            if service is not None and hasattr(service, "_auth_header"):
+                service._auth_header = _TokenCache(service._auth_header)
+
+    async def aclose(self) -> None:
+        await self.api.aclose()
+        # LiveKitAPI leaves a session it was given open
+        await self.session.close()
+
+
+_client: Optional[LiveKitClient] = None
+
+
+def get_livekit_api() -> api.LiveKitAPI:
+    """Shared LiveKitAPI for the running loop. Don't close it; call `close_livekit_api()` on shutdown."""
+    global _client
+    if _client is None or _client.loop is not asyncio.get_running_loop():
+        _client = LiveKitClient()
+        logger.info("LiveKit API client created")
+    return _client.api
+
+
+async def close_livekit_api() -> None:
+    global _client
+    if _client is not None:
+        client, _client = _client, None
+        await client.aclose()
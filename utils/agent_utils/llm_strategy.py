@@ -2,12 +2,14 @@ import asyncio
 from typing import Optional
 from utils.config_utils.env_loader import get_env_var
 from utils.config_utils.config_loader import get_config
-from livekit.plugins import openai, google
-import httpx
-import openai as openai_client
+from utils.agent_utils.provider_pool import provider_pool, HTTP_TIMEOUT
+from utils.agent_utils.provider_router import provider_router
+from utils.agent_utils.hedged_llm import HedgedLLM
 from utils.monitoring_utils.logging import get_logger
+from livekit.agents import llm as agents_llm
 from abc import ABC, abstractmethod
 
+# Plugins are imported inside create(), so a worker only loads the ones its strategies use
 logger = get_logger("LLM-FACTORY")
 
 # Environment to LLM mapping
@@ -32,19 +34,12 @@ class OpenAIStrategy(LLMStrategy):
             return None
         params = {
             "temperature": 0.3,
-            "timeout": httpx.Timeout(connect=15.0, read=45.0, write=10.0, pool=20.0),
-            "client": openai_client.AsyncClient(
-                api_key=api_key,
-                max_retries=3,
-                timeout=httpx.Timeout(connect=15.0, read=45.0, write=10.0, pool=20.0),
-                http_client=httpx.AsyncClient(
-                    limits=httpx.Limits(max_connections=10000, max_keepalive_connections=2000),
-                    follow_redirects=True,
-                ),
-            ),
+            "timeout": HTTP_TIMEOUT,
+            "client": provider_pool.openai_client(api_key),
             "max_completion_tokens": 150,
         }
         logger.debug("Instantiating openai LLM")
+        from livekit.plugins import openai
         return openai.LLM(api_key=api_key, model="gpt-4o-mini", **params)
 
 class OpenAIRealtimeStrategy(LLMStrategy):
@@ -55,19 +50,12 @@ class OpenAIRealtimeStrategy(LLMStrategy):
             return None
         params = {
             "temperature": 0.1,
-            "timeout": httpx.Timeout(connect=15.0, read=45.0, write=10.0, pool=20.0),
-            "client": openai_client.AsyncClient(
-                api_key=api_key,
-                max_retries=3,
-                timeout=httpx.Timeout(connect=15.0, read=45.0, write=10.0, pool=20.0),
-                http_client=httpx.AsyncClient(
-                    limits=httpx.Limits(max_connections=10000, max_keepalive_connections=2000),
-                    follow_redirects=True,
-                ),
-            ),
+            "timeout": HTTP_TIMEOUT,
+            "client": provider_pool.openai_client(api_key),
             "max_completion_tokens": 150,
         }
         logger.debug("Instantiating openai-realtime LLM")
+        from livekit.plugins import openai
         return openai.LLM(api_key=api_key, model="gpt-4o", **params)
 
 class GoogleStrategy(LLMStrategy):
@@ -78,6 +66,7 @@ class GoogleStrategy(LLMStrategy):
             return None
         params = {"temperature": 0.3}
         logger.debug("Instantiating google LLM")
+        from livekit.plugins import google
         return google.LLM(api_key=api_key, model="gemini-1.5-flash", **params)
 
 class AzureOpenAIStrategy(LLMStrategy):
@@ -92,7 +81,29 @@ class AzureOpenAIStrategy(LLMStrategy):
             "api_version": "2024-12-01-preview"
         }
         logger.debug("Instantiating azure-openai LLM")
-        return openai.LLM.with_azure(api_key=api_key, model="gpt-4o-mini", **params)
+        from livekit.plugins import openai
+        # What LLM.with_azure does, but on the pooled client instead of a new one per instance
+        return openai.LLM(model="gpt-4o-mini", client=provider_pool.azure_openai_client(api_key, **params))
+
+async def _with_hedge(llm: object, selected_llm: str, strategies: dict) -> object:
+    """Wrap the LLM in a HedgedLLM when LLM_HEDGE_WITH names a secondary strategy."""
+    hedge_with = (get_env_var("LLM_HEDGE_WITH", required=False, default="") or "").strip()
+    if not hedge_with or hedge_with == selected_llm:
+        return llm
+    if hedge_with not in strategies:
+        logger.error(f"No strategy found for hedge LLM: {hedge_with}")
+        return llm
+    try:
+        secondary = await provider_router.create("llm", hedge_with, strategies[hedge_with])
+    except Exception as e:
+        logger.error(f"Could not instantiate hedge LLM {hedge_with}: {e}")
+        return llm
+    if not secondary:
+        return llm
+    logger.info(f"Hedging LLM {selected_llm} with {hedge_with}")
+    # The hedge budget comes from every job process's TTFT samples, not just this new one's
+    await provider_router.refresh_if_stale()
+    return HedgedLLM(llm, secondary, primary_name=selected_llm)
 
 async def get_llm() -> Optional[object]:
     env = get_env_var("ENV", default="dev").lower()
@@ -106,21 +117,30 @@ async def get_llm() -> Optional[object]:
         "azure-openai": AzureOpenAIStrategy()
     }
 
+    # With extra LLM_CANDIDATES configured, route to the fastest healthy one with live failover
+    candidates = provider_router.candidates("llm", selected_llm)
+    if len(candidates) > 1:
+        llm = await provider_router.create_routed(
+            "llm", candidates, strategies, lambda providers: agents_llm.FallbackAdapter(llm=providers)
+        )
+        if llm:
+            return llm
+
     strategy = strategies.get(selected_llm)
     if not strategy:
         logger.error(f"No strategy found for LLM: {selected_llm}")
         raise ValueError(f"No strategy found for LLM: {selected_llm}")
 
     logger.info(f"Attempting to instantiate LLM with strategy: {selected_llm}")
-    llm = await strategy.create()
+    llm = await provider_router.create("llm", selected_llm, strategy)
     if llm:
         logger.info(f"Successfully instantiated LLM: {selected_llm}")
-        return llm
+        return await _with_hedge(llm, selected_llm, strategies)
 
     if selected_llm != "azure-openai":
         logger.warning(f"Selected LLM {selected_llm} failed, falling back to azure-openai")
         fallback_strategy = strategies["openai"]
-        llm = await fallback_strategy.create()
+        llm = await provider_router.create("llm", "openai", fallback_strategy)
         if llm:
             logger.info("Successfully instantiated fallback azure-openai LLM")
             return llm
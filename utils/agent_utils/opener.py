@@ -0,0 +1,53 @@
+import asyncio
+from typing import AsyncIterator, List, Optional
+from livekit import rtc
+from livekit.agents import AgentSession, SpeechHandle, tts
+from utils.monitoring_utils.logging import get_logger
+
+logger = get_logger("CALL-OPENER")
+
+# How long play() waits for a render still in flight before speaking through live TTS
+RENDER_WAIT_SECONDS = 2.0
+
+
+class PreparedOpener:
+    """
+    The first line of a call, synthesized while the phone is still ringing. Create it as soon
+    as the prospect is loaded and call `play()` once the callee has joined: the greeting starts
+    from ready audio instead of waiting on an LLM generation plus TTS, and it is added to the
+    chat context so the LLM carries on from it.
+    """
+
+    def __init__(self, text: str, tts_provider: tts.TTS):
+        self.text = text
+        self._task = asyncio.create_task(self._render(tts_provider))
+
+    async def _render(self, tts_provider: tts.TTS) -> List[rtc.AudioFrame]:
+        frames = []
+        async with tts_provider.synthesize(self.text) as stream:
+            async for audio in stream:
+                frames.append(audio.frame)
+        logger.debug(f"Opener rendered: {len(frames)} frames")
+        return frames
+
+    async def frames(self, timeout: float = RENDER_WAIT_SECONDS) -> Optional[List[rtc.AudioFrame]]:
+        try:
+            return await asyncio.wait_for(asyncio.shield(self._task), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Opener not rendered after {timeout}s, using live TTS")
+        except Exception as e:
+            logger.error(f"Error rendering opener: {e}")
+        return None
+
+    async def play(self, session: AgentSession) -> SpeechHandle:
+        frames = await self.frames()
+        audio = _replay(frames) if frames else None
+        return session.say(self.text, audio=audio, add_to_chat_ctx=True)
+
+    def cancel(self) -> None:
+        self._task.cancel()
+
+
+async def _replay(frames: List[rtc.AudioFrame]) -> AsyncIterator[rtc.AudioFrame]:
+    for frame in frames:
+        yield frame
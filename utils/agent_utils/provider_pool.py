@@ -0,0 +1,94 @@
+import asyncio
+import threading
+from typing import Callable, Dict, Optional, Tuple
+import httpx
+import openai as openai_client
+from utils.monitoring_utils.logging import get_logger
+
+logger = get_logger("PROVIDER-POOL")
+
+# Shared HTTP settings: bounded pool, connections kept alive between turns and jobs
+HTTP_TIMEOUT = httpx.Timeout(connect=15.0, read=45.0, write=10.0, pool=20.0)
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=120.0)
+
+
+class ProviderPool:
+    """
+    Per-process cache of provider instances (LLM/STT/TTS) and the HTTP clients behind them.
+    Filled once by `prewarm_providers()` from the worker's prewarm hook; `get_llm`/`get_stt`/`get_tts`
+    hand the cached instances to every AgentSession in the process.
+    """
+
+    def __init__(self):
+        self._providers: Dict[Tuple[str, str], object] = {}
+        self._openai_clients: Dict[Tuple[str, ...], openai_client.AsyncClient] = {}
+        self._lock = threading.Lock()
+
+    def get(self, kind: str, name: str) -> Optional[object]:
+        return self._providers.get((kind, name))
+
+    def put(self, kind: str, name: str, provider: object) -> object:
+        with self._lock:
+            return self._providers.setdefault((kind, name), provider)
+
+    def openai_client(self, api_key: str) -> openai_client.AsyncClient:
+        """One keep-alive OpenAI client per API key, shared by all OpenAI-based strategies."""
+        return self._client(("openai", api_key), lambda http_client: openai_client.AsyncClient(
+            api_key=api_key,
+            max_retries=3,
+            timeout=HTTP_TIMEOUT,
+            http_client=http_client,
+        ))
+
+    def azure_openai_client(
+        self, api_key: str, azure_endpoint: str, azure_deployment: str, api_version: str
+    ) -> "openai_client.AsyncAzureOpenAI":
+        """One keep-alive Azure OpenAI client per key and deployment, on the same HTTP settings."""
+        key = ("azure", api_key, azure_endpoint, azure_deployment, api_version)
+        return self._client(key, lambda http_client: openai_client.AsyncAzureOpenAI(
+            api_key=api_key,
+            azure_endpoint=azure_endpoint,
+            azure_deployment=azure_deployment,
+            api_version=api_version,
+            max_retries=3,
+            timeout=HTTP_TIMEOUT,
+            http_client=http_client,
+        ))
+
+    def _client(self, key: Tuple[str, ...], build: Callable[[httpx.AsyncClient], "openai_client.AsyncClient"]):
+        with self._lock:
+            client = self._openai_clients.get(key)
+            if client is None:
+                client = build(httpx.AsyncClient(
+                    limits=HTTP_LIMITS,
+                    timeout=HTTP_TIMEOUT,
+                    follow_redirects=True,
+                ))
+                self._openai_clients[key] = client
+            return client
+
+
+provider_pool = ProviderPool()
+
+
+async def fill_provider_pool() -> None:
+    # Imported here: the strategy modules import this one
+    from utils.agent_utils.llm_strategy import get_llm
+    from utils.agent_utils.stt_strategy import get_stt
+    from utils.agent_utils.tts_strategy import get_tts
+
+    for kind, factory in (("llm", get_llm), ("stt", get_stt), ("tts", get_tts)):
+        try:
+            await factory()
+        except Exception as e:
+            logger.error(f"Could not prewarm {kind} provider: {e}")
+
+
+def prewarm_providers() -> None:
+    """
+    Create the selected LLM/STT/TTS providers once per process. Called from the synchronous
+    prewarm hook, so it runs on a throwaway loop; provider constructors do no I/O and the
+    HTTP clients only open connections on the job's loop.
+    """
+    asyncio.run(fill_provider_pool())
+    logger.info("Provider pool prewarmed")
@@ -0,0 +1,320 @@
+import asyncio
+import heapq
+import json
+import multiprocessing.util
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from utils.config_utils.env_loader import get_env_var
+from utils.agent_utils.provider_pool import provider_pool
+from utils.monitoring_utils.logging import get_logger
+from utils.monitoring_utils.worker_metrics import PROVIDER_ERRORS
+
+logger = get_logger("PROVIDER-ROUTER")
+
+# Rolling window of samples kept per provider
+WINDOW = 100
+# A provider is unhealthy above this error rate, or after this many errors in a row
+MAX_ERROR_RATE = 0.3
+MAX_CONSECUTIVE_ERRORS = 3
+# Unhealthy providers are retried after this long
+COOLDOWN_SECONDS = 60.0
+# Latency assumed for a provider with no samples yet (TTFT / TTFB / STT duration, seconds)
+UNMEASURED_LATENCY = {"llm": 1.0, "stt": 1.0, "tts": 0.5}
+# How often a job process reports its samples, and re-reads the other processes' reports
+REPORT_SECONDS = 2.0
+# Reports not updated for this long are deleted; their samples are too old to route on
+REPORT_TTL_SECONDS = 1800.0
+
+# One sample: (wall-clock time, LATENCY | CENSORED | ERROR, seconds)
+Sample = Tuple[float, str, float]
+LATENCY, CENSORED, ERROR = "latency", "censored", "error"
+
+
+class ProviderStats:
+    """Rolling latency percentiles and error rate for one provider."""
+
+    def __init__(self, window: int = WINDOW):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.consecutive_errors = 0
+        self.unhealthy_since: Optional[float] = None
+        # Every sample as recorded, for the report other processes rank from
+        self.samples: "deque[Sample]" = deque(maxlen=window)
+
+    @classmethod
+    def replay(cls, samples: Iterable[Sample]) -> "ProviderStats":
+        """Stats built from samples in time order, e.g. merged from several processes."""
+        stats = cls()
+        record = {LATENCY: stats.record_latency, CENSORED: stats.record_censored}
+        for at, kind, seconds in samples:
+            if kind == ERROR:
+                stats.record_error(at)
+            else:
+                record[kind](seconds, at)
+        return stats
+
+    def record_latency(self, seconds: float, at: Optional[float] = None) -> None:
+        self.samples.append((at or time.time(), LATENCY, seconds))
+        self.latencies.append(seconds)
+        self.outcomes.append(True)
+        self.consecutive_errors = 0
+        self.unhealthy_since = None
+
+    def record_censored(self, seconds: float, at: Optional[float] = None) -> None:
+        """A request cancelled before it answered: took at least `seconds`. Latency only, not health."""
+        self.samples.append((at or time.time(), CENSORED, seconds))
+        self.latencies.append(seconds)
+
+    def record_error(self, at: Optional[float] = None) -> None:
+        at = at or time.time()
+        self.samples.append((at, ERROR, 0.0))
+        self.outcomes.append(False)
+        self.consecutive_errors += 1
+        if self.unhealthy_since is None and not self._healthy_now():
+            self.unhealthy_since = at
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    @property
+    def p50(self) -> Optional[float]:
+        return self.percentile(0.5)
+
+    @property
+    def p95(self) -> Optional[float]:
+        return self.percentile(0.95)
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def _healthy_now(self) -> bool:
+        return self.error_rate <= MAX_ERROR_RATE and self.consecutive_errors < MAX_CONSECUTIVE_ERRORS
+
+    @property
+    def healthy(self) -> bool:
+        if self._healthy_now():
+            return True
+        # Let an unhealthy provider back in after the cooldown so it can recover
+        return self.unhealthy_since is not None and time.time() - self.unhealthy_since >= COOLDOWN_SECONDS
+
+
+class ProviderRouter:
+    """
+    Ranks the configured strategies of each kind (llm/stt/tts) by health and rolling p95
+    latency. Samples come from each provider instance's own `metrics_collected` and `error`
+    events, i.e. the same metrics the session re-emits as MetricsCollectedEvent.
+
+    A job process runs a single job, so its own samples start empty every call. Each process
+    therefore reports its samples to the load monitor's report directory every REPORT_SECONDS
+    (and when it exits), and ranks on its own samples merged with the latest ones the other
+    processes reported.
+    """
+
+    def __init__(self):
+        self._stats: Dict[Tuple[str, str], ProviderStats] = {}
+        self._watched: Dict[int, Tuple[str, str]] = {}
+        # Other processes' samples per provider, oldest first, as of the last refresh()
+        self._reported: Dict[Tuple[str, str], List[Sample]] = {}
+        self._refreshed_at = 0.0
+        self._reporter: Optional[threading.Thread] = None
+
+    def stats(self, kind: str, name: str) -> ProviderStats:
+        """This process's own samples for one provider; record into these."""
+        return self._stats.setdefault((kind, name), ProviderStats())
+
+    def view(self, kind: str, name: str) -> ProviderStats:
+        """Stats over this process's samples and the other processes' reported ones; rank on these."""
+        own = self.stats(kind, name)
+        reported = self._reported.get((kind, name))
+        if not reported:
+            return own
+        return ProviderStats.replay(heapq.merge(reported, own.samples))
+
+    # -------------------------------Sharing samples between job processes-------------------------------
+    @staticmethod
+    def _report_dir() -> str:
+        # Imported here: load_monitor pulls in psutil and the worker metrics
+        from utils.monitoring_utils.load_monitor import REPORT_DIR
+        return REPORT_DIR
+
+    def report(self) -> None:
+        """Write this process's samples for the other job processes to rank from."""
+        snapshot = {f"{kind}|{name}": list(stats.samples) for (kind, name), stats in list(self._stats.items())}
+        if not any(snapshot.values()):
+            return
+        directory = self._report_dir()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{os.getpid()}.providers")
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(snapshot, f)
+        os.replace(f"{path}.tmp", path)
+
+    def _report(self) -> None:
+        try:
+            self.report()
+        except OSError as e:
+            logger.warning(f"Could not write provider samples: {e}")
+
+    def _report_forever(self) -> None:
+        while True:
+            time.sleep(REPORT_SECONDS)
+            self._report()
+
+    def _start_reporter(self) -> None:
+        if self._reporter is None:
+            self._reporter = threading.Thread(target=self._report_forever, name="provider-report", daemon=True)
+            self._reporter.start()
+            # atexit handlers don't run in forked or forkserver job processes; these finalizers do
+            multiprocessing.util.Finalize(None, self._report, exitpriority=0)
+
+    def refresh(self) -> None:
+        """Re-read the other processes' reports, keeping the latest WINDOW samples per provider."""
+        directory = self._report_dir()
+        own = f"{os.getpid()}.providers"
+        merged: Dict[Tuple[str, str], List[Sample]] = {}
+        now = time.time()
+        try:
+            names = [name for name in os.listdir(directory) if name.endswith(".providers") and name != own]
+        except FileNotFoundError:
+            names = []
+        for name in names:
+            path = os.path.join(directory, name)
+            try:
+                if now - os.path.getmtime(path) > REPORT_TTL_SECONDS:
+                    os.remove(path)
+                    continue
+                with open(path) as f:
+                    report = json.load(f)
+            except (OSError, ValueError):
+                continue  # Replaced or pruned by another process
+            for key, samples in report.items():
+                kind, _, provider = key.partition("|")
+                merged.setdefault((kind, provider), []).extend(tuple(sample) for sample in samples)
+        self._reported = {key: sorted(samples)[-WINDOW:] for key, samples in merged.items()}
+        self._refreshed_at = time.monotonic()
+
+    async def refresh_if_stale(self) -> None:
+        if time.monotonic() - self._refreshed_at < REPORT_SECONDS:
+            return
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self.refresh)
+        except OSError as e:
+            logger.warning(f"Could not read provider samples: {e}")
+
+    def candidates(self, kind: str, selected: str) -> List[str]:
+        """Selected strategy first, then any extra ones from e.g. LLM_CANDIDATES=azure-openai,openai."""
+        extra = get_env_var(f"{kind.upper()}_CANDIDATES", required=False, default="") or ""
+        names = [selected] + [n.strip() for n in extra.split(",") if n.strip()]
+        return list(dict.fromkeys(names))
+
+    def rank(self, kind: str, names: List[str]) -> List[str]:
+        def key(item):
+            index, name = item
+            stats = self.view(kind, name)
+            p95 = stats.p95
+            return (not stats.healthy, p95 if p95 is not None else UNMEASURED_LATENCY[kind], index)
+
+        return [name for _, name in sorted(enumerate(names), key=key)]
+
+    def watch(self, kind: str, name: str, provider: object) -> None:
+        """Subscribe once to a provider instance's metrics and error events."""
+        if id(provider) in self._watched or not hasattr(provider, "on"):
+            return
+        self._watched[id(provider)] = (kind, name)
+        self._start_reporter()
+        stats = self.stats(kind, name)
+        errors = PROVIDER_ERRORS.labels(kind=kind, provider=name)
+
+        def on_metrics(metrics) -> None:
+            latency = _latency_of(kind, metrics)
+            if latency is not None:
+                stats.record_latency(latency)
+
+        def on_error(_) -> None:
+            stats.record_error()
+            errors.inc()
+            logger.warning(f"{kind} provider {name} error (error rate {stats.error_rate:.0%})")
+
+        provider.on("metrics_collected", on_metrics)
+        provider.on("error", on_error)
+
+    async def create(self, kind: str, name: str, strategy) -> Optional[object]:
+        """Pooled instance for `name`, created through its strategy on first use."""
+        provider = provider_pool.get(kind, name)
+        if provider is None:
+            provider = await strategy.create()
+            if provider is None:
+                return None
+            provider = provider_pool.put(kind, name, provider)
+        self.watch(kind, name, provider)
+        return provider
+
+    async def create_routed(
+        self, kind: str, names: List[str], strategies: Dict[str, object], adapter: Callable[[List[object]], object]
+    ) -> Optional[object]:
+        """
+        Instances for every configured strategy, fastest healthy first, wrapped in `adapter`
+        (a livekit FallbackAdapter) so a live session fails over to the next one on errors.
+        """
+        await self.refresh_if_stale()
+        ranked = self.rank(kind, names)
+        providers = []
+        for name in ranked:
+            if name not in strategies:
+                logger.error(f"No strategy found for {kind}: {name}")
+                continue
+            try:
+                provider = await self.create(kind, name, strategies[name])
+            except Exception as e:
+                logger.error(f"Could not instantiate {kind} {name}: {e}")
+                continue
+            if provider is not None:
+                providers.append(provider)
+
+        if not providers:
+            return None
+        logger.info(f"Routing {kind} in order: {ranked}")
+        if len(providers) == 1:
+            return providers[0]
+        routed = adapter(providers)
+        if kind != "tts":
+            _label_by_serving(kind, routed, providers)
+        return routed
+
+
+def _label_by_serving(kind: str, routed, providers: List[object]) -> None:
+    """
+    A FallbackAdapter reports LLM and STT metrics under its own label, which prices as no
+    provider. Keep its label on the provider it is serving from: the first one still marked
+    available (all of them are retried in order once every one has failed). The TTS adapter
+    already re-emits its providers' own metrics.
+    """
+    def relabel(_=None) -> None:
+        # FallbackAdapter keeps one availability status per provider, in order
+        available = [p for p, status in zip(providers, routed._status) if status.available]
+        routed._label = (available or providers)[0].label
+
+    relabel()
+    routed.on(f"{kind}_availability_changed", relabel)
+
+
+def _latency_of(kind: str, metrics) -> Optional[float]:
+    if kind == "llm":
+        value = getattr(metrics, "ttft", None)
+    elif kind == "tts":
+        value = getattr(metrics, "ttfb", None)
+    else:
+        value = getattr(metrics, "duration", None)
+    return value if value is not None and value > 0 else None
+
+
+provider_router = ProviderRouter()
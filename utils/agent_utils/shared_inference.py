@@ -0,0 +1,216 @@
+import importlib.resources
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import onnxruntime
+from livekit.plugins import silero
+from livekit.plugins.silero import onnx_model
+from livekit.plugins.silero.vad import VADStream
+from livekit.plugins.turn_detector.multilingual import MultilingualModel
+from utils.config_utils.env_loader import get_env_var
+from utils.monitoring_utils.logging import get_logger
+
+logger = get_logger("SHARED-INFERENCE")
+
+# Threads for one batched ONNX run; the batch, not the thread count, is what scales with sessions
+INFERENCE_THREADS = int(get_env_var("INFERENCE_THREADS", required=False, default="2"))
+# How long the inference thread waits for windows from other streams before running a batch
+BATCH_WAIT_SECONDS = 0.002
+MAX_BATCH = 64
+
+# Silero VAD window and context sizes per supported sample rate
+_VAD_WINDOW = {8000: (256, 32), 16000: (512, 64)}
+
+
+def cpu_session_options() -> onnxruntime.SessionOptions:
+    opts = onnxruntime.SessionOptions()
+    opts.intra_op_num_threads = max(1, min(INFERENCE_THREADS, os.cpu_count() or 1))
+    opts.inter_op_num_threads = 1
+    opts.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+    opts.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    # Idle between 32ms windows: don't burn a core spinning
+    opts.add_session_config_entry("session.intra_op.allow_spinning", "0")
+    opts.add_session_config_entry("session.inter_op.allow_spinning", "0")
+    return opts
+
+
+def new_vad_session() -> onnxruntime.InferenceSession:
+    resource = importlib.resources.files("livekit.plugins.silero.resources") / "silero_vad.onnx"
+    with importlib.resources.as_file(resource) as path:
+        return onnxruntime.InferenceSession(
+            str(path), providers=["CPUExecutionProvider"], sess_options=cpu_session_options()
+        )
+
+
+class VADHandle:
+    """
+    Per-stream model for silero's VADStream, in place of its own OnnxModel. Holds the stream's
+    recurrent state; the inference itself runs batched on the shared VADInferenceThread.
+    """
+
+    def __init__(self, runner: "VADInferenceThread"):
+        self._runner = runner
+        self.window_size_samples, self.context_size = _VAD_WINDOW[runner.sample_rate]
+        self.context = np.zeros(self.context_size, dtype=np.float32)
+        self.state = np.zeros((2, 1, 128), dtype=np.float32)
+
+    @property
+    def sample_rate(self) -> int:
+        return self._runner.sample_rate
+
+    def __call__(self, x: np.ndarray) -> float:
+        # Called on the stream's executor thread, which blocks until the batch has run
+        return self._runner.submit(self, x)
+
+
+class VADInferenceThread:
+    """
+    One ONNX session and one thread running the VAD windows of every stream in the process.
+    Batching only helps when sessions share a process, i.e. with the thread job executor. With
+    the process executor (livekit's default on Linux) each job process has a single stream, and
+    its windows run inline on the stream's own thread instead of hopping to this one.
+    """
+
+    def __init__(self, sample_rate: int):
+        if sample_rate not in _VAD_WINDOW:
+            raise ValueError("Silero VAD only supports 8KHz and 16KHz sample rates")
+        self.sample_rate = sample_rate
+        self._session = new_vad_session()
+        self._sample_rate_nd = np.array(sample_rate, dtype=np.int64)
+        self._queue: "queue.Queue[Tuple[VADHandle, np.ndarray, Future]]" = queue.Queue()
+        self._streams = 0
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name=f"vad-inference-{sample_rate}", daemon=True)
+        self._thread.start()
+
+    def warm_up(self) -> None:
+        """One throwaway run so the first real window doesn't pay for ONNX's lazy allocations."""
+        window, context = _VAD_WINDOW[self.sample_rate]
+        self._session.run(None, {
+            "input": np.zeros((1, context + window), dtype=np.float32),
+            "state": np.zeros((2, 1, 128), dtype=np.float32),
+            "sr": self._sample_rate_nd,
+        })
+
+    def handle(self) -> VADHandle:
+        with self._lock:
+            self._streams += 1
+        return VADHandle(self)
+
+    def release(self) -> None:
+        with self._lock:
+            self._streams = max(0, self._streams - 1)
+
+    def submit(self, handle: VADHandle, window: np.ndarray) -> float:
+        if self._streams <= 1:
+            # Nothing to batch with; InferenceSession.run is thread-safe if a second stream starts
+            return self._infer([(handle, window, None)])[0]
+        future: Future = Future()
+        self._queue.put((handle, window.copy(), future))
+        return future.result()
+
+    def _collect(self) -> List[Tuple[VADHandle, np.ndarray, Future]]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + BATCH_WAIT_SECONDS
+        # Streams tick every 32ms at roughly the same time; wait briefly for the others
+        while len(batch) < min(self._streams, MAX_BATCH):
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        while len(batch) < MAX_BATCH:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            try:
+                probabilities = self._infer(batch)
+            except Exception as e:
+                logger.error(f"VAD batch of {len(batch)} failed: {e}")
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, _, future), p in zip(batch, probabilities):
+                future.set_result(p)
+
+    def _infer(self, batch) -> List[float]:
+        inputs = np.stack([np.concatenate((handle.context, window)) for handle, window, _ in batch])
+        state = np.concatenate([handle.state for handle, _, _ in batch], axis=1)
+        out, new_state = self._session.run(
+            None, {"input": inputs, "state": state, "sr": self._sample_rate_nd}
+        )
+        for i, (handle, _, _) in enumerate(batch):
+            handle.context = inputs[i, -handle.context_size:]
+            handle.state = new_state[:, i:i + 1, :]
+        return [float(p) for p in out.reshape(len(batch), -1)[:, 0]]
+
+
+_runners: Dict[int, VADInferenceThread] = {}
+_runners_lock = threading.Lock()
+
+
+def get_vad_runner(sample_rate: int) -> VADInferenceThread:
+    with _runners_lock:
+        runner = _runners.get(sample_rate)
+        if runner is None:
+            runner = _runners[sample_rate] = VADInferenceThread(sample_rate)
+        return runner
+
+
+class SharedVAD(silero.VAD):
+    """Silero VAD whose streams all run through the process-wide batched inference thread."""
+
+    @classmethod
+    def load(cls, **kwargs) -> "SharedVAD":
+        """
+        silero.VAD.load without the per-process ONNX session it builds: streams never use it.
+        The session factory is swapped out only for this call, which runs once, in prewarm.
+        """
+        new_inference_session = onnx_model.new_inference_session
+        onnx_model.new_inference_session = lambda force_cpu=True: None
+        try:
+            return super().load(**kwargs)
+        finally:
+            onnx_model.new_inference_session = new_inference_session
+
+    def stream(self) -> VADStream:
+        runner = get_vad_runner(self._opts.sample_rate)
+        stream = VADStream(self, self._opts, runner.handle())
+        stream._task.add_done_callback(lambda _: runner.release())
+        self._streams.add(stream)
+        return stream
+
+
+def load_shared_vad(**kwargs) -> SharedVAD:
+    """Same arguments as silero.VAD.load; call from prewarm and keep it in proc.userdata."""
+    started = time.perf_counter()
+    vad = SharedVAD.load(**kwargs)
+    get_vad_runner(vad._opts.sample_rate).warm_up()
+    logger.info(f"VAD model loaded in {time.perf_counter() - started:.2f}s")
+    return vad
+
+
+_turn_detector: Optional[MultilingualModel] = None
+
+
+def get_turn_detector() -> MultilingualModel:
+    """
+    Process-wide end-of-turn model handle. Inference already runs in the worker's shared
+    inference process; sharing the handle skips reloading the language thresholds per session.
+    """
+    global _turn_detector
+    if _turn_detector is None:
+        _turn_detector = MultilingualModel()
+    return _turn_detector
@@ -4,9 +4,11 @@ from typing import Optional
 from utils.config_utils.env_loader import get_env_var
 from utils.config_utils.config_loader import get_config
 from utils.monitoring_utils.logging import get_logger
-from livekit.plugins import openai, google, deepgram
+from utils.agent_utils.provider_router import provider_router
+from livekit.agents import stt as agents_stt
 from abc import ABC, abstractmethod
 
+# Plugins are imported inside create(), so a worker only loads the ones its strategies use
 logger = get_logger("STT-FACTORY")
 
 # Environment to STT mapping
@@ -36,6 +38,7 @@ class Deepgram3Strategy(STTStrategy):
             "interim_results": False,
         }
         logger.debug("Instantiating deepgram-3 STT")
+        from livekit.plugins import deepgram
         return deepgram.STT(api_key=api_key, **params)
 
 class GoogleStrategy(STTStrategy):
@@ -54,6 +57,7 @@ class GoogleStrategy(STTStrategy):
             "min_confidence_threshold": 0.7,
         }
         logger.debug("Instantiating google STT")
+        from livekit.plugins import google
         return google.STT(credentials_info=creds, **params)
 
 class OpenAIStrategy(STTStrategy):
@@ -68,6 +72,7 @@ class OpenAIStrategy(STTStrategy):
             "detect_language": False
         }
         logger.debug("Instantiating openai STT")
+        from livekit.plugins import openai
         return openai.STT(api_key=api_key, model="gpt-4o-transcribe", **params)
 
 class Deepgram2Strategy(STTStrategy):
@@ -83,6 +88,7 @@ class Deepgram2Strategy(STTStrategy):
             "interim_results": False,
         }
         logger.debug("Instantiating deepgram-2 STT")
+        from livekit.plugins import deepgram
         return deepgram.STT(api_key=api_key, **params)
 
 class AzureStrategy(STTStrategy):
@@ -93,6 +99,7 @@ class AzureStrategy(STTStrategy):
             logger.error("Missing speech_key and speech_region in Azure")
             return None
         logger.debug("Instantiating azure STT")
+        from livekit.plugins import azure
         return azure.STT(speech_key=speech_key,speech_region=speech_region)
     
 async def get_stt() -> Optional[object]:
@@ -108,13 +115,22 @@ async def get_stt() -> Optional[object]:
         "azure":AzureStrategy()
     }
 
+    # With extra STT_CANDIDATES configured, route to the fastest healthy one with live failover
+    candidates = provider_router.candidates("stt", selected_stt)
+    if len(candidates) > 1:
+        stt = await provider_router.create_routed(
+            "stt", candidates, strategies, lambda providers: agents_stt.FallbackAdapter(stt=providers)
+        )
+        if stt:
+            return stt
+
     strategy = strategies.get(selected_stt)
     if not strategy:
         logger.error(f"No strategy found for STT: {selected_stt}")
         raise ValueError(f"No strategy found for STT: {selected_stt}")
 
     logger.info(f"Attempting to instantiate STT with strategy: {selected_stt}")
-    stt = await strategy.create()
+    stt = await provider_router.create("stt", selected_stt, strategy)
     if stt:
         logger.info(f"Successfully instantiated STT: {selected_stt}")
         return stt
@@ -122,7 +138,7 @@ async def get_stt() -> Optional[object]:
     if selected_stt != "deepgram-3":
         logger.warning(f"Selected STT {selected_stt} failed, falling back to deepgram-3")
         fallback_strategy = strategies["deepgram-3"]
-        stt = await fallback_strategy.create()
+        stt = await provider_router.create("stt", "deepgram-3", fallback_strategy)
         if stt:
             logger.info("Successfully instantiated fallback deepgram-3 STT")
             return stt
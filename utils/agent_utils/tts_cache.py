@@ -0,0 +1,216 @@
+import asyncio
+import hashlib
+import mmap
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from livekit.agents import tts, utils
+from livekit.agents.types import DEFAULT_API_CONNECT_OPTIONS, APIConnectOptions
+from utils.config_utils.env_loader import get_env_var
+from utils.monitoring_utils.logging import get_logger
+
+logger = get_logger("TTS-CACHE")
+
+CACHE_DIR = get_env_var("TTS_CACHE_DIR", required=False, default="tts_cache")
+CACHE_MAX_BYTES = int(get_env_var("TTS_CACHE_MAX_MB", required=False, default="256")) * 1024 * 1024
+# Only short, sentence-sized texts are worth caching; long one-off replies are not
+MAX_CACHED_CHARS = 300
+# Cached audio is pushed in 100ms chunks of 16-bit PCM
+CHUNK_MS = 100
+# How often a writer rescans the shared directory for other processes' entries
+RESCAN_SECONDS = 30.0
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+
+def cache_key(provider: str, voice: str, text: str, sample_rate: int, num_channels: int = 1) -> str:
+    raw = f"{provider}|{voice}|{sample_rate}|{num_channels}|{normalize_text(text)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class AudioCache:
+    """
+    Content-addressed PCM cache on local disk, one `<key>.pcm` file per entry.
+    Reads are memory-mapped; the total size is kept under `max_bytes` by LRU eviction.
+    The directory is shared by every process on the host: `get` falls back to the file when
+    another process cached the entry, and `put` rescans the directory at most every
+    RESCAN_SECONDS to count (and evict) other processes' entries too. Both do file I/O: call
+    them off the event loop.
+    """
+
+    def __init__(self, directory: str = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._size = 0
+        self._scanned_at = 0.0
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pcm")
+
+    def _load_index(self) -> None:
+        # Oldest access first, so the LRU order survives restarts
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".pcm"):
+                try:
+                    st = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    continue  # Evicted by another process
+                files.append((st.st_mtime, name[:-4], st.st_size))
+        entries = OrderedDict((key, size) for _, key, size in sorted(files))
+        with self._lock:
+            self._entries = entries
+            self._size = sum(entries.values())
+            self._scanned_at = time.monotonic()
+
+    def get(self, key: str) -> Optional[mmap.mmap]:
+        """The entry's audio, or None. Does file I/O: call it off the event loop."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+        # Not indexed may still be on disk: another process cached it after this one scanned
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            os.utime(path)
+        except (OSError, ValueError):
+            with self._lock:
+                self._size -= self._entries.pop(key, 0)
+            return None
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = len(mapped)
+                self._size += len(mapped)
+        return mapped
+
+    def put(self, key: str, pcm: bytes) -> None:
+        if not pcm or len(pcm) > self.max_bytes:
+            return
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(pcm)
+        os.replace(tmp, path)
+        with self._lock:
+            self._size += len(pcm) - self._entries.pop(key, 0)
+            self._entries[key] = len(pcm)
+        if time.monotonic() - self._scanned_at >= RESCAN_SECONDS:
+            self._load_index()
+        with self._lock:
+            self._evict()
+
+    def _evict(self) -> None:
+        while self._size > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._size -= size
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_audio_cache(directory: str = CACHE_DIR) -> AudioCache:
+    with _caches_lock:
+        cache = _caches.get(directory)
+        if cache is None:
+            cache = _caches[directory] = AudioCache(directory)
+        return cache
+
+
+def _voice_of(inner: tts.TTS) -> str:
+    return str(getattr(getattr(inner, "_opts", None), "voice", "") or "")
+
+
+class CachedTTS(tts.TTS):
+    """
+    TTS wrapper that serves repeated phrases from the audio cache and only calls the
+    provider on a miss. It is non-streaming on purpose: AgentSession then splits replies
+    into sentences, and fixed lines (greeting, goodbye, ...) hit the cache one sentence at a time.
+    """
+
+    def __init__(self, inner: tts.TTS, *, provider: str, voice: Optional[str] = None, cache: Optional[AudioCache] = None):
+        super().__init__(
+            capabilities=tts.TTSCapabilities(streaming=False),
+            sample_rate=inner.sample_rate,
+            num_channels=inner.num_channels,
+        )
+        # Report metrics under the provider's label so misses are priced as that provider's;
+        # hits report no characters, see CachedChunkedStream
+        self._label = inner.label
+        self.inner = inner
+        self.provider = provider
+        self.voice = voice if voice is not None else _voice_of(inner)
+        self.cache = cache or get_audio_cache()
+
+    def key_for(self, text: str) -> str:
+        return cache_key(self.provider, self.voice, text, self.sample_rate, self.num_channels)
+
+    def synthesize(self, text: str, *, conn_options: APIConnectOptions = DEFAULT_API_CONNECT_OPTIONS) -> "CachedChunkedStream":
+        return CachedChunkedStream(tts=self, input_text=text, conn_options=conn_options)
+
+    async def aclose(self) -> None:
+        # The inner TTS is pooled and owned by the provider pool
+        pass
+
+
+class CachedChunkedStream(tts.ChunkedStream):
+    def __init__(self, *, tts: CachedTTS, input_text: str, conn_options: APIConnectOptions):
+        super().__init__(tts=tts, input_text=input_text, conn_options=conn_options)
+        self._cached_tts = tts
+
+    async def _run(self, output_emitter: tts.AudioEmitter) -> None:
+        cached_tts = self._cached_tts
+        output_emitter.initialize(
+            request_id=utils.shortuuid(),
+            sample_rate=cached_tts.sample_rate,
+            num_channels=cached_tts.num_channels,
+            mime_type="audio/pcm",
+        )
+
+        cacheable = len(self.input_text) <= MAX_CACHED_CHARS
+        key = cached_tts.key_for(self.input_text) if cacheable else None
+        mapped = None
+        if key:
+            mapped = await asyncio.get_running_loop().run_in_executor(None, cached_tts.cache.get, key)
+        if mapped is not None:
+            chunk = cached_tts.sample_rate * cached_tts.num_channels * 2 * CHUNK_MS // 1000
+            try:
+                for start in range(0, len(mapped), chunk):
+                    output_emitter.push(mapped[start:start + chunk])
+            finally:
+                mapped.close()
+            output_emitter.flush()
+            # Nothing was synthesized: the metrics emitted once the stream ends count the
+            # input's characters, which CallUsage would bill to the provider
+            self._input_text = ""
+            return
+
+        pcm = bytearray()
+        async with cached_tts.inner.synthesize(self.input_text, conn_options=self._conn_options) as stream:
+            async for audio in stream:
+                data = audio.frame.data.tobytes()
+                output_emitter.push(data)
+                if key:
+                    pcm += data
+        output_emitter.flush()
+
+        if key and pcm:
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, cached_tts.cache.put, key, bytes(pcm))
+            except OSError as e:
+                logger.warning(f"Could not cache audio: {e}")
+                return
+            logger.debug(f"Cached {len(pcm)} bytes of audio for: {self.input_text[:40]!r}")
@@ -4,9 +4,12 @@ from typing import Optional
 from utils.config_utils.env_loader import get_env_var
 from utils.config_utils.config_loader import get_config
 from utils.monitoring_utils.logging import get_logger
-from livekit.plugins import aws, google, openai, deepgram , elevenlabs
+from utils.agent_utils.provider_router import provider_router
+from utils.agent_utils.tts_cache import CachedTTS
+from livekit.agents import tts as agents_tts
 from abc import ABC, abstractmethod
 
+# Plugins are imported inside create(), so a worker only loads the ones its strategies use
 logger = get_logger("TTS-FACTORY")
 
 # Environment to TTS mapping
@@ -37,6 +40,7 @@ class AWSStrategy(TTSStrategy):
             "language": "en-IN",
         }
         logger.debug("Instantiating aws TTS")
+        from livekit.plugins import aws
         return aws.TTS(api_key=api_key, api_secret=api_secret, region=region,voice=voice,**params)
 
 class GoogleStrategy(TTSStrategy):
@@ -49,6 +53,7 @@ class GoogleStrategy(TTSStrategy):
             "language": "en-US"
         }
         logger.debug("Instantiating google TTS")
+        from livekit.plugins import google
         return google.TTS(credentials_info=creds, **params)
 
 class DeepgramStrategy(TTSStrategy):
@@ -61,6 +66,7 @@ class DeepgramStrategy(TTSStrategy):
             "model": "aura-asteria-en",
         }
         logger.debug("Instantiating deepgram TTS")
+        from livekit.plugins import deepgram
         return deepgram.TTS(api_key=api_key, **params)
 
 class CartesiaStrategy(TTSStrategy):
@@ -71,6 +77,7 @@ class CartesiaStrategy(TTSStrategy):
             logger.error("Missing Cartesia API key")
             return None
         logger.debug("Instantiating cartesia TTS")
+        from livekit.plugins import cartesia
         return cartesia.TTS(api_key=api_key,voice=voice)   
     
 class AzureStrategy(TTSStrategy):
@@ -82,9 +89,20 @@ class AzureStrategy(TTSStrategy):
             return None
         
         logger.info("Instantiating azure TTS")
+        from livekit.plugins import azure
         return azure.TTS(speech_key=speech_key,speech_region=speech_region,voice="en-US-BrandonMultilingualNeural")
         
     
+def _with_cache(tts: object, selected_tts: str) -> object:
+    """Serve repeated phrases from the on-disk audio cache unless TTS_CACHE=off."""
+    if (get_env_var("TTS_CACHE", required=False, default="on") or "").lower() in ("off", "0", "false"):
+        return tts
+    try:
+        return CachedTTS(tts, provider=selected_tts)
+    except OSError as e:
+        logger.error(f"TTS cache unavailable, using {selected_tts} directly: {e}")
+        return tts
+
 async def get_tts() -> Optional[object]:
     env = get_env_var("ENV", default="dev").lower()
     selected_tts = ENV_TTS_MAP.get(env, "aws")
@@ -98,24 +116,33 @@ async def get_tts() -> Optional[object]:
         "azure":AzureStrategy()
     }
 
+    # With extra TTS_CANDIDATES configured, route to the fastest healthy one with live failover
+    candidates = provider_router.candidates("tts", selected_tts)
+    if len(candidates) > 1:
+        tts = await provider_router.create_routed(
+            "tts", candidates, strategies, lambda providers: agents_tts.FallbackAdapter(tts=providers)
+        )
+        if tts:
+            return tts
+
     strategy = strategies.get(selected_tts)
     if not strategy:
         logger.error(f"No strategy found for TTS: {selected_tts}")
         raise ValueError(f"No strategy found for TTS: {selected_tts}")
 
     logger.info(f"Attempting to instantiate TTS with strategy: {selected_tts}")
-    tts = await strategy.create()
+    tts = await provider_router.create("tts", selected_tts, strategy)
     if tts:
         logger.info(f"Successfully instantiated TTS: {selected_tts}")
-        return tts
+        return _with_cache(tts, selected_tts)
 
     if selected_tts != "aws":
         logger.warning(f"Selected TTS {selected_tts} failed, falling back to aws")
         fallback_strategy = strategies["aws"]
-        tts = await fallback_strategy.create()
+        tts = await provider_router.create("tts", "aws", fallback_strategy)
         if tts:
             logger.info("Successfully instantiated fallback aws TTS")
-            return tts
+            return _with_cache(tts, "aws")
 
     logger.error("No valid TTS configuration found")
     raise ValueError("No valid TTS configuration found")
@@ -1,5 +1,8 @@
 """ Utility is used to load the enviroment variables from Upstash redis to our project based on profile""" 
 import json
+import hashlib
+import threading
+import time
 from upstash_redis import Redis
 from utils.config_utils.env_loader import get_env_var
 from dotenv import load_dotenv
@@ -60,12 +63,103 @@ def load_config_from_env() -> Dict[str, Any]:
     flat_config["PROFILE"] = profile_name
     return flat_config
 
+# -------------------------------Select the Upstash version key for the profile -------------------------------
+def select_upstash_version_key(env_name: str) -> str:
+    return f"config:env:{env_name}:version"
+
+# -------------------------------Process-wide config snapshot-------------------------------
+class ConfigSnapshot:
+    """
+    Holds the flattened profile config for the whole process.
+    - Loaded once on first use, then served from memory.
+    - After `ttl` seconds the snapshot is revalidated: if the profile publishes a
+      `config:env:{profile}:version` key only that key is read, otherwise the raw
+      config is fetched and its hash compared, so it is only re-parsed when it changed.
+    - `refresh()` forces a full reload.
+    """
+
+    def __init__(self, ttl: float = 300.0):
+        self.ttl = ttl
+        self._config: Optional[Dict[str, Any]] = None
+        self._version: Optional[str] = None
+        self._hash: Optional[str] = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def version(self) -> Optional[str]:
+        return self._version
+
+    def get(self) -> Dict[str, Any]:
+        config = self._config
+        if config is not None and time.monotonic() - self._loaded_at < self.ttl:
+            return config
+        with self._lock:
+            if self._config is None:
+                self._load()
+            elif time.monotonic() - self._loaded_at >= self.ttl:
+                self._revalidate()
+            return self._config
+
+    def refresh(self) -> Dict[str, Any]:
+        with self._lock:
+            self._load()
+            return self._config
+
+    def _fetch_version(self, profile_name: str) -> Optional[str]:
+        version = redis.get(select_upstash_version_key(profile_name))
+        return str(version) if version else None
+
+    def _load(self, raw_config: Optional[str] = None, version: Optional[str] = None) -> None:
+        profile_name = get_profile_name()
+        redis_key = select_upstash_key(profile_name)
+        if raw_config is None:
+            version = self._fetch_version(profile_name)
+            raw_config = fetch_config_from_redis(redis_key)
+        config_json = parse_config_json(raw_config, redis_key)
+        flat_config = flatten_config(config_json)
+        flat_config["PROFILE"] = profile_name
+
+        self._config = flat_config
+        self._version = version
+        self._hash = hashlib.sha256(raw_config.encode("utf-8")).hexdigest()
+        self._loaded_at = time.monotonic()
+
+    def _revalidate(self) -> None:
+        profile_name = get_profile_name()
+        version = self._fetch_version(profile_name)
+        if version is not None and version == self._version:
+            self._loaded_at = time.monotonic()
+            return
+
+        raw_config = fetch_config_from_redis(select_upstash_key(profile_name))
+        if hashlib.sha256(raw_config.encode("utf-8")).hexdigest() == self._hash:
+            self._version = version
+            self._loaded_at = time.monotonic()
+            return
+        self._load(raw_config, version)
+
+
+config_snapshot = ConfigSnapshot(ttl=float(get_env_var("CONFIG_TTL_SECONDS", required=False, default="300")))
+
+# -------------------------------Force a reload of the process config snapshot-------------------------------
+def refresh_config() -> Dict[str, Any]:
+    return config_snapshot.refresh()
+
 # -------------------------------Get env variable value from Upstash config-------------------------------
 def get_config(key: str, default: Optional[str] = None, required: bool = True) -> Optional[str]:
-    config = load_config_from_env()
+    config = config_snapshot.get()
     value = config.get(key, default)
 
     if required and value is None:
         raise ValueError(f"Missing required config key: {key}")
 
     return value
+
+# -------------------------------LiveKit server credentials, fetched on first use instead of at import-------------------------------
+def get_livekit_credentials() -> Dict[str, str]:
+    return {
+        "url": get_config("LIVEKIT_URL", default="wss://livekit.example.com", required=False),
+        "api_key": get_config("LIVEKIT_API_KEY"),
+        "api_secret": get_config("LIVEKIT_API_SECRET"),
+    }
@@ -1,14 +1,96 @@
 """Utilty to connect to databases(Upstash) from where our agents fetch interview session data,coding-questions,company-prompts and so on"""
+import asyncio
+import threading
+import time
+from typing import Dict, Optional
 from upstash_redis import Redis
+from upstash_redis.asyncio import Redis as AsyncRedis
 import os
 from dotenv import load_dotenv
 from utils.config_utils.config_loader import get_config 
 from utils.monitoring_utils.logging import get_logger
+from utils.monitoring_utils.worker_metrics import REDIS_LATENCY
 
 logger = get_logger("db-config")
-# Create Redis client using REST credentials
-redis = Redis(
-    url=get_config("UPSTASH_REDIS_URL"),
-    token=get_config("UPSTASH_REDIS_TOKEN")
-)
 
+
+# REDIS_LATENCY children by command name, so timing a command allocates nothing once it's been seen
+_latency: Dict[str, object] = {}
+
+
+def _observe(name, started: float) -> None:
+    child = _latency.get(name)
+    if child is None:
+        child = _latency[name] = REDIS_LATENCY.labels(command=str(name).upper())
+    child.observe(time.perf_counter() - started)
+
+
+# Every Upstash command goes through execute(); time it there for the worker metrics
+class TimedRedis(Redis):
+    def execute(self, command):
+        started = time.perf_counter()
+        try:
+            return super().execute(command)
+        finally:
+            _observe(command[0], started)
+
+
+class TimedAsyncRedis(AsyncRedis):
+    async def execute(self, command):
+        started = time.perf_counter()
+        try:
+            return await super().execute(command)
+        finally:
+            _observe(command[0], started)
+
+
+_redis: Optional[TimedRedis] = None
+_redis_lock = threading.Lock()
+
+
+def get_redis() -> Redis:
+    """Return the sync Redis client, created on first use: its credentials come from the config store."""
+    global _redis
+    if _redis is None:
+        with _redis_lock:
+            if _redis is None:
+                # Create Redis client using REST credentials
+                _redis = TimedRedis(
+                    url=get_config("UPSTASH_REDIS_URL"),
+                    token=get_config("UPSTASH_REDIS_TOKEN")
+                )
+    return _redis
+
+
+class _LazyRedis:
+    """`redis` below: forwards to get_redis(), so importing this module does no network I/O."""
+
+    def __getattr__(self, name):
+        return getattr(get_redis(), name)
+
+
+redis = _LazyRedis()
+
+# One async client per event loop; its HTTP session keeps connections alive across calls
+_async_clients: Dict[asyncio.AbstractEventLoop, AsyncRedis] = {}
+
+
+def get_async_redis() -> AsyncRedis:
+    """Return the pooled async Redis client for the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = TimedAsyncRedis(
+            url=get_config("UPSTASH_REDIS_URL"),
+            token=get_config("UPSTASH_REDIS_TOKEN")
+        )
+        _async_clients[loop] = client
+        logger.debug("Created pooled async Redis client")
+    return client
+
+
+async def close_async_redis() -> None:
+    """Close the async Redis client bound to the running event loop, if any."""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
@@ -0,0 +1,19 @@
+import re
+from typing import Optional
+
+
+def normalize_phone(value: Optional[str]) -> Optional[str]:
+    """
+    Normalize a phone number for lookups.
+    - Strips spaces, dashes, dots and brackets
+    - Keeps a single leading '+'
+    Returns None if no digits remain.
+    """
+    if not value:
+        return None
+
+    digits = re.sub(r"\D", "", value)
+    if not digits:
+        return None
+
+    return f"+{digits}" if value.strip().startswith("+") else digits
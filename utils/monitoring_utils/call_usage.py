@@ -0,0 +1,125 @@
+import json
+import os
+import time
+from dataclasses import asdict
+from typing import Dict, Optional, Tuple
+from livekit.agents import metrics
+from repository.usage_ledger import append_booking, append_call
+from utils.config_utils.env_loader import get_env_var
+from utils.monitoring_utils.logging import get_logger
+
+logger = get_logger("CALL-USAGE")
+
+# USD per unit: LLM per token, STT per audio second, TTS per character. List prices of the
+# default models; override or extend with USAGE_PRICES='{"llm": {"openai": {"prompt": ...}}}'
+PRICES: Dict[str, Dict[str, Dict[str, float]]] = {
+    "llm": {
+        "openai": {"prompt": 0.15e-6, "cached": 0.075e-6, "completion": 0.6e-6},
+        "azure": {"prompt": 0.15e-6, "cached": 0.075e-6, "completion": 0.6e-6},
+        "openai-realtime": {"prompt": 0.6e-6, "cached": 0.3e-6, "completion": 2.4e-6},
+        "google": {"prompt": 0.1e-6, "cached": 0.025e-6, "completion": 0.4e-6},
+    },
+    "stt": {
+        "deepgram": {"seconds": 0.0043 / 60},
+        "openai": {"seconds": 0.006 / 60},
+        "google": {"seconds": 0.016 / 60},
+        "azure": {"seconds": 1.0 / 3600},
+    },
+    "tts": {
+        "cartesia": {"characters": 0.00003},
+        "elevenlabs": {"characters": 0.00018},
+        "openai": {"characters": 0.000015},
+        "aws": {"characters": 0.000016},
+        "google": {"characters": 0.000016},
+        "azure": {"characters": 0.000016},
+        "deepgram": {"characters": 0.000015},
+    },
+}
+
+
+def _apply_price_overrides() -> None:
+    overrides = json.loads(get_env_var("USAGE_PRICES", required=False, default="{}") or "{}")
+    for kind, providers in overrides.items():
+        for provider, prices in providers.items():
+            PRICES.setdefault(kind, {}).setdefault(provider, {}).update(prices)
+
+
+_apply_price_overrides()
+
+_warned_unpriced = set()
+
+
+def provider_of(label: str) -> str:
+    """Provider name from a metrics label, e.g. livekit.plugins.deepgram.stt.STT -> deepgram."""
+    parts = label.split(".")
+    if parts[:2] == ["livekit", "plugins"] and len(parts) > 2:
+        return f"{parts[2]}-realtime" if "realtime" in parts[3:] else parts[2]
+    return parts[-1].lower()
+
+
+class CallUsage:
+    """
+    Usage of one call per provider, priced and written to the usage ledger at shutdown.
+    Feed it every MetricsCollectedEvent's metrics next to the session's UsageCollector.
+    """
+
+    def __init__(self, agent_file: str, room: str, prospect_id: Optional[str], campaign_id: Optional[str] = None):
+        self.agent = os.path.splitext(os.path.basename(agent_file))[0]
+        self.room = room
+        self.prospect_id = prospect_id
+        self.campaign_id = campaign_id
+        self.started = time.time()
+        self.providers: Dict[Tuple[str, str], Dict[str, float]] = {}
+
+    def _add(self, kind: str, label: str, **amounts: float) -> None:
+        usage = self.providers.setdefault((kind, provider_of(label)), {})
+        for unit, amount in amounts.items():
+            usage[unit] = usage.get(unit, 0) + amount
+
+    def collect(self, m) -> None:
+        if isinstance(m, metrics.LLMMetrics):
+            self._add("llm", m.label, prompt=m.prompt_tokens - m.prompt_cached_tokens,
+                      cached=m.prompt_cached_tokens, completion=m.completion_tokens)
+        elif isinstance(m, metrics.RealtimeModelMetrics):
+            self._add("llm", m.label, prompt=m.input_tokens, completion=m.output_tokens)
+        elif isinstance(m, metrics.STTMetrics):
+            self._add("stt", m.label, seconds=m.audio_duration)
+        elif isinstance(m, metrics.TTSMetrics):
+            self._add("tts", m.label, characters=m.characters_count)
+
+    def costs(self) -> Dict[str, float]:
+        costs = {}
+        for (kind, provider), usage in self.providers.items():
+            prices = PRICES.get(kind, {}).get(provider)
+            if prices is None:
+                if (kind, provider) not in _warned_unpriced:
+                    _warned_unpriced.add((kind, provider))
+                    logger.warning(f"No price for {kind} provider {provider}; add it to USAGE_PRICES")
+                continue
+            costs[f"{kind}:{provider}"] = sum(prices.get(unit, 0.0) * amount for unit, amount in usage.items())
+        return costs
+
+    def _identity(self) -> Dict:
+        return {"at": round(self.started, 3), "agent": self.agent, "campaign": self.campaign_id,
+                "prospect": self.prospect_id, "room": self.room}
+
+    async def record(self, summary) -> Dict:
+        """Write this call to the ledger; `summary` is the session's UsageCollector.get_summary()."""
+        usage = {field: value for field, value in asdict(summary).items() if value}
+        costs = self.costs()
+        duration = round(time.time() - self.started, 1)
+        entry = {
+            "ev": "call", **self._identity(), "dur": duration, "usage": usage,
+            "providers": {f"{kind}:{provider}": u for (kind, provider), u in self.providers.items()},
+            "cost": {key: round(usd, 6) for key, usd in costs.items()},
+            "usd": round(sum(costs.values()), 6),
+        }
+        totals = {"calls": 1, "seconds": duration, "usd": sum(costs.values()), **usage}
+        totals.update({f"usd:{key}": usd for key, usd in costs.items()})
+        await append_call(entry, totals)
+        logger.info(f"Call usage recorded: {entry['usd']:.4f} USD over {duration}s")
+        return entry
+
+    async def record_booking(self) -> None:
+        """Count a booked appointment against this call's campaign, agent module and hour."""
+        await append_booking(self._identity())
@@ -0,0 +1,249 @@
+import asyncio
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+import psutil
+from utils.config_utils.env_loader import get_env_var
+from utils.monitoring_utils.logging import get_logger
+from utils.monitoring_utils.worker_metrics import (
+    ACTIVE_CALLS, LOOP_LAG, PROCESS_RSS, WORKER_LOAD, start_job_metrics, start_metrics_server,
+)
+
+logger = get_logger("LOAD-MONITOR")
+
+# Pass as WorkerOptions(load_threshold=...): at 1.0 LiveKit stops dispatching to the worker
+LOAD_THRESHOLD = 1.0
+# Fraction of the machine's CPU and memory the worker may use before it reports itself full
+CPU_TARGET = float(get_env_var("LOAD_CPU_TARGET", required=False, default="0.8"))
+MEM_TARGET = float(get_env_var("LOAD_MEM_TARGET", required=False, default="0.85"))
+# Event-loop lag (seconds) in a job process at which audio frames start arriving late
+LAG_LIMIT = float(get_env_var("LOAD_LAG_LIMIT", required=False, default="0.1"))
+# Watchdog tick and how many ticks the reported lag covers
+LAG_INTERVAL = 0.25
+LAG_WINDOW = 40
+# Lag reports older than this are from a job that has exited
+STALE_REPORT_SECONDS = 10.0
+# Smoothing factor for the per-job CPU/RSS cost estimates
+COST_ALPHA = 0.2
+# AIMD tuning of the concurrency ceiling: grow slowly while healthy, back off quickly on lag
+CEILING_STEP = 0.25
+CEILING_BACKOFF = 0.7
+
+# Workers publish their load here every HEARTBEAT_SECONDS; the campaign dialer holds calls back on it
+WORKER_LOAD_KEY = "dialer:workers"
+HEARTBEAT_SECONDS = 5.0
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# Job processes report their loop lag here. Set on first import in the worker process and
+# inherited through the environment, since job processes may not be direct children of it.
+REPORT_DIR = os.environ.setdefault(
+    "AGENT_LOAD_REPORT_DIR", os.path.join(tempfile.gettempdir(), "agent-load", str(os.getpid()))
+)
+
+
+def _hard_cap() -> int:
+    # MAX_JOBS used to be the fixed ceiling; it is now only the upper bound for the tuned one
+    try:
+        return max(1, int(get_env_var("MAX_JOBS", required=False, default="") or os.cpu_count() or 1))
+    except ValueError:
+        return os.cpu_count() or 1
+
+
+# -------------------------------Job process: event-loop watchdog-------------------------------
+
+_watchdog: Optional[asyncio.Task] = None
+_lag_reporter: Optional[threading.Thread] = None
+# Worst lag over the last LAG_WINDOW ticks; None while no watchdog is running
+_lag: Optional[float] = None
+
+
+async def _watch_loop() -> None:
+    global _lag
+    lags = deque(maxlen=LAG_WINDOW)
+    try:
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(LAG_INTERVAL)
+            lags.append(max(0.0, time.monotonic() - started - LAG_INTERVAL))
+            _lag = max(lags)
+    finally:
+        _lag = None
+
+
+def _report_lag() -> None:
+    # Writes the lag file from a thread so the event loop it measures does no file I/O
+    os.makedirs(REPORT_DIR, exist_ok=True)
+    path = os.path.join(REPORT_DIR, f"{os.getpid()}.lag")
+    while True:
+        time.sleep(LAG_INTERVAL)
+        lag = _lag
+        try:
+            if lag is None:
+                os.remove(path)
+            else:
+                # The worker process reads this file in worker_load()
+                with open(path, "w") as f:
+                    f.write(f"{lag:.4f}")
+        except OSError:
+            pass
+
+
+def start_loop_watchdog() -> None:
+    """
+    Sample this job process's event-loop lag and report it, and the job's metrics, to the
+    worker process. Call first thing in the job entrypoint; one watchdog runs per process.
+    """
+    global _watchdog, _lag_reporter
+    start_job_metrics()
+    if _watchdog is None or _watchdog.done():
+        _watchdog = asyncio.get_running_loop().create_task(_watch_loop())
+    if _lag_reporter is None:
+        _lag_reporter = threading.Thread(target=_report_lag, name="lag-report", daemon=True)
+        _lag_reporter.start()
+
+
+# -------------------------------Worker process: load score-------------------------------
+
+class LoadMonitor:
+    """
+    Load score for WorkerOptions(load_fnc=...), computed in the worker process. It is the
+    highest of: active jobs over the tuned ceiling, machine CPU and memory over their targets,
+    and the worst job event-loop lag over LAG_LIMIT. The ceiling is tuned from the measured
+    CPU/RSS cost per job and backs off whenever a job's loop lags.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._procs: Dict[int, psutil.Process] = {}
+        self.cpu_per_job: Optional[float] = None
+        self.rss_per_job: Optional[float] = None
+        self.ceiling = float(min(2, _hard_cap()))
+        self.last_load = 0.0
+        self._published_at = 0.0
+        psutil.cpu_percent(interval=None)
+
+    def _children(self) -> Dict[int, psutil.Process]:
+        # Keep the same Process objects between calls so cpu_percent() measures the interval
+        alive = {}
+        for child in psutil.Process().children(recursive=True):
+            proc = self._procs.get(child.pid)
+            if proc is None:
+                proc = child
+                proc.cpu_percent(interval=None)
+            alive[child.pid] = proc
+        self._procs = alive
+        return alive
+
+    def _job_usage(self):
+        cpu = rss = 0.0
+        for proc in self._children().values():
+            try:
+                cpu += proc.cpu_percent(interval=None)
+                rss += proc.memory_info().rss
+            except psutil.Error:
+                continue
+        return cpu / (100.0 * (os.cpu_count() or 1)), rss
+
+    def max_job_lag(self) -> float:
+        worst = 0.0
+        now = time.time()
+        try:
+            names = os.listdir(REPORT_DIR)
+        except FileNotFoundError:
+            return 0.0
+        for name in names:
+            if not name.endswith(".lag"):
+                continue
+            path = os.path.join(REPORT_DIR, name)
+            try:
+                if now - os.path.getmtime(path) > STALE_REPORT_SECONDS:
+                    os.remove(path)
+                    continue
+                with open(path) as f:
+                    worst = max(worst, float(f.read() or 0))
+            except (OSError, ValueError):
+                continue
+        return worst
+
+    def _tune(self, active: int, lag: float, mem_total: int) -> None:
+        cap = float(_hard_cap())
+        if self.cpu_per_job:
+            cap = min(cap, CPU_TARGET / self.cpu_per_job)
+        if self.rss_per_job:
+            cap = min(cap, mem_total * MEM_TARGET / self.rss_per_job)
+
+        if lag > LAG_LIMIT:
+            ceiling = max(1.0, min(self.ceiling, active) * CEILING_BACKOFF)
+            if ceiling < self.ceiling:
+                logger.warning(f"Job loop lag {lag * 1000:.0f}ms, lowering job ceiling to {ceiling:.2f}")
+            self.ceiling = ceiling
+        elif active >= int(self.ceiling):
+            self.ceiling += CEILING_STEP
+        self.ceiling = max(1.0, min(self.ceiling, cap))
+
+    def load(self, worker) -> float:
+        with self._lock:
+            active = len(worker.active_jobs)
+            job_cpu, job_rss = self._job_usage()
+            if active:
+                cpu_cost, rss_cost = job_cpu / active, job_rss / active
+                self.cpu_per_job = cpu_cost if self.cpu_per_job is None else (
+                    COST_ALPHA * cpu_cost + (1 - COST_ALPHA) * self.cpu_per_job
+                )
+                self.rss_per_job = rss_cost if self.rss_per_job is None else (
+                    COST_ALPHA * rss_cost + (1 - COST_ALPHA) * self.rss_per_job
+                )
+
+            memory = psutil.virtual_memory()
+            lag = self.max_job_lag()
+            self._tune(active, lag, memory.total)
+
+            self.last_load = min(1.0, max(
+                active / int(self.ceiling),
+                psutil.cpu_percent(interval=None) / 100.0 / CPU_TARGET,
+                memory.percent / 100.0 / MEM_TARGET,
+                lag / LAG_LIMIT,
+            ))
+            ACTIVE_CALLS.set(active)
+            WORKER_LOAD.set(self.last_load)
+            LOOP_LAG.set(lag)
+            PROCESS_RSS.set(psutil.Process().memory_info().rss + job_rss)
+            if time.monotonic() - self._published_at >= HEARTBEAT_SECONDS:
+                self._publish(active)
+            return self.last_load
+
+    def _publish(self, active: int) -> None:
+        self._published_at = time.monotonic()
+        try:
+            # Imported here: only the worker process publishes its load
+            from utils.config_utils.db_config import redis
+            redis.hset(WORKER_LOAD_KEY, WORKER_ID, json.dumps({
+                "load": round(self.last_load, 3),
+                "active": active,
+                "ceiling": int(self.ceiling),
+                "at": time.time(),
+            }))
+        except Exception as e:
+            logger.warning(f"Could not publish worker load: {e}")
+
+
+_load_monitor: Optional[LoadMonitor] = None
+
+
+def get_load_monitor() -> LoadMonitor:
+    global _load_monitor
+    if _load_monitor is None:
+        _load_monitor = LoadMonitor()
+    return _load_monitor
+
+
+def worker_load(worker) -> float:
+    """`load_fnc` for WorkerOptions, used with `load_threshold=LOAD_THRESHOLD`."""
+    # Only ever called in the worker process, which serves the metrics of all its jobs
+    start_metrics_server()
+    return get_load_monitor().load(worker)
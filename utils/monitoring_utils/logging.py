@@ -1,49 +1,304 @@
+import atexit
 import logging
 import logging.handlers
 import os
+import queue
+import gzip
+import shutil
+import threading
 import coloredlogs
-from datetime import datetime
-from typing import Optional
+from datetime import date, datetime
+from typing import List, Optional
+from utils.config_utils.env_loader import get_env_var
 
 # Directory for logs
 LOG_DIR = "logs"
 os.makedirs(LOG_DIR, exist_ok=True)
 
-# Log file name with date
-LOG_FILE = os.path.join(LOG_DIR, f"{datetime.now().strftime('%Y-%m-%d')}.log")
+# Each process writes its own file, rolled over at midnight or at LOG_MAX_BYTES
+LOG_MAX_BYTES = int(get_env_var("LOG_MAX_BYTES", required=False, default=str(5 * 1024 * 1024)))
+# Total size of the gzipped segments of all processes; the oldest are deleted past it
+LOG_RETENTION_BYTES = int(get_env_var("LOG_RETENTION_BYTES", required=False, default=str(500 * 1024 * 1024)))
+
+# Records waiting for the writer thread; past this, new records are dropped and counted
+LOG_QUEUE_SIZE = int(get_env_var("LOG_QUEUE_SIZE", required=False, default="10000"))
+
+FILE_FORMAT = logging.Formatter(
+    "%(asctime)s | %(levelname)-8s | %(name)s | %(filename)s:%(lineno)d | %(message)s",
+    "%Y-%m-%d %H:%M:%S",
+)
+CONSOLE_FORMAT = "%(asctime)s | %(levelname)-8s | %(name)s | %(message)s"
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class RollingFileHandler(logging.handlers.BaseRotatingHandler):
+    """
+    This process's log file, LOG_DIR/<pid>.log. It is rolled over when the date changes, when it
+    reaches `max_bytes` and when the handler is closed at exit; the segment is renamed after the
+    time it was started and gzipped, and the oldest segments in the directory are deleted once
+    they add up to more than `retention_bytes`. No file is shared between processes, so
+    rollovers never race. Files left behind by processes that died without closing their
+    handler are rolled by whichever process prunes next.
+    """
+
+    def __init__(self, directory: str = LOG_DIR, max_bytes: int = LOG_MAX_BYTES,
+                 retention_bytes: int = LOG_RETENTION_BYTES):
+        self.directory = directory
+        self.stem = str(os.getpid())
+        super().__init__(os.path.join(directory, f"{self.stem}.log"), "a", encoding="utf-8", delay=True)
+        self.max_bytes = max_bytes
+        self.retention_bytes = retention_bytes
+        self.started = datetime.now()
+        self._compressors: List[threading.Thread] = []
+        # Pick up what crashed processes left behind
+        self._start_compressor(None)
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if date.today() != self.started.date():
+            return True
+        if self.stream is None:
+            return False
+        return self.stream.tell() >= self.max_bytes
+
+    def doRollover(self) -> None:
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        segment = self._segment(self.baseFilename, self.stem, self.started)
+        if segment:
+            self._start_compressor(segment)
+        # emit() reopens the file
+        self.started = datetime.now()
+
+    def _segment(self, path: str, stem: str, started: datetime) -> Optional[str]:
+        """Rename a live log file to its segment name; None if it is empty or already gone."""
+        try:
+            if os.path.getsize(path) == 0:
+                return None
+            segment = os.path.join(self.directory, f"{stem}.{started:%Y-%m-%d_%H%M%S_%f}.log")
+            os.replace(path, segment)
+        except OSError:
+            return None  # Swept by another process
+        return segment
+
+    def _start_compressor(self, segment: Optional[str]) -> None:
+        compressor = threading.Thread(target=self._compress, args=(segment,), name="log-compress", daemon=True)
+        compressor.start()
+        self._compressors = [c for c in self._compressors if c.is_alive()] + [compressor]
+
+    def _compress(self, segment: Optional[str]) -> None:
+        if segment:
+            self._gzip(segment)
+        self._sweep_dead()
+        self._prune()
+
+    @staticmethod
+    def _gzip(segment: str) -> None:
+        try:
+            with open(segment, "rb") as src, gzip.open(f"{segment}.gz.tmp", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.replace(f"{segment}.gz.tmp", f"{segment}.gz")
+            os.remove(segment)
+        except OSError as e:
+            # Can't log from here: this is the logging thread's own handler
+            print(f"Could not compress log segment {segment}: {e}")
+
+    def _sweep_dead(self) -> None:
+        # <pid>.log files and uncompressed segments of processes that exited without rolling them
+        for name in os.listdir(self.directory):
+            stem, _, rest = name.partition(".")
+            if not stem.isdigit() or stem == self.stem or not rest.endswith("log") or _pid_alive(int(stem)):
+                continue
+            path = os.path.join(self.directory, name)
+            if rest == "log":
+                # A live file: name the segment after its last write
+                try:
+                    rest = f"{datetime.fromtimestamp(os.path.getmtime(path)):%Y-%m-%d_%H%M%S_%f}.log"
+                except OSError:
+                    continue
+            # Renaming it under this process's pid claims it: only one sweeper wins the rename
+            claimed = os.path.join(self.directory, f"{self.stem}.{stem}.{rest}")
+            try:
+                os.replace(path, claimed)
+            except OSError:
+                continue
+            self._gzip(claimed)
+
+    def _prune(self) -> None:
+        segments = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".log.gz"):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    continue  # Pruned by another process
+                segments.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in segments)
+        for _, size, name in sorted(segments):
+            if total <= self.retention_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+            total -= size
+
+    def close(self) -> None:
+        super().close()
+        # Roll the live file so every process's logs end up gzipped and counted. Not in a
+        # forked child closing its parent's inherited handler: that file is the parent's.
+        if self.stem == str(os.getpid()):
+            segment = self._segment(self.baseFilename, self.stem, self.started)
+            if segment:
+                self._gzip(segment)
+                self._prune()
+        for compressor in self._compressors:
+            compressor.join(timeout=5.0)
+
+
+class lazy:
+    """
+    Defers an expensive log argument to the writer thread:
+        logger.info("Fetched Prospect: %s", lazy(prospect.to_dict))
+    """
+
+    __slots__ = ("fn", "args")
+
+    def __init__(self, fn, *args):
+        self.fn = fn
+        self.args = args
+
+    def __str__(self) -> str:
+        return str(self.fn(*self.args))
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Puts records on the bounded log queue without blocking or formatting them: the message,
+    its arguments and any traceback are rendered by the writer thread. When the queue is full
+    the record is dropped and counted, and the count is logged once there is room again.
+    """
+
+    def __init__(self, pipeline: "LogPipeline"):
+        super().__init__(pipeline.queue)
+        self.pipeline = pipeline
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Same process, no pickling: hand the record over as is
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        self.pipeline.put(record)
+
+
+class LogPipeline:
+    """One bounded queue and one writer thread (QueueListener) per process, shared by every logger."""
+
+    def __init__(self):
+        self.queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        self.dropped = 0
+        self.stopped = False
+        self._lock = threading.Lock()
+        self.listener = logging.handlers.QueueListener(
+            self.queue, *self._handlers(), respect_handler_level=True
+        )
+        self.listener.start()
+
+    @staticmethod
+    def _handlers():
+        # This handler will write all logs to a file.
+        file_handler = RollingFileHandler()
+        file_handler.setLevel(logging.DEBUG)  # File: store all logs
+        file_handler.setFormatter(FILE_FORMAT)
+
+        # Colored console output at INFO, as coloredlogs.install used to set up per logger
+        console_handler = logging.StreamHandler()
+        console_handler.setLevel(logging.INFO)
+        console_handler.setFormatter(coloredlogs.ColoredFormatter(fmt=CONSOLE_FORMAT))
+        return file_handler, console_handler
+
+    def put(self, record: logging.LogRecord) -> None:
+        try:
+            if self.dropped:
+                self._report_dropped(record)
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def _report_dropped(self, record: logging.LogRecord) -> None:
+        with self._lock:
+            dropped, self.dropped = self.dropped, 0
+        try:
+            self.queue.put_nowait(logging.LogRecord(
+                record.name, logging.WARNING, __file__, 0,
+                "Log queue full: dropped %d records", (dropped,), None,
+            ))
+        except queue.Full:
+            with self._lock:
+                self.dropped += dropped
+
+    def stop(self) -> None:
+        # Flushes what is still queued
+        if self.stopped:
+            return
+        self.stopped = True
+        self.listener.stop()
+        for handler in self.listener.handlers:
+            handler.close()
+
+
+_pipeline: Optional[LogPipeline] = None
+_pipeline_lock = threading.Lock()
+
+
+def get_log_pipeline() -> LogPipeline:
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            _pipeline = LogPipeline()
+            atexit.register(_pipeline.stop)
+        return _pipeline
+
+
+def _restart_after_fork() -> None:
+    # The writer thread does not survive fork(); give the child its own queue and thread
+    global _pipeline, _pipeline_lock
+    _pipeline_lock = threading.Lock()
+    if _pipeline is not None:
+        inherited, _pipeline = _pipeline, LogPipeline()
+        atexit.register(_pipeline.stop)
+        for logger in list(logging.Logger.manager.loggerDict.values()):
+            for handler in getattr(logger, "handlers", []):
+                if isinstance(handler, DroppingQueueHandler) and handler.pipeline is inherited:
+                    handler.pipeline = _pipeline
+                    handler.queue = _pipeline.queue
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_after_fork)
+
 
 # Centralized logger
 def get_logger(name: str) -> logging.Logger:
     """
-    Returns a configured logger instance with both console and file handlers.
-    This logger is thread-safe and works across the entire application.
-    The console handler is handled by coloredlogs for colorful output.
+    Returns a configured logger instance writing to both the console and the log file.
+    Logging calls only enqueue the record; formatting and writing happen on one background
+    thread per process, so logging never blocks the event loop.
     """
     logger = logging.getLogger(name)
     logger.setLevel(logging.DEBUG)  # Set to lowest level, handlers will filter
 
     if not logger.hasHandlers():  # Avoid duplicate handlers
-        
-        # This handler will write all logs to a file.
-        file_handler = logging.handlers.RotatingFileHandler(
-            LOG_FILE, maxBytes=5 * 1024 * 1024, backupCount=10, encoding="utf-8"
-        )
-        file_handler.setLevel(logging.DEBUG)  # File: store all logs
-        file_format = logging.Formatter(
-            "%(asctime)s | %(levelname)-8s | %(name)s | %(filename)s:%(lineno)d | %(message)s",
-            "%Y-%m-%d %H:%M:%S",
-        )
-        file_handler.setFormatter(file_format)
-        
-        # Attach the file handler to the logger
-        logger.addHandler(file_handler)
-
-        # Install coloredlogs to handle the console output.
-        # It automatically adds a StreamHandler with colors.
-        coloredlogs.install(
-            level='INFO', 
-            logger=logger,
-            fmt='%(asctime)s | %(levelname)-8s | %(name)s | %(message)s'
-        )
-        
-    return logger
\ No newline at end of file
+        logger.addHandler(DroppingQueueHandler(get_log_pipeline()))
+
+    return logger
@@ -0,0 +1,251 @@
+"""
+Per-turn latency traces for agent sessions.
+
+Each conversational turn is one trace. Its root span runs from the end of the user's speech
+to the start of the agent's reply playout, i.e. the mouth-to-ear latency. The child spans are
+the work in between: end-of-utterance detection, STT final, LLM (with time to first token),
+every function tool execution and TTS (with time to first byte). All spans carry the room and
+prospect id.
+
+Spans are written as OTLP/JSON ExportTraceServiceRequest objects, one per line, to
+TRACE_DIR/<date>-<pid>.otlp.jsonl. Any OTLP/JSON reader can load them, e.g. the
+OpenTelemetry Collector's otlpjsonfile receiver.
+"""
+import asyncio
+import json
+import os
+import secrets
+import time
+from datetime import date
+from typing import Any, Dict, List, Optional
+from livekit.agents import AgentSession, JobContext, metrics
+from utils.config_utils.env_loader import get_env_var
+from utils.monitoring_utils.logging import get_logger
+from utils.monitoring_utils.worker_metrics import TURN_LATENCY, record_job_started
+
+logger = get_logger("TURN-TRACING")
+
+TRACE_DIR = get_env_var("TRACE_DIR", required=False, default="traces")
+TRACING = get_env_var("TURN_TRACING", required=False, default="on").lower() not in ("off", "0", "false")
+SERVICE_NAME = "demo-agent"
+SCOPE_NAME = "demo-agent.turns"
+# OTLP span kind INTERNAL
+SPAN_KIND_INTERNAL = 1
+
+
+def _nanos(seconds: float) -> str:
+    # OTLP/JSON encodes 64-bit integers as strings
+    return str(int(seconds * 1e9))
+
+
+def _attributes(values: Dict[str, Any]) -> List[Dict[str, Any]]:
+    attributes = []
+    for key, value in values.items():
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            encoded = {"boolValue": value}
+        elif isinstance(value, int):
+            encoded = {"intValue": str(value)}
+        elif isinstance(value, float):
+            encoded = {"doubleValue": value}
+        else:
+            encoded = {"stringValue": str(value)}
+        attributes.append({"key": key, "value": encoded})
+    return attributes
+
+
+class Turn:
+    def __init__(self, index: int, initiator: str, started: float):
+        self.index = index
+        self.initiator = initiator
+        self.trace_id = secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.started = started
+        self.ended: Optional[float] = None
+        self.events: List[Dict[str, Any]] = []
+
+    def event(self, name: str, at: float, **attributes) -> None:
+        self.events.append({"timeUnixNano": _nanos(at), "name": name, "attributes": _attributes(attributes)})
+
+
+class TurnTracer:
+    """
+    Builds per-turn spans from the AgentSession's events and metrics. Create it with
+    `trace_turns()` before the session starts.
+    """
+
+    def __init__(self, session: AgentSession, room: str, prospect_id: Optional[str]):
+        self.attributes = {"room": room, "prospect_id": prospect_id}
+        self.path = os.path.join(TRACE_DIR, f"{date.today():%Y-%m-%d}-{os.getpid()}.otlp.jsonl")
+        self._turn: Optional[Turn] = None
+        self._turns = 0
+        self._user_speaking_since: Optional[float] = None
+        self._spans: List[Dict[str, Any]] = []
+        self._flushes: List[asyncio.Future] = []
+
+        session.on("user_state_changed", self._on_user_state)
+        session.on("user_input_transcribed", self._on_transcript)
+        session.on("agent_state_changed", self._on_agent_state)
+        session.on("metrics_collected", self._on_metrics)
+        session.on("function_tools_executed", self._on_tools)
+
+    # -------------------------------Turns-------------------------------
+    def _start_turn(self, initiator: str, at: float) -> Turn:
+        self._end_turn()
+        self._turns += 1
+        self._turn = Turn(self._turns, initiator, at)
+        return self._turn
+
+    def _current(self, at: float) -> Turn:
+        # Work the agent starts on its own (the greeting, a reply after a tool) opens an agent turn
+        return self._turn or self._start_turn("agent", at)
+
+    def _end_turn(self) -> None:
+        turn, self._turn = self._turn, None
+        if turn is None:
+            return
+        ended = turn.ended or time.time()
+        if turn.ended and turn.initiator == "user":
+            TURN_LATENCY.observe(ended - turn.started)
+        self._spans.append({
+            "traceId": turn.trace_id,
+            "spanId": turn.span_id,
+            "name": f"{turn.initiator}_turn",
+            "kind": SPAN_KIND_INTERNAL,
+            "startTimeUnixNano": _nanos(turn.started),
+            "endTimeUnixNano": _nanos(ended),
+            "attributes": _attributes({
+                **self.attributes,
+                "turn.index": turn.index,
+                "turn.initiator": turn.initiator,
+                "turn.mouth_to_ear_ms": round((ended - turn.started) * 1000, 1) if turn.ended else None,
+            }),
+            "events": turn.events,
+        })
+        self.flush()
+
+    def _span(self, name: str, start: float, end: float, parent_id: Optional[str] = None, **attributes) -> str:
+        turn = self._current(start)
+        span_id = secrets.token_hex(8)
+        self._spans.append({
+            "traceId": turn.trace_id,
+            "spanId": span_id,
+            "parentSpanId": parent_id or turn.span_id,
+            "name": name,
+            "kind": SPAN_KIND_INTERNAL,
+            "startTimeUnixNano": _nanos(start),
+            "endTimeUnixNano": _nanos(max(start, end)),
+            "attributes": _attributes({**self.attributes, "turn.index": turn.index, **attributes}),
+        })
+        return span_id
+
+    # -------------------------------Session events-------------------------------
+    def _on_user_state(self, ev) -> None:
+        if ev.new_state == "speaking":
+            self._user_speaking_since = ev.created_at
+        elif ev.old_state == "speaking":
+            # VAD end of speech: the clock for the next reply starts here
+            turn = self._start_turn("user", ev.created_at)
+            since, self._user_speaking_since = self._user_speaking_since, None
+            turn.event(
+                "vad.end_of_speech", ev.created_at,
+                speech_ms=round((ev.created_at - since) * 1000, 1) if since else None,
+            )
+
+    def _on_transcript(self, ev) -> None:
+        if ev.is_final and self._turn is not None and self._turn.initiator == "user":
+            self._span("stt.final", self._turn.started, ev.created_at, transcript_chars=len(ev.transcript))
+
+    def _on_agent_state(self, ev) -> None:
+        if ev.new_state == "listening":
+            record_job_started()
+        elif ev.new_state == "speaking":
+            turn = self._current(ev.created_at)
+            if turn.ended is None:
+                turn.ended = ev.created_at
+                turn.event("playout.start", ev.created_at)
+
+    def _on_metrics(self, ev) -> None:
+        m = ev.metrics
+        if isinstance(m, metrics.EOUMetrics):
+            start = self._turn.started if self._turn else m.timestamp - m.end_of_utterance_delay
+            self._span(
+                "eou", start, start + m.end_of_utterance_delay,
+                transcription_delay_ms=round(m.transcription_delay * 1000, 1),
+                speech_id=m.speech_id,
+            )
+        elif isinstance(m, metrics.LLMMetrics):
+            start = m.timestamp - m.duration
+            span_id = self._span(
+                "llm", start, m.timestamp,
+                ttft_ms=round(m.ttft * 1000, 1), prompt_tokens=m.prompt_tokens,
+                completion_tokens=m.completion_tokens, cancelled=m.cancelled, speech_id=m.speech_id,
+            )
+            if m.ttft > 0:
+                self._span("llm.ttft", start, start + m.ttft, parent_id=span_id)
+        elif isinstance(m, metrics.TTSMetrics):
+            start = m.timestamp - m.duration
+            span_id = self._span(
+                "tts", start, m.timestamp,
+                ttfb_ms=round(m.ttfb * 1000, 1), characters=m.characters_count,
+                audio_ms=round(m.audio_duration * 1000, 1), cancelled=m.cancelled, speech_id=m.speech_id,
+            )
+            if m.ttfb > 0:
+                self._span("tts.ttfb", start, start + m.ttfb, parent_id=span_id)
+        elif isinstance(m, metrics.STTMetrics) and not m.streamed:
+            self._span("stt.request", m.timestamp - m.duration, m.timestamp)
+
+    def _on_tools(self, ev) -> None:
+        # Each call and its output are stamped when created, which brackets the tool's execution
+        for call, output in zip(ev.function_calls, ev.function_call_outputs):
+            ended = output.created_at if output is not None else ev.created_at
+            self._span(
+                f"tool {call.name}", call.created_at, ended,
+                tool_name=call.name, is_error=output.is_error if output is not None else None,
+            )
+
+    # -------------------------------Export-------------------------------
+    def _request(self, spans: List[Dict[str, Any]]) -> str:
+        return json.dumps({"resourceSpans": [{
+            "resource": {"attributes": _attributes({"service.name": SERVICE_NAME, "process.pid": os.getpid()})},
+            "scopeSpans": [{"scope": {"name": SCOPE_NAME}, "spans": spans}],
+        }]})
+
+    def _write(self, line: str) -> None:
+        os.makedirs(TRACE_DIR, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    def flush(self) -> None:
+        """Write the finished spans on an executor thread."""
+        if not TRACING:
+            self._spans.clear()
+        if not self._spans:
+            return
+        spans, self._spans = self._spans, []
+        future = asyncio.get_running_loop().run_in_executor(None, self._write, self._request(spans))
+        future.add_done_callback(self._on_written)
+        self._flushes.append(future)
+
+    def _on_written(self, future: asyncio.Future) -> None:
+        self._flushes.remove(future)
+        if not future.cancelled() and future.exception():
+            logger.warning(f"Could not write turn traces to {self.path}: {future.exception()}")
+
+    async def aclose(self) -> None:
+        self._end_turn()
+        self.flush()
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+
+
+def trace_turns(ctx: JobContext, session: AgentSession, prospect_id: Optional[str]) -> TurnTracer:
+    """
+    Trace every turn of this session; the spans are flushed when the job shuts down. With
+    TURN_TRACING=off no spans are written, but turn and job start latencies still feed the
+    worker metrics.
+    """
+    tracer = TurnTracer(session, room=ctx.room.name, prospect_id=prospect_id)
+    ctx.add_shutdown_callback(tracer.aclose)
+    return tracer
@@ -0,0 +1,370 @@
+"""
+Prometheus metrics for agent workers.
+
+Metrics are pre-aggregated in place: counters and gauges are one float per label set, and
+histograms are fixed bucket counts. Recording a sample is a bisect and two additions under a
+lock; it allocates nothing once a label set's child exists (see `labels()`).
+
+Job processes record into their own registry and write a snapshot of it to the load
+monitor's report directory every REPORT_SECONDS, and once more as the process exits. The
+worker process merges these snapshots with its own metrics and serves them at
+http://0.0.0.0:METRICS_PORT/metrics from a background thread. The snapshots of jobs that have exited are folded into the worker's
+totals, so counters never go backwards.
+"""
+import bisect
+import json
+import multiprocessing.util
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+from utils.config_utils.env_loader import get_env_var
+from utils.monitoring_utils.logging import get_logger
+
+logger = get_logger("WORKER-METRICS")
+
+# 0 disables the endpoint
+METRICS_PORT = int(get_env_var("METRICS_PORT", required=False, default="9464"))
+# How often a job process writes its snapshot for the worker to merge
+REPORT_SECONDS = 2.0
+
+LabelValues = Tuple[str, ...]
+
+
+# -------------------------------Metric types-------------------------------
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: Dict[LabelValues, object] = {}
+        REGISTRY.append(self)
+
+    def labels(self, **labels: str):
+        """The child for one label set. Keep it to record without building the label tuple again."""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            return {json.dumps(key): child.value() for key, child in self._children.items()}
+
+
+class _Value:
+    __slots__ = ("_lock", "_value")
+
+    def __init__(self, lock: threading.Lock):
+        self._lock = lock
+        self._value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    def set(self, value: float) -> None:
+        self._value = value
+
+    def value(self) -> float:
+        return self._value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self) -> _Value:
+        return _Value(self._lock)
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    """Set in the worker process only: job processes' gauges are not merged."""
+
+    kind = "gauge"
+
+    def _new_child(self) -> _Value:
+        return _Value(self._lock)
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+
+class _Buckets:
+    __slots__ = ("_lock", "_bounds", "counts", "sum")
+
+    def __init__(self, lock: threading.Lock, bounds: List[float]):
+        self._lock = lock
+        self._bounds = bounds
+        # One slot per bucket plus +Inf; cumulated only when exported
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self._bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def value(self) -> List[float]:
+        return [*self.counts, self.sum]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float], labelnames: Sequence[str] = ()):
+        self.buckets = sorted(buckets)
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> _Buckets:
+        return _Buckets(self._lock, self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def time(self, **labels: str) -> "_Timer":
+        """`with histogram.time(command="GET"):` observes the block's duration."""
+        return _Timer(self.labels(**labels))
+
+
+class _Timer:
+    __slots__ = ("_child", "_started")
+
+    def __init__(self, child: _Buckets):
+        self._child = child
+
+    def __enter__(self) -> None:
+        self._started = time.perf_counter()
+
+    def __exit__(self, *exc) -> None:
+        self._child.observe(time.perf_counter() - self._started)
+
+
+REGISTRY: List[_Metric] = []
+
+# -------------------------------Metrics-------------------------------
+ACTIVE_CALLS = Gauge("agent_active_calls", "Jobs (calls) running on this worker")
+WORKER_LOAD = Gauge("agent_worker_load", "Load score reported to LiveKit; 1.0 stops new dispatches")
+LOOP_LAG = Gauge("agent_event_loop_lag_seconds", "Worst recent event-loop lag across job processes")
+PROCESS_RSS = Gauge("agent_process_rss_bytes", "Resident memory of the worker and its job processes")
+JOB_START_LATENCY = Histogram(
+    "agent_job_start_latency_seconds", "From the job entrypoint starting to the agent session listening",
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 10.0, 20.0),
+)
+TURN_LATENCY = Histogram(
+    "agent_turn_latency_seconds", "End of user speech to the first audio of the reply",
+    buckets=(0.25, 0.5, 0.75, 1.0, 1.25, 1.5, 2.0, 3.0, 5.0, 8.0),
+)
+PROVIDER_ERRORS = Counter(
+    "agent_provider_errors_total", "Errors emitted by LLM/STT/TTS providers", labelnames=("kind", "provider"),
+)
+REDIS_LATENCY = Histogram(
+    "agent_redis_latency_seconds", "Upstash Redis command latency",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5), labelnames=("command",),
+)
+GOOGLE_LATENCY = Histogram(
+    "agent_google_api_latency_seconds", "Google Calendar/Gmail API call latency",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0), labelnames=("call",),
+)
+
+
+def snapshot() -> Dict[str, Dict[str, object]]:
+    return {metric.name: metric.snapshot() for metric in REGISTRY}
+
+
+# -------------------------------Job process: report to the worker-------------------------------
+_job_entered_at: Optional[float] = None
+_reporter: Optional[threading.Thread] = None
+
+
+def _report_dir() -> str:
+    # Imported here: load_monitor imports this module
+    from utils.monitoring_utils.load_monitor import REPORT_DIR
+    return REPORT_DIR
+
+
+def write_job_snapshot() -> None:
+    directory = _report_dir()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{os.getpid()}.metrics")
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(snapshot(), f)
+    os.replace(f"{path}.tmp", path)
+
+
+def _report() -> None:
+    try:
+        write_job_snapshot()
+    except OSError as e:
+        logger.warning(f"Could not write metrics snapshot: {e}")
+
+
+def _report_forever() -> None:
+    while True:
+        time.sleep(REPORT_SECONDS)
+        _report()
+
+
+def start_job_metrics() -> None:
+    """
+    Called when a job entrypoint starts: starts its latency clock and the snapshot reporter,
+    and registers the final snapshot for when the process exits.
+    """
+    global _job_entered_at, _reporter
+    _job_entered_at = time.monotonic()
+    if _reporter is None:
+        _reporter = threading.Thread(target=_report_forever, name="metrics-report", daemon=True)
+        _reporter.start()
+        # multiprocessing runs its finalizers when a child process exits, whatever the start
+        # method; atexit handlers don't run in forked or forkserver children
+        multiprocessing.util.Finalize(None, _report, exitpriority=0)
+
+
+def record_job_started() -> None:
+    """Called once the agent session is listening; observes JOB_START_LATENCY."""
+    global _job_entered_at
+    if _job_entered_at is not None:
+        JOB_START_LATENCY.observe(time.monotonic() - _job_entered_at)
+        _job_entered_at = None
+
+
+# -------------------------------Worker process: merge and serve-------------------------------
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _add(totals: Dict[str, Dict[str, object]], snap: Dict[str, Dict[str, object]], gauges: bool) -> None:
+    for metric in REGISTRY:
+        values = snap.get(metric.name)
+        if not values or (metric.kind == "gauge" and not gauges):
+            continue
+        merged = totals.setdefault(metric.name, {})
+        for key, value in values.items():
+            current = merged.get(key)
+            if current is None:
+                merged[key] = list(value) if isinstance(value, list) else value
+            elif isinstance(value, list):
+                merged[key] = [a + b for a, b in zip(current, value)]
+            else:
+                merged[key] = current + value
+
+
+class MetricsAggregator:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Counters and histograms of job processes that have exited
+        self._retired: Dict[str, Dict[str, object]] = {}
+
+    def collect(self) -> Dict[str, Dict[str, object]]:
+        directory = _report_dir()
+        live: List[Dict[str, Dict[str, object]]] = []
+        with self._lock:
+            try:
+                names = [name for name in os.listdir(directory) if name.endswith(".metrics")]
+            except FileNotFoundError:
+                names = []
+            for name in names:
+                path = os.path.join(directory, name)
+                try:
+                    with open(path) as f:
+                        snap = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                if _pid_alive(int(name.split(".")[0])):
+                    live.append(snap)
+                else:
+                    _add(self._retired, snap, gauges=False)
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+            totals: Dict[str, Dict[str, object]] = {}
+            _add(totals, self._retired, gauges=False)
+        # This process's gauges take precedence: they describe the whole worker
+        _add(totals, snapshot(), gauges=True)
+        for snap in live:
+            _add(totals, snap, gauges=False)
+        return totals
+
+    def render(self) -> str:
+        totals = self.collect()
+        lines = []
+        for metric in REGISTRY:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for key, value in sorted(totals.get(metric.name, {}).items()):
+                labels = list(zip(metric.labelnames, json.loads(key)))
+                if metric.kind != "histogram":
+                    lines.append(f"{metric.name}{_labels(labels)} {value}")
+                    continue
+                cumulative = 0
+                for bound, count in zip([*metric.buckets, "+Inf"], value[:-1]):
+                    cumulative += count
+                    lines.append(f"{metric.name}_bucket{_labels(labels + [('le', str(bound))])} {cumulative}")
+                lines.append(f"{metric.name}_sum{_labels(labels)} {value[-1]}")
+                lines.append(f"{metric.name}_count{_labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(pairs: List[Tuple[str, str]]) -> str:
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    aggregator: MetricsAggregator
+
+    def do_GET(self) -> None:
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.aggregator.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args) -> None:
+        # Scrapes are too frequent for the log
+        pass
+
+
+_server_started = False
+
+
+def start_metrics_server(port: int = METRICS_PORT) -> None:
+    """Serve /metrics from a daemon thread in the worker process; only the first call does anything."""
+    global _server_started
+    if _server_started or not port:
+        return
+    _server_started = True
+    _MetricsHandler.aggregator = MetricsAggregator()
+    try:
+        server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+    except OSError as e:
+        # e.g. a second worker on the same host; set METRICS_PORT per worker
+        logger.warning(f"Metrics endpoint not started on port {port}: {e}")
+        return
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info(f"Serving worker metrics on :{port}/metrics")